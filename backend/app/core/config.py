@@ -1,13 +1,155 @@
 import redis
 import os
+import json
+import threading
 
+# Queue, timers, journals and locks live here: run it with
+# maxmemory-policy noeviction and persistence (see docker-compose.yml)
 REDIS_HOST = os.getenv("REDIS_HOST", "redis") # 'redis' is the service name in docker-compose
 REDIS_PORT = 6379
 
-# Initialize a global redis client
-redis_client = redis.Redis(
-    host=REDIS_HOST, 
-    port=REDIS_PORT, 
-    db=0, 
+# Database (sync engine for workers/scheduler, aiosqlite engine for the API)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/automation.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30")) # seconds
+
+# Worker pool settings (see app/services/worker.py)
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "8"))
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "10"))
+WORKER_VISIBILITY_TIMEOUT = int(os.getenv("WORKER_VISIBILITY_TIMEOUT", "300")) # seconds
+
+# Default number of branches a single DAG run may execute at once
+DAG_MAX_PARALLEL = int(os.getenv("DAG_MAX_PARALLEL", "4"))
+
+# Workflow definition cache (in-process LRU in front of Redis)
+WORKFLOW_CACHE_SIZE = int(os.getenv("WORKFLOW_CACHE_SIZE", "1024"))
+WORKFLOW_CACHE_TTL = int(os.getenv("WORKFLOW_CACHE_TTL", "3600")) # seconds
+
+# Write-behind TaskLog persistence (see app/services/log_writer.py)
+LOG_WRITER_BATCH_SIZE = int(os.getenv("LOG_WRITER_BATCH_SIZE", "500"))
+LOG_WRITER_FLUSH_INTERVAL = float(os.getenv("LOG_WRITER_FLUSH_INTERVAL", "0.2")) # seconds
+LOG_WRITER_BUFFER_SIZE = int(os.getenv("LOG_WRITER_BUFFER_SIZE", "10000"))
+LOG_WRITER_RETRIES = int(os.getenv("LOG_WRITER_RETRIES", "3")) # per batch, for transient errors such as "database is locked"
+
+# TaskLog execution payloads (see app/services/payloads.py): compressed in a side table
+PAYLOAD_MAX_BYTES = int(os.getenv("PAYLOAD_MAX_BYTES", str(8 * 1024 * 1024))) # larger payloads are replaced by a truncation note
+PAYLOAD_INLINE_MAX = int(os.getenv("PAYLOAD_INLINE_MAX", str(64 * 1024))) # compressed bytes kept in the database; larger spill to files
+PAYLOAD_SPILL_DIR = os.getenv("PAYLOAD_SPILL_DIR", "./data/payloads")
+ERROR_MESSAGE_MAX_CHARS = int(os.getenv("ERROR_MESSAGE_MAX_CHARS", "4000"))
+
+# TaskLog retention (see app/services/retention.py)
+LOG_RETENTION_POLICY = json.loads(os.getenv(
+    "LOG_RETENTION_POLICY",
+    '{"default_days": 30, "statuses": {"failed": 90}}'
+))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "./data/archive")
+LOG_ARCHIVE_MAX_BYTES = int(os.getenv("LOG_ARCHIVE_MAX_BYTES", str(64 * 1024 * 1024)))
+LOG_ARCHIVE_MAX_FILES = int(os.getenv("LOG_ARCHIVE_MAX_FILES", "30"))
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "500"))
+
+# Pooled outbound clients per Integration (see app/services/clients.py)
+CLIENT_IDLE_TIMEOUT = int(os.getenv("CLIENT_IDLE_TIMEOUT", "300")) # seconds
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10")) # seconds
+
+# Background integration health probing (see app/services/health.py)
+HEALTH_PROBE_INTERVAL = int(os.getenv("HEALTH_PROBE_INTERVAL", "60")) # seconds
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5")) # seconds
+
+# Trigger ingestion (see app/services/webhooks.py)
+INGEST_MAX_QUEUE_DEPTH = int(os.getenv("INGEST_MAX_QUEUE_DEPTH", "50000"))
+INGEST_IDEMPOTENCY_WINDOW = int(os.getenv("INGEST_IDEMPOTENCY_WINDOW", "86400")) # seconds
+
+# Cron scheduler (see app/services/scheduler.py)
+SCHEDULER_LOOKAHEAD = int(os.getenv("SCHEDULER_LOOKAHEAD", "60")) # seconds of due jobs held in memory
+SCHEDULER_LEADER_TTL = int(os.getenv("SCHEDULER_LEADER_TTL", "15")) # seconds
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "500"))
+
+# Outbound rate limiting and batching (see app/services/ratelimit.py, app/services/outbound.py)
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30")) # seconds a send may wait for tokens
+OUTBOUND_BATCH_SIZE = int(os.getenv("OUTBOUND_BATCH_SIZE", "50"))
+OUTBOUND_BATCH_LINGER = float(os.getenv("OUTBOUND_BATCH_LINGER", "0.05")) # seconds
+OUTBOUND_SEND_TIMEOUT = float(os.getenv("OUTBOUND_SEND_TIMEOUT", "120")) # seconds a handler waits for its message to go out
+
+# Out-of-band step retries and per-integration circuit breakers (see app/services/retry.py)
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3")) # tries per step, including the first
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2")) # seconds
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "300")) # seconds
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "60")) # seconds
+CIRCUIT_COOLDOWN = int(os.getenv("CIRCUIT_COOLDOWN", "30")) # seconds
+
+# foreach steps: items per checkpoint, parallel sends per step (see app/services/foreach.py)
+FOREACH_CHUNK_SIZE = int(os.getenv("FOREACH_CHUNK_SIZE", "100"))
+FOREACH_CONCURRENCY = int(os.getenv("FOREACH_CONCURRENCY", "8"))
+FOREACH_CHECKPOINT_TTL = int(os.getenv("FOREACH_CHECKPOINT_TTL", str(7 * 86400))) # seconds
+
+# Per-run step journal for crash-resume (see app/services/checkpoints.py)
+WORKER_NAME = os.getenv("WORKER_NAME") # stable across restarts, qualified with the host name; defaults to host:pid
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", str(7 * 86400))) # seconds
+CHECKPOINT_DONE_TTL = int(os.getenv("CHECKPOINT_DONE_TTL", "86400")) # seconds
+
+# Startup (see app/core/lifecycle.py). Schema changes run as an explicit step
+# (`python -m app.init_db`); AUTO_MIGRATE=1 runs them at API startup instead.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "0") == "1"
+WARMUP_WORKFLOWS = int(os.getenv("WARMUP_WORKFLOWS", "200")) # hottest definitions preloaded at startup (0 disables)
+WARMUP_WINDOW = int(os.getenv("WARMUP_WINDOW", "3600")) # seconds of TaskLogs that decide what is hot
+
+# Change feed (see app/services/changes.py): ETags on list endpoints and the SSE stream
+LIST_CACHE_SIZE = int(os.getenv("LIST_CACHE_SIZE", "256")) # rendered list bodies kept per process
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", "15")) # seconds between SSE keep-alives
+
+# Prometheus: the API serves /metrics itself; workers and the scheduler listen here (0 disables).
+# Give each worker process on a host its own port (--metrics-port); a taken port only disables metrics
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+SCHEDULER_METRICS_PORT = int(os.getenv("SCHEDULER_METRICS_PORT", "9101"))
+
+class LazyRedis:
+    """
+    Stands in for the shared client until it is first used, so importing a
+    module never builds a connection pool. Attribute access is forwarded.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+class LazyScript:
+    """
+    A Lua script registered with its client on first call. Registering
+    needs the client's encoder, which would make a LazyRedis build its
+    client at import time for every module-level service.
+    """
+
+    def __init__(self, client, source: str):
+        self._client = client
+        self._source = source
+        self._script = None
+
+    def __call__(self, keys=(), args=(), client=None):
+        if self._script is None:
+            self._script = self._client.register_script(self._source)
+        return self._script(keys=keys, args=args, client=client)
+
+
+# The global redis client, created on first use
+redis_client = LazyRedis(lambda: redis.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=0,
     decode_responses=True
-)
\ No newline at end of file
+))
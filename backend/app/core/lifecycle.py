@@ -0,0 +1,84 @@
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Component:
+    """
+    One piece of process startup. `needs` names components that must be
+    started first; `optional` components (warm-up) log a failure instead of
+    aborting startup.
+    """
+    name: str
+    start: Callable[[], Any]
+    stop: Optional[Callable[[], Any]] = None
+    needs: Tuple[str, ...] = ()
+    optional: bool = False
+
+
+class Lifecycle:
+    """
+    Starts components in dependency order and stops the started ones in
+    reverse. `ready` turns true once every component has started, which is
+    what readiness checks report.
+    """
+
+    def __init__(self, components: List[Component]):
+        self.components = self._order(components)
+        self.started: List[Component] = []
+        self.timings: Dict[str, float] = {}
+        self.ready = False
+
+    @staticmethod
+    def _order(components: List[Component]) -> List[Component]:
+        by_name = {component.name: component for component in components}
+        ordered, visiting, done = [], set(), set()
+
+        def visit(component: Component):
+            if component.name in done:
+                return
+            if component.name in visiting:
+                raise ValueError(f"startup components form a cycle at '{component.name}'")
+            visiting.add(component.name)
+            for need in component.needs:
+                if need not in by_name:
+                    raise ValueError(f"component '{component.name}' needs unknown component '{need}'")
+                visit(by_name[need])
+            visiting.discard(component.name)
+            done.add(component.name)
+            ordered.append(component)
+
+        for component in components:
+            visit(component)
+        return ordered
+
+    def start(self):
+        began = time.perf_counter()
+        for component in self.components:
+            started = time.perf_counter()
+            try:
+                component.start()
+            except Exception as e:
+                if not component.optional:
+                    logging.error(f"❌ Startup failed in {component.name}: {e}")
+                    self.stop()
+                    raise
+                logging.warning(f"⚠️ Optional startup step {component.name} failed: {e}")
+            self.timings[component.name] = round((time.perf_counter() - started) * 1000, 1)
+            self.started.append(component)
+        self.timings["total"] = round((time.perf_counter() - began) * 1000, 1)
+        self.ready = True
+        print(f"🚀 Started {len(self.started)} component(s) in {self.timings['total']}ms")
+
+    def stop(self):
+        self.ready = False
+        while self.started:
+            component = self.started.pop()
+            if component.stop is None:
+                continue
+            try:
+                component.stop()
+            except Exception as e:
+                logging.error(f"❌ Error stopping {component.name}: {e}")
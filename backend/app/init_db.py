@@ -1,10 +1,12 @@
-from app.services.database import engine, Base, get_db
+from app.services.database import get_db, migrate
+from app.services.payloads import move_legacy_payloads
 from app.models import workflow, task_log, integration
 from sqlalchemy.orm import Session
 
 def init_db():
-    # Create all tables in the SQLite database
-    Base.metadata.create_all(bind=engine)
+    # The migration step: run once per deploy, before the API and workers start
+    migrate()
+    move_legacy_payloads()
     print("Database tables initialized successfully.")
 
     # Add sample integration data
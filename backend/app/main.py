@@ -1,15 +1,57 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import workflows, log, integrations
-from app.services.database import engine, Base
+from app.routers import workflows, log, integrations, events, stream
+from app.core.config import AUTO_MIGRATE
+from app.core.lifecycle import Component, Lifecycle
+from app.services.database import migrate, check_schema, dispose_engines
+from app.services.workflow_service import definition_cache
+from app.services.log_writer import log_writer
+from app.services.clients import client_registry
+from app.services.health import health_prober
+from app.services.subscriptions import subscription_index
+from app.services.changes import change_feed
+from app.services.warmup import warm_up
+from app.services import metrics  # registers collectors and DB commit timing
+
+
+def api_components():
+    """What the API needs before it serves traffic; nothing here runs at import"""
+    return [
+        Component("schema", migrate if AUTO_MIGRATE else check_schema),
+        Component("definition_cache", definition_cache.start_listener),
+        Component("subscriptions", subscription_index.load, needs=("schema", "definition_cache")),
+        Component("subscription_listener", subscription_index.start_listener, needs=("subscriptions",)),
+        Component("change_feed", change_feed.start_listener),
+        Component("client_registry", client_registry.start, stop=client_registry.close_all, needs=("schema",)),
+        Component("health_prober", health_prober.start, stop=health_prober.stop, needs=("client_registry",)),
+        Component("log_writer", log_writer.start, stop=log_writer.stop, needs=("schema",)),
+        Component("warm_up", warm_up, needs=("schema", "definition_cache"), optional=True),
+    ]
+
+
+lifecycle = Lifecycle(api_components())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup does blocking DB and Redis IO; keep it off the event loop
+    await run_in_threadpool(lifecycle.start)
+    try:
+        yield
+    finally:
+        await run_in_threadpool(lifecycle.stop)
+        await dispose_engines()
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Automation Engine API",
     version="1.0.0",
-    redirect_slashes=False
+    redirect_slashes=False,
+    lifespan=lifespan
 )
 
 # CORS
@@ -19,12 +61,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
 app.include_router(workflows.router, prefix="/api/workflows", tags=["workflows"])
 app.include_router(log.router, prefix="/api/logs", tags=["logs"])
 app.include_router(integrations.router, prefix="/api/integrations", tags=["integrations"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
+app.include_router(stream.router, prefix="/api/stream", tags=["stream"])
 
 @app.get("/")
 async def root():
@@ -34,6 +79,18 @@ async def root():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # Sync route: the queue-depth collector reads Redis
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/health/ready")
+async def readiness_check(response: Response):
+    """503 until startup (including warm-up) has finished"""
+    if not lifecycle.ready:
+        response.status_code = 503
+    return {"ready": lifecycle.ready, "startup_ms": lifecycle.timings}
\ No newline at end of file
@@ -1,5 +1,6 @@
 from .workflow import Workflow
-from .task_log import TaskLog
+from .task_log import TaskLog, TaskLogPayload
 from .integration import Integration
+from .schedule import WorkflowSchedule
 
-__all__ = ["Workflow", "TaskLog", "Integration"]
\ No newline at end of file
+__all__ = ["Workflow", "TaskLog", "TaskLogPayload", "Integration", "WorkflowSchedule"]
\ No newline at end of file
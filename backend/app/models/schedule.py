@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from datetime import datetime
+from app.services.database import Base
+
+class WorkflowSchedule(Base):
+    """Persistent next-fire-time index for cron workflows, owned by the scheduler"""
+    __tablename__ = "workflow_schedules"
+
+    workflow_id = Column(Integer, primary_key=True)
+    cron = Column(String, nullable=False)
+    timezone = Column(String, default="UTC")
+    next_fire_at = Column(DateTime, nullable=False, index=True)  # UTC
+    last_fired_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,14 +1,33 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index, LargeBinary
 from datetime import datetime
 from app.services.database import Base
 
 class TaskLog(Base):
     __tablename__ = "task_logs"
+    __table_args__ = (
+        # Keyset pagination on (started_at, id), optionally narrowed by workflow or status
+        Index("ix_task_logs_started_at_id", "started_at", "id"),
+        Index("ix_task_logs_workflow_started_at_id", "workflow_id", "started_at", "id"),
+        Index("ix_task_logs_status_started_at_id", "status", "started_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, unique=True, index=True)  # assigned before the row is written
     workflow_id = Column(Integer, nullable=True)
     status = Column(String, nullable=False)
     started_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
     error_message = Column(Text, nullable=True)
-    execution_data = Column(Text, nullable=True)
\ No newline at end of file
+    attempts = Column(Integer, default=0)  # out-of-band retries so far
+    execution_data = Column(Text, nullable=True)  # legacy rows only; new payloads live in task_log_payloads
+
+
+class TaskLogPayload(Base):
+    """A run's execution_data, compressed and kept out of task_logs so list scans stay small"""
+    __tablename__ = "task_log_payloads"
+
+    run_id = Column(String, primary_key=True)
+    codec = Column(String, nullable=False)  # see app/services/payloads.py
+    size = Column(Integer, nullable=False)  # uncompressed bytes
+    data = Column(LargeBinary, nullable=True)  # None when spilled to `path`
+    path = Column(String, nullable=True)  # relative to PAYLOAD_SPILL_DIR
@@ -1,3 +1,4 @@
+import json
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
 from datetime import datetime
 from app.services.database import Base
@@ -13,4 +14,33 @@ class Workflow(Base):
     actions = Column(Text)
     enabled = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def schedule(self):
+        """trigger_config as a dict; free-text configs (no JSON) have no schedule"""
+        try:
+            config = json.loads(self.trigger_config) if self.trigger_config else {}
+        except ValueError:
+            return {}
+        return config if isinstance(config, dict) else {}
+
+    @property
+    def definition(self):
+        """Parsed view of the JSON text columns used by the executor and scheduler"""
+        actions = json.loads(self.actions) if self.actions else []
+        options = {}
+        if isinstance(actions, dict):
+            # {"steps": [...], "max_parallel": 4, "on_failure": "cancel"}
+            options = {key: value for key, value in actions.items() if key != "steps"}
+            actions = actions.get("steps", [])
+        return {
+            "id": self.id,
+            "name": self.name,
+            "trigger_type": self.trigger_type,
+            "schedule": self.schedule,
+            "steps": actions,
+            "options": options,
+            "enabled": self.enabled,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
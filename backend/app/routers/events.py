@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+
+from app.services.log_writer import LogBufferFull
+from app.services.webhooks import ingest_event, QueueFull
+from app.services.subscriptions import subscription_index
+from app.schemas.event import Event
+
+router = APIRouter()
+
+@router.post("/", status_code=202)
+async def publish_event(event: Event, idempotency_key: Optional[str] = Header(None)):
+    """Queues a run of every workflow subscribed to the event, then acks"""
+    try:
+        result = await run_in_threadpool(ingest_event, event.type, event.payload, idempotency_key)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except LogBufferFull:
+        raise HTTPException(status_code=503, detail="Log buffer full, retry shortly")
+
+    return {
+        "message": "Event accepted",
+        "type": event.type,
+        "matched": len(result["runs"]),
+        "runs": result["runs"],
+        "duplicate": result["duplicate"]
+    }
+
+@router.get("/subscriptions/stats")
+async def get_subscription_stats():
+    return subscription_index.get_stats()
@@ -1,41 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 
-from app.services.database import get_db
+from app.services.database import get_async_db
+from app.services.clients import client_registry
+from app.services.health import health_prober
+from app.services.changes import change_feed
+from app.services.http_cache import conditional_list, projection, rows_to_dicts
 from app.models import Integration as IntegrationModel
 from app.schemas.integration import Integration, IntegrationCreate, HealthCheckResponse
 
 router = APIRouter()
 
+def publish_integration_change(integration_id: int, op: str, forget_health: bool = False):
+    """Post-commit fan-out over Redis; routes run it in the threadpool"""
+    if op != "created":
+        # Credentials may have changed: every process rebuilds its client on next use
+        client_registry.invalidate(integration_id)
+    if forget_health:
+        health_prober.forget(integration_id)
+    change_feed.bump("integrations", {"op": op, "id": integration_id})
+
 @router.get("/", response_model=List[Integration])
-async def get_integrations(db: Session = Depends(get_db)):
-    integrations = db.query(IntegrationModel).all()
-    return integrations
+async def get_integrations(request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        return rows_to_dicts(await db.execute(projection(IntegrationModel, Integration))), {}
+
+    return await conditional_list(request, ("integrations",), load)
+
+@router.get("/health", response_model=List[HealthCheckResponse])
+async def get_integrations_health(db: AsyncSession = Depends(get_async_db)):
+    integrations = (await db.execute(select(IntegrationModel))).scalars().all()
+    results = {result["integration_id"]: result for result in await run_in_threadpool(health_prober.get_all)}
+    return [build_health_response(integration, results.get(integration.id)) for integration in integrations]
 
 @router.get("/{integration_id}", response_model=Integration)
-async def get_integration(integration_id: int, db: Session = Depends(get_db)):
-    integration = db.query(IntegrationModel).filter(IntegrationModel.id == integration_id).first()
+async def get_integration(integration_id: int, db: AsyncSession = Depends(get_async_db)):
+    integration = await db.get(IntegrationModel, integration_id)
     if not integration:
         raise HTTPException(status_code=404, detail="Integration not found")
     return integration
 
 @router.post("/", response_model=Integration)
-async def create_integration(integration: IntegrationCreate, db: Session = Depends(get_db)):
+async def create_integration(integration: IntegrationCreate, db: AsyncSession = Depends(get_async_db)):
     db_integration = IntegrationModel(**integration.dict())
     db.add(db_integration)
-    db.commit()
-    db.refresh(db_integration)
+    await db.commit()
+    await db.refresh(db_integration)
+    await run_in_threadpool(publish_integration_change, db_integration.id, "created")
     return db_integration
 
 @router.put("/{integration_id}", response_model=Integration)
 async def update_integration(
     integration_id: int,
     integration_update: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_integration = db.query(IntegrationModel).filter(IntegrationModel.id == integration_id).first()
+    db_integration = await db.get(IntegrationModel, integration_id)
     if not db_integration:
         raise HTTPException(status_code=404, detail="Integration not found")
 
@@ -43,49 +67,56 @@ async def update_integration(
         if hasattr(db_integration, key):
             setattr(db_integration, key, value)
 
-    db.commit()
-    db.refresh(db_integration)
+    await db.commit()
+    await db.refresh(db_integration)
+    await run_in_threadpool(publish_integration_change, integration_id, "updated")
     return db_integration
 
 @router.delete("/{integration_id}")
-async def delete_integration(integration_id: int, db: Session = Depends(get_db)):
-    db_integration = db.query(IntegrationModel).filter(IntegrationModel.id == integration_id).first()
+async def delete_integration(integration_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_integration = await db.get(IntegrationModel, integration_id)
     if not db_integration:
         raise HTTPException(status_code=404, detail="Integration not found")
 
-    db.delete(db_integration)
-    db.commit()
+    await db.delete(db_integration)
+    await db.commit()
+    await run_in_threadpool(publish_integration_change, integration_id, "deleted", forget_health=True)
     return {"message": "Integration deleted successfully"}
 
+def build_health_response(integration, result) -> HealthCheckResponse:
+    details = {"service": integration.service_name, "auth_type": integration.auth_type}
+    if result is None:
+        return HealthCheckResponse(
+            status="unknown",
+            message=f"{integration.service_name} has not been probed yet",
+            details=details,
+            timestamp=datetime.utcnow(),
+            integration_id=integration.id,
+            stale=True
+        )
+
+    details["last_check"] = datetime.utcfromtimestamp(result["checked_at"]).isoformat()
+    details["age_seconds"] = result["age_seconds"]
+    if result["status"] == "healthy":
+        message = f"{integration.service_name} is connected and responding"
+    else:
+        message = f"{integration.service_name} is not reachable"
+        details["error"] = result.get("error")
+    return HealthCheckResponse(
+        status=result["status"],
+        message=message,
+        details=details,
+        timestamp=datetime.utcnow(),
+        integration_id=integration.id,
+        latency_ms=result["latency_ms"],
+        stale=result["stale"]
+    )
+
 @router.post("/{integration_id}/health", response_model=HealthCheckResponse)
-async def health_check_integration(integration_id: int, db: Session = Depends(get_db)):
-    integration = db.query(IntegrationModel).filter(IntegrationModel.id == integration_id).first()
+async def health_check_integration(integration_id: int, db: AsyncSession = Depends(get_async_db)):
+    integration = await db.get(IntegrationModel, integration_id)
     if not integration:
         raise HTTPException(status_code=404, detail="Integration not found")
 
-    # Mock health check - in real implementation, this would test the actual service
-    # For now, just return a mock response based on connection status
-    if integration.is_connected:
-        health_response = HealthCheckResponse(
-            status="healthy",
-            message=f"{integration.service_name} is connected and responding",
-            details={
-                "service": integration.service_name,
-                "auth_type": integration.auth_type,
-                "last_check": datetime.utcnow().isoformat()
-            },
-            timestamp=datetime.utcnow()
-        )
-    else:
-        health_response = HealthCheckResponse(
-            status="unhealthy",
-            message=f"{integration.service_name} is not connected",
-            details={
-                "service": integration.service_name,
-                "auth_type": integration.auth_type,
-                "error": "Service not configured or connection failed"
-            },
-            timestamp=datetime.utcnow()
-        )
-
-    return health_response
\ No newline at end of file
+    # Served from the background prober's cache, never a live probe
+    return build_health_response(integration, await run_in_threadpool(health_prober.get_status, integration_id))
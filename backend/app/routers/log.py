@@ -1,11 +1,150 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
+import json
+import zlib
+import base64
+import logging
+import binascii
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import models, schemas
-from app.services.database import get_db
+from app.services.database import get_async_db, AsyncSessionLocal
+from app.services.http_cache import conditional_list, rows_to_dicts
+from app.services.payloads import decode_payload
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.workflow.TaskLog])
-async def get_logs(db: Session = Depends(get_db)):
-    return db.query(models.TaskLog).order_by(models.TaskLog.started_at.desc()).limit(100).all()
\ No newline at end of file
+EXPORT_CHUNK_SIZE = 1000
+
+
+def encode_cursor(started_at: datetime, log_id: int) -> str:
+    raw = json.dumps([started_at.isoformat(), log_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        started_at, log_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(started_at), int(log_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def build_log_query(
+    workflow_id: Optional[int] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    columns=None
+):
+    """Newest first, keyset-paginated on (started_at, id) so deep pages cost the same as the first"""
+    TaskLog = models.TaskLog
+    query = select(*columns) if columns else select(TaskLog)
+    if workflow_id is not None:
+        query = query.where(TaskLog.workflow_id == workflow_id)
+    if status is not None:
+        query = query.where(TaskLog.status == status)
+    if since is not None:
+        query = query.where(TaskLog.started_at >= since)
+    if until is not None:
+        query = query.where(TaskLog.started_at < until)
+    if cursor:
+        query = query.where(tuple_(TaskLog.started_at, TaskLog.id) < tuple_(*decode_cursor(cursor)))
+    return query.order_by(TaskLog.started_at.desc(), TaskLog.id.desc())
+
+
+def with_payload(log, codec: Optional[str], data: Optional[bytes], path: Optional[str]) -> schemas.workflow.TaskLog:
+    """The full log, execution_data decompressed (rows written before payloads moved keep it inline)"""
+    detail = schemas.workflow.TaskLog.model_validate(log)
+    if codec is not None:
+        try:
+            detail.execution_data = decode_payload(codec, data, path)
+        except (OSError, ValueError, zlib.error) as e:
+            logging.error(f"❌ Could not read execution data of run {log.run_id}: {e}")
+            detail.execution_data = None
+    return detail
+
+
+def with_payload_columns(query):
+    Payload = models.TaskLogPayload
+    return query.add_columns(Payload.codec, Payload.data, Payload.path).outerjoin(
+        Payload, Payload.run_id == models.TaskLog.run_id
+    )
+
+
+@router.get("/", response_model=List[schemas.TaskLogSummary])
+async def get_logs(
+    request: Request,
+    workflow_id: Optional[int] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Summary columns only: payloads and errors are fetched per log
+    columns = [getattr(models.TaskLog, field) for field in schemas.TaskLogSummary.model_fields]
+
+    async def load():
+        query = build_log_query(workflow_id, status, since, until, cursor, columns).limit(limit)
+        logs = rows_to_dicts(await db.execute(query))
+        # The body stays a plain list; the next page is advertised in a header
+        headers = {}
+        if len(logs) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(logs[-1]["started_at"], logs[-1]["id"])
+        return logs, headers
+
+    return await conditional_list(request, ("task_logs",), load)
+
+
+@router.get("/export")
+async def export_logs(
+    workflow_id: Optional[int] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Streams every matching log as NDJSON, one keyset page at a time"""
+    async def generate():
+        cursor = None
+        while True:
+            # A short-lived session per page keeps memory flat and no transaction open between pages
+            async with AsyncSessionLocal() as db:
+                query = build_log_query(workflow_id, status, since, until, cursor).limit(EXPORT_CHUNK_SIZE)
+                rows = (await db.execute(with_payload_columns(query))).all()
+            logs = [row[0] for row in rows]
+            # Decompression (and any spilled-file reads) stays off the event loop
+            lines = await run_in_threadpool(
+                lambda: [with_payload(*row).model_dump_json() + "\n" for row in rows]
+            )
+
+            if lines:
+                yield "".join(lines)
+            if len(logs) < EXPORT_CHUNK_SIZE:
+                return
+            cursor = encode_cursor(logs[-1].started_at, logs[-1].id)
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=task_logs.ndjson"}
+    )
+
+
+@router.get("/{log_id}", response_model=schemas.workflow.TaskLog)
+async def get_log(log_id: int, db: AsyncSession = Depends(get_async_db)):
+    """One log with its error and execution data, decompressed on demand"""
+    query = with_payload_columns(select(models.TaskLog)).where(models.TaskLog.id == log_id)
+    row = (await db.execute(query)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Log not found")
+    if row.path is not None:
+        return await run_in_threadpool(with_payload, *row)
+    return with_payload(*row)
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Optional
+
+import orjson
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.core.config import STREAM_HEARTBEAT
+from app.services.changes import change_feed, TABLES
+from app.services.http_cache import list_cache
+
+router = APIRouter()
+
+
+def sse(event: str, data, event_id: Optional[str] = None) -> str:
+    lines = f"id: {event_id}\n" if event_id else ""
+    return f"{lines}event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+@router.get("/")
+async def stream_changes(tables: Optional[str] = None):
+    """
+    Server-Sent Events: one `workflows`, `integrations` or `task_logs` event
+    per committed change (TaskLog changes arrive one batch per event), so
+    dashboards refetch when something changed instead of polling. A
+    `resync` event means changes may have been missed: refetch everything.
+    """
+    wanted = set(tables.split(",")) if tables else set(TABLES)
+    unknown = wanted - set(TABLES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(sorted(unknown))}")
+
+    async def generate():
+        loop = asyncio.get_running_loop()
+        queue = change_feed.subscribe(loop)
+        try:
+            versions = change_feed.local_versions(TABLES) or await run_in_threadpool(change_feed.versions, TABLES) or ()
+            yield "retry: 3000\n" + sse("hello", dict(zip(TABLES, versions)))
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                table = message["table"]
+                if table == "resync":
+                    yield sse("resync", {})
+                elif table in wanted:
+                    yield sse(table, message, f"{table}-{message['version']}")
+        finally:
+            # Runs when the client disconnects and the response task is cancelled
+            change_feed.unsubscribe(loop, queue)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+async def get_stream_stats():
+    return {"list_cache": list_cache.stats, "subscribers": change_feed.subscriber_count()}
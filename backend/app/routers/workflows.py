@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
-from app.services.database import get_db
-from app.models import Workflow as WorkflowModel, TaskLog as TaskLogModel
+from app.services.database import get_async_db
+from app.services.log_writer import LogBufferFull
+from app.services.webhooks import ingest_trigger, WorkflowNotFound, WorkflowDisabled, QueueFull
+from app.services.workflow_service import definition_cache, invalidate_workflow_definition
+from app.services.scheduler import parse_schedule, notify_schedule_changed
+from app.services.subscriptions import parse_subscription, subscription_index
+from app.services.changes import change_feed
+from app.services.http_cache import conditional_list, projection, rows_to_dicts
+from app.models import Workflow as WorkflowModel
 from app.schemas import (
     Workflow as WorkflowSchema,
     WorkflowCreate,
@@ -13,71 +21,116 @@ from app.schemas import (
 
 router = APIRouter()
 
+def validate_schedule(db_workflow: WorkflowModel):
+    try:
+        parse_schedule(db_workflow.schedule)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cron schedule: {e}")
+
+def validate_trigger(db_workflow: WorkflowModel):
+    try:
+        parse_subscription(db_workflow.id, db_workflow.trigger_type, db_workflow.schedule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid event trigger: {e}")
+
+def publish_workflow_change(workflow_id: int, op: str, db_workflow: Optional[WorkflowModel] = None):
+    """
+    Post-commit fan-out: subscription index, definition caches, scheduler
+    and change feed. Blocking Redis IO, so routes run it in the threadpool.
+    """
+    if db_workflow is not None:
+        subscription_index.put(db_workflow)
+    else:
+        subscription_index.remove(workflow_id)
+    # Other processes also re-index the workflow when they see its id
+    invalidate_workflow_definition(workflow_id)
+    notify_schedule_changed(workflow_id)
+    change_feed.bump("workflows", {"op": op, "id": workflow_id})
+
 @router.get("/", response_model=List[WorkflowSchema])
-async def get_workflows(db: Session = Depends(get_db)):
-    workflows = db.query(WorkflowModel).all()
-    return workflows
+async def get_workflows(request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        return rows_to_dicts(await db.execute(projection(WorkflowModel, WorkflowSchema))), {}
+
+    # 304 while nothing changed; otherwise projected columns straight to JSON
+    return await conditional_list(request, ("workflows",), load)
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return definition_cache.get_stats()
 
 @router.get("/{workflow_id}", response_model=WorkflowSchema)
-async def get_workflow(workflow_id: int, db: Session = Depends(get_db)):
-    workflow = db.query(WorkflowModel).filter(WorkflowModel.id == workflow_id).first()
+async def get_workflow(workflow_id: int, db: AsyncSession = Depends(get_async_db)):
+    workflow = await db.get(WorkflowModel, workflow_id)
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     return workflow
 
 @router.post("/", response_model=WorkflowSchema)
-async def create_workflow(workflow: WorkflowCreate, db: Session = Depends(get_db)):
+async def create_workflow(workflow: WorkflowCreate, db: AsyncSession = Depends(get_async_db)):
     db_workflow = WorkflowModel(**workflow.model_dump())
+    validate_schedule(db_workflow)
+    validate_trigger(db_workflow)
     db.add(db_workflow)
-    db.commit()
-    db.refresh(db_workflow)
+    await db.commit()
+    await db.refresh(db_workflow)
+    await run_in_threadpool(publish_workflow_change, db_workflow.id, "created", db_workflow)
     return db_workflow
 
 @router.patch("/{workflow_id}", response_model=WorkflowSchema)
 async def update_workflow(
     workflow_id: int, 
     workflow: WorkflowUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_workflow = db.query(WorkflowModel).filter(WorkflowModel.id == workflow_id).first()
+    db_workflow = await db.get(WorkflowModel, workflow_id)
     if not db_workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
     for key, value in workflow.model_dump(exclude_unset=True).items():
         setattr(db_workflow, key, value)
     
+    validate_schedule(db_workflow)
+    validate_trigger(db_workflow)
     db_workflow.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_workflow)
+    await db.commit()
+    await db.refresh(db_workflow)
+    await run_in_threadpool(publish_workflow_change, workflow_id, "updated", db_workflow)
     return db_workflow
 
 @router.delete("/{workflow_id}")
-async def delete_workflow(workflow_id: int, db: Session = Depends(get_db)):
-    db_workflow = db.query(WorkflowModel).filter(WorkflowModel.id == workflow_id).first()
+async def delete_workflow(workflow_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_workflow = await db.get(WorkflowModel, workflow_id)
     if not db_workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    db.delete(db_workflow)
-    db.commit()
+    await db.delete(db_workflow)
+    await db.commit()
+    await run_in_threadpool(publish_workflow_change, workflow_id, "deleted")
     return {"message": "Workflow deleted successfully"}
 
-@router.post("/{workflow_id}/trigger")
-async def trigger_workflow(workflow_id: int, db: Session = Depends(get_db)):
-    workflow = db.query(WorkflowModel).filter(WorkflowModel.id == workflow_id).first()
-    if not workflow:
+@router.post("/{workflow_id}/trigger", status_code=202)
+async def trigger_workflow(
+    workflow_id: int,
+    payload: Optional[Dict[str, Any]] = Body(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Records and enqueues the run, then acks; a worker executes it"""
+    try:
+        result = await run_in_threadpool(ingest_trigger, workflow_id, payload, idempotency_key)
+    except WorkflowNotFound:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    
-    # Create success log
-    log = TaskLogModel(
-        workflow_id=workflow_id, 
-        status="success",
-        started_at=datetime.utcnow(),
-        completed_at=datetime.utcnow()
-    )
-    db.add(log)
-    db.commit()
-    
+    except WorkflowDisabled:
+        raise HTTPException(status_code=409, detail="Workflow is disabled")
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except LogBufferFull:
+        raise HTTPException(status_code=503, detail="Log buffer full, retry shortly")
+
     return {
-        "message": f"Workflow '{workflow.name}' triggered successfully", 
-        "workflow_id": workflow_id
-    }
\ No newline at end of file
+        "message": "Workflow trigger accepted",
+        "workflow_id": workflow_id,
+        "run_id": result["run_id"],
+        "status": "queued",
+        "duplicate": result["duplicate"]
+    }
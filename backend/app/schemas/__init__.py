@@ -4,7 +4,8 @@ from .workflow import (
     WorkflowUpdate,
     Workflow,
     TaskLogBase,
-    TaskLog
+    TaskLog,
+    TaskLogSummary
 )
 
 __all__ = [
@@ -13,5 +14,6 @@ __all__ = [
     "WorkflowUpdate",
     "Workflow",
     "TaskLogBase",
-    "TaskLog"
+    "TaskLog",
+    "TaskLogSummary"
 ]
\ No newline at end of file
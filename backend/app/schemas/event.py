@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict
+
+class Event(BaseModel):
+    type: str = Field(min_length=1)
+    payload: Dict[str, Any] = {}
@@ -28,7 +28,10 @@ class Integration(IntegrationBase):
         from_attributes = True
 
 class HealthCheckResponse(BaseModel):
-    status: str  # "healthy" or "unhealthy"
+    status: str  # "healthy", "unhealthy" or "unknown" (not probed yet)
     message: Optional[str] = None
     details: Optional[Dict[str, Any]] = None
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+    integration_id: Optional[int] = None
+    latency_ms: Optional[float] = None
+    stale: bool = False
\ No newline at end of file
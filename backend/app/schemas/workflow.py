@@ -34,10 +34,22 @@ class TaskLogBase(BaseModel):
     status: str
     error_message: Optional[str] = None
     execution_data: Optional[str] = None
+    attempts: Optional[int] = 0
 
 class TaskLog(TaskLogBase):
     id: int
+    run_id: Optional[str] = None
     started_at: datetime
     completed_at: Optional[datetime] = None
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class TaskLogSummary(BaseModel):
+    """What GET /api/logs lists; error_message and execution_data are on the detail endpoint"""
+    id: int
+    run_id: Optional[str] = None
+    workflow_id: Optional[int] = None
+    status: str
+    attempts: Optional[int] = 0
+    started_at: datetime
+    completed_at: Optional[datetime] = None
\ No newline at end of file
@@ -0,0 +1,145 @@
+import json
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import redis
+
+from app.core.config import redis_client
+
+VERSION_KEY = "table_version:{table}"
+CHANGES_CHANNEL = "changes"
+TABLES = ("workflows", "integrations", "task_logs")
+
+# Per SSE client; a client that falls this far behind is told to resync
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class ChangeFeed:
+    """
+    Per-table version counters plus a change stream, both in Redis.
+
+    Every committed write to a watched table calls `bump()`: INCR the
+    table's counter, then PUBLISH what changed. List endpoints derive ETags
+    from the counters, and the SSE stream relays the published changes.
+
+    Once `start_listener()` has run, one listener thread per process keeps a local
+    copy of the counters up to date from the stream, so an ETag check does
+    no IO at all; before that (CLI tools, tests) `versions()` reads Redis.
+    """
+
+    def __init__(self, client=None):
+        self.redis = client or redis_client
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._live = False
+        self._listener = None
+        self._subscribers = set()
+
+    def _note(self, table: str, version: int):
+        with self._lock:
+            if version > self._versions.get(table, 0):
+                self._versions[table] = version
+
+    def bump(self, table: str, change: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """Call after the write has committed. Never raises: a missed bump only delays a refresh"""
+        try:
+            version = self.redis.incr(VERSION_KEY.format(table=table))
+            self._note(table, version)
+            message = {"table": table, "version": version, **(change or {})}
+            self.redis.publish(CHANGES_CHANNEL, json.dumps(message, default=str))
+            return version
+        except redis.RedisError as e:
+            logging.warning(f"⚠️ Could not record a change to {table}: {e}")
+            return None
+
+    def local_versions(self, tables: Iterable[str]) -> Optional[Tuple[int, ...]]:
+        """Counters from the listener's copy without any IO, or None until it is live"""
+        if not self._live:
+            return None
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def versions(self, tables: Iterable[str]) -> Optional[Tuple[int, ...]]:
+        """Current counters, or None when they cannot be known (no ETag then)"""
+        tables = tuple(tables)
+        local = self.local_versions(tables)
+        if local is not None:
+            return local
+        try:
+            values = self.redis.mget([VERSION_KEY.format(table=table) for table in tables])
+        except redis.RedisError:
+            return None
+        return tuple(int(value or 0) for value in values)
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        """A queue the listener feeds this process's changes into; pair with `unsubscribe`"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((loop, queue))
+        return queue
+
+    def unsubscribe(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.discard((loop, queue))
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: Dict[str, Any]):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Drop the backlog: the client refetches its lists instead
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"table": "resync"})
+
+    def _broadcast(self, message: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, message)
+            except RuntimeError:
+                # The client's loop has closed
+                self.unsubscribe(loop, queue)
+
+    def _listen(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(CHANGES_CHANNEL)
+        # Seed after subscribing, so no bump falls between the two
+        for table, version in zip(TABLES, self.redis.mget([VERSION_KEY.format(table=table) for table in TABLES])):
+            self._note(table, int(version or 0))
+        self._live = True
+        for raw in pubsub.listen():
+            try:
+                message = json.loads(raw["data"])
+                self._note(message["table"], int(message["version"]))
+            except (TypeError, ValueError, KeyError):
+                continue
+            self._broadcast(message)
+
+    def _listen_forever(self):
+        while True:
+            try:
+                self._listen()
+            except redis.RedisError as e:
+                # Fall back to reading counters from Redis until resubscribed
+                self._live = False
+                logging.warning(f"⚠️ Change feed listener disconnected: {e}")
+                self._broadcast({"table": "resync"})
+                threading.Event().wait(1)
+
+    def start_listener(self):
+        """Keeps local counters and SSE clients fed (idempotent)"""
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen_forever, name="change-feed", daemon=True)
+        self._listener.start()
+
+
+change_feed = ChangeFeed()
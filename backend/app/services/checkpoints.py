@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import uuid
+import socket
+from typing import Any, Dict, List, Optional
+
+from app.core.config import redis_client, WORKER_NAME, WORKER_VISIBILITY_TIMEOUT, CHECKPOINT_TTL, CHECKPOINT_DONE_TTL, LazyScript
+
+JOURNAL_KEY = "run_journal:{run_id}"
+META_KEY = "run_journal:{run_id}:meta"
+CLAIM_KEY = "run_journal:{run_id}:claim"
+# run_id -> last heartbeat, for runs currently executing on some worker
+ACTIVE_KEY = "run_journal:active"
+
+
+
+def worker_identity() -> str:
+    """
+    This process's journal owner. WORKER_NAME is qualified with the host, so
+    replicas of one service (which share their environment) never share an
+    identity, while a container restarted in place keeps its own.
+    """
+    if WORKER_NAME:
+        return f"{WORKER_NAME}@{socket.gethostname()}"
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RunJournal:
+    """
+    Append-only, per-run step journal in Redis.
+
+    Every completed action appends one compact entry to the run's list (one
+    pipelined round trip, never a rewrite), and the cursor a resumed run
+    starts from is folded from those entries: the next linear step, completed
+    DAG step ids, step outputs and failed-attempt counts. A redelivered or
+    recovered run therefore continues after its last completed step instead
+    of re-sending everything before it.
+
+    Executing runs hold a claim (so a duplicate delivery backs off) and
+    heartbeat in `run_journal:active`; `recover()` re-enqueues runs whose
+    worker stopped heartbeating, or whose worker restarted under the same
+    identity (`worker_identity()`). Finished runs leave a short-lived `done` entry so late
+    redeliveries are dropped.
+    """
+
+    def __init__(self, client=None, owner: Optional[str] = None, ttl: int = CHECKPOINT_TTL, done_ttl: int = CHECKPOINT_DONE_TTL):
+        self.redis = client or redis_client
+        self.owner = owner or worker_identity()
+        # Claims carry a per-process token: a restarted worker keeps its name
+        # but knows runs claimed by its previous life are orphaned
+        self.token = f"{self.owner}/{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.done_ttl = done_ttl
+        # Heartbeats refresh it; it only lapses once the owner is gone
+        self.claim_ttl = WORKER_VISIBILITY_TIMEOUT
+        self._release = LazyScript(self.redis, RELEASE_SCRIPT)
+
+    def _orphaned_by_restart(self, holder: Optional[str]) -> bool:
+        return holder is not None and holder != self.token and holder.rsplit("/", 1)[0] == self.owner
+
+    @staticmethod
+    def fold(entries: List[str]) -> Dict[str, Any]:
+        cursor = {"next_step": 0, "completed": set(), "outputs": {}, "attempts": {}, "parked_until": None, "done": None}
+        for raw in entries:
+            entry = json.loads(raw)
+            if "done" in entry:
+                cursor["done"] = entry["done"]
+            elif "p" in entry:
+                cursor["parked_until"] = entry["p"]
+            elif "a" in entry:
+                cursor["attempts"][entry["s"]] = max(cursor["attempts"].get(entry["s"], 0), entry["a"])
+            else:
+                cursor["parked_until"] = None
+                cursor["completed"].add(entry["s"])
+                cursor["next_step"] = max(cursor["next_step"], entry["i"] + 1)
+                if "o" in entry:
+                    cursor["outputs"][entry["s"]] = entry["o"]
+        return cursor
+
+    def start(self, run_id: str, workflow_id: int, payload: Optional[Dict[str, Any]]):
+        """
+        Loads the run's cursor and claims the run in one round trip. Returns
+        (cursor, or None when the run was never started, and whether this
+        worker holds the claim).
+        """
+        claim_key = CLAIM_KEY.format(run_id=run_id)
+        pipe = self.redis.pipeline()
+        pipe.lrange(JOURNAL_KEY.format(run_id=run_id), 0, -1)
+        pipe.set(claim_key, self.token, nx=True, ex=self.claim_ttl)
+        pipe.get(claim_key)
+        pipe.hset(META_KEY.format(run_id=run_id), mapping={"workflow_id": workflow_id, "payload": json.dumps(payload or {})})
+        pipe.expire(META_KEY.format(run_id=run_id), self.ttl)
+        entries, claimed, holder, created, _ = pipe.execute()
+        # Known runs get a cursor even before their first step completes
+        cursor = self.fold(entries) if entries or not created else None
+
+        held = bool(claimed)
+        if not held and self._orphaned_by_restart(holder):
+            held = self.redis.set(claim_key, self.token, ex=self.claim_ttl, xx=True) is not None
+        if held and not (cursor and cursor["done"]):
+            self.redis.zadd(ACTIVE_KEY, {run_id: time.time()})
+        return cursor, held
+
+    def _append(self, run_id: str, entry: Dict[str, Any]):
+        key = JOURNAL_KEY.format(run_id=run_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.rpush(key, json.dumps(entry, separators=(",", ":"), default=str))
+        pipe.expire(key, self.ttl)
+        pipe.zadd(ACTIVE_KEY, {run_id: time.time()}, xx=True)
+        pipe.execute()
+
+    def record(self, run_id: Optional[str], step, output: Any = None):
+        """Appends a completed step with its output, which later conditions may read"""
+        if not run_id:
+            return
+        entry = {"s": step.id, "i": step.index}
+        if output is not None:
+            entry["o"] = output
+        self._append(run_id, entry)
+
+    def record_attempt(self, run_id: Optional[str], step, attempt: int):
+        if run_id:
+            self._append(run_id, {"s": step.id, "a": attempt})
+
+    def park(self, run_id: str, until: float):
+        """
+        The run waits on a timer: stop heartbeating it and free the claim. The
+        park entry makes a stray redelivery before `until` back off, so only
+        the timer resumes it.
+        """
+        key = JOURNAL_KEY.format(run_id=run_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.rpush(key, json.dumps({"p": until}))
+        pipe.expire(key, self.ttl)
+        pipe.zrem(ACTIVE_KEY, run_id)
+        pipe.execute()
+        self._release(keys=[CLAIM_KEY.format(run_id=run_id)], args=[self.token])
+
+    def finish(self, run_id: str, status: str):
+        """Replaces the journal with a `done` tombstone that outlives redeliveries"""
+        key = JOURNAL_KEY.format(run_id=run_id)
+        pipe = self.redis.pipeline()
+        pipe.delete(key, META_KEY.format(run_id=run_id))
+        pipe.rpush(key, json.dumps({"done": status}))
+        pipe.expire(key, self.done_ttl)
+        pipe.zrem(ACTIVE_KEY, run_id)
+        pipe.execute()
+        self._release(keys=[CLAIM_KEY.format(run_id=run_id)], args=[self.token])
+
+    def heartbeat(self, run_ids: List[str]):
+        """Called by the worker's reaper for its in-flight runs"""
+        if not run_ids:
+            return
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for run_id in run_ids:
+            pipe.zadd(ACTIVE_KEY, {run_id: now}, xx=True)
+            pipe.expire(CLAIM_KEY.format(run_id=run_id), self.claim_ttl)
+        pipe.execute()
+
+    def recover(self, enqueue, stale_after: float) -> int:
+        """
+        Re-enqueues interrupted runs: unclaimed ones whose heartbeat is older
+        than `stale_after`, and any a previous life of this worker (same
+        identity) was running when it died. Returns how many were resumed.
+        The active set only holds executing runs, so the scan stays small.
+        """
+        cutoff = time.time() - stale_after
+        recovered = 0
+        for run_id, heartbeat in self.redis.zrange(ACTIVE_KEY, 0, -1, withscores=True):
+            holder = self.redis.get(CLAIM_KEY.format(run_id=run_id))
+            if not (self._orphaned_by_restart(holder) or (holder is None and heartbeat < cutoff)):
+                continue
+            # ZREM decides which sweeping worker re-enqueues the run
+            if not self.redis.zrem(ACTIVE_KEY, run_id):
+                continue
+            meta = self.redis.hgetall(META_KEY.format(run_id=run_id))
+            if not meta:
+                continue
+            self.redis.delete(CLAIM_KEY.format(run_id=run_id))
+            enqueue(int(meta["workflow_id"]), json.loads(meta.get("payload") or "{}"), run_id)
+            recovered += 1
+        return recovered
+
+
+run_journal = RunJournal()
@@ -0,0 +1,245 @@
+import time
+import smtplib
+import logging
+import threading
+from urllib.parse import urlparse
+from typing import Any, Dict, Optional
+
+import httpx
+import redis
+
+from app.core.config import redis_client, CLIENT_IDLE_TIMEOUT, HTTP_POOL_SIZE, HTTP_TIMEOUT
+from app.services.database import SessionLocal
+from app.models import Integration
+
+INVALIDATION_CHANNEL = "integration_client:invalidate"
+
+# Which kind of client each known service gets; `config.client_type` overrides
+CLIENT_TYPES = {
+    "redis": "redis",
+    "smtp": "smtp",
+    "google_workspace": "smtp",
+    "whatsapp_business": "http",
+}
+
+
+class SMTPClient:
+    """A persistent SMTP session that reconnects when the server drops it"""
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None, use_tls: bool = True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._smtp = None
+        # smtplib sessions are not thread safe
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.port == 465:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=HTTP_TIMEOUT)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=HTTP_TIMEOUT)
+            if self.use_tls:
+                smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password or "")
+        return smtp
+
+    def _session(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self._quit()
+        self._smtp = self._connect()
+        return self._smtp
+
+    def ping(self):
+        with self._lock:
+            self._session()
+
+    def send_message(self, message):
+        with self._lock:
+            return self._session().send_message(message)
+
+    def send_messages(self, messages) -> list:
+        """Sends a batch over one session; returns the exception (or None) per message"""
+        results = []
+        with self._lock:
+            for message in messages:
+                try:
+                    self._session().send_message(message)
+                    results.append(None)
+                except Exception as e:
+                    results.append(e)
+        return results
+
+    def _quit(self):
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+    def close(self):
+        with self._lock:
+            if self._smtp is not None:
+                self._quit()
+
+
+def build_client(integration):
+    """Creates a pooled client for an Integration row"""
+    config = integration.config or {}
+    client_type = config.get("client_type") or CLIENT_TYPES.get(integration.service_name)
+    if client_type is None:
+        client_type = "http" if integration.base_url else None
+
+    if client_type == "http":
+        headers = dict(config.get("headers", {}))
+        if integration.oauth_token:
+            headers["Authorization"] = f"Bearer {integration.oauth_token}"
+        elif integration.api_key:
+            headers["Authorization"] = f"Bearer {integration.api_key}"
+        auth = (integration.username, integration.password or "") if integration.username else None
+        return httpx.Client(
+            base_url=integration.base_url or config.get("base_url", ""),
+            headers=headers,
+            auth=auth,
+            timeout=config.get("timeout", HTTP_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+        )
+
+    if client_type == "smtp":
+        url = urlparse(integration.base_url or "")
+        return SMTPClient(
+            host=config.get("host") or url.hostname or "localhost",
+            port=int(config.get("port") or url.port or 587),
+            username=integration.username,
+            password=integration.password,
+            use_tls=config.get("use_tls", True)
+        )
+
+    if client_type == "redis":
+        pool = redis.ConnectionPool.from_url(integration.base_url, decode_responses=True)
+        return redis.Redis(connection_pool=pool)
+
+    raise ValueError(f"Integration {integration.id} ({integration.service_name}) has no client type")
+
+
+def close_client(client):
+    try:
+        client.close()
+    except Exception as e:
+        logging.warning(f"⚠️ Error closing client: {e}")
+
+
+class ClientRegistry:
+    """
+    Long-lived, pooled outbound clients keyed by integration id.
+
+    Clients are built on first use and reused across steps, so TLS and auth
+    handshakes happen once per integration rather than once per send.
+    `invalidate()` (called when an integration is updated or deleted) closes
+    the client here and, through Redis pub/sub, in every other process.
+    Clients unused for `idle_timeout` seconds are closed by `close_idle()`.
+    """
+
+    def __init__(self, client=None, session_factory=SessionLocal, idle_timeout: int = CLIENT_IDLE_TIMEOUT):
+        self.redis = client or redis_client
+        self.session_factory = session_factory
+        self.idle_timeout = idle_timeout
+        self._clients: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._background = None
+
+    def get(self, integration_id: int):
+        with self._lock:
+            entry = self._clients.get(integration_id)
+            if entry is not None:
+                entry["last_used"] = time.monotonic()
+                return entry["client"]
+
+            # Built under the lock so concurrent steps never open duplicate pools
+            db = self.session_factory()
+            try:
+                integration = db.get(Integration, integration_id)
+                if integration is None:
+                    raise LookupError(f"Integration {integration_id} not found")
+                client = build_client(integration)
+                settings = {"service_name": integration.service_name, "config": dict(integration.config or {})}
+            finally:
+                db.close()
+            self._clients[integration_id] = {"client": client, "settings": settings, "last_used": time.monotonic()}
+            return client
+
+    def settings(self, integration_id: int) -> Dict[str, Any]:
+        """The service name and config the integration's client was built from"""
+        self.get(integration_id)
+        with self._lock:
+            entry = self._clients.get(integration_id)
+        # Invalidated between the two lookups: load it again
+        return entry["settings"] if entry is not None else self.settings(integration_id)
+
+    def _drop(self, integration_id: int):
+        with self._lock:
+            entry = self._clients.pop(integration_id, None)
+        if entry is not None:
+            close_client(entry["client"])
+
+    def invalidate(self, integration_id: int):
+        self._drop(integration_id)
+        try:
+            self.redis.publish(INVALIDATION_CHANNEL, str(integration_id))
+        except redis.RedisError as e:
+            logging.error(f"❌ Could not publish client invalidation for integration {integration_id}: {e}")
+
+    def close_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [iid for iid, entry in self._clients.items() if entry["last_used"] < cutoff]
+        for integration_id in idle:
+            self._drop(integration_id)
+        return len(idle)
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+        for entry in entries:
+            close_client(entry["client"])
+
+    def _listen(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(INVALIDATION_CHANNEL)
+        while True:
+            message = pubsub.get_message(timeout=max(1, self.idle_timeout // 4))
+            if message is not None:
+                try:
+                    self._drop(int(message["data"]))
+                except (TypeError, ValueError):
+                    pass
+            self.close_idle()
+
+    def _run_background(self):
+        while True:
+            try:
+                self._listen()
+            except redis.RedisError as e:
+                # Missed invalidations while disconnected: rebuild everything lazily
+                logging.warning(f"⚠️ Client invalidation listener disconnected: {e}")
+                self.close_all()
+                time.sleep(1)
+
+    def start(self):
+        """Starts the invalidation listener and idle reaper (idempotent)"""
+        if self._background is not None:
+            return
+        self._background = threading.Thread(target=self._run_background, name="client-registry", daemon=True)
+        self._background.start()
+
+
+client_registry = ClientRegistry()
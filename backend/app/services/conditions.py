@@ -0,0 +1,472 @@
+"""
+The condition expression language.
+
+    payload.amount >= 100 and payload.status in ["paid", "settled"]
+    not exists(payload.test) or lower(steps.lookup.tier) == "vip"
+    contains(item.tags, "beta") and item.score > 0.5
+
+Paths read the run context: `payload` (the trigger payload), `steps`
+(outputs of completed steps, by step id) and, inside a foreach filter,
+`item`. A missing field reads as null. Comparisons between incompatible
+types are false rather than errors.
+
+An expression is parsed once into a tree of closures; nothing is parsed
+or `eval`'d per call. The same tree also compiles to a column-wise form
+that evaluates a batch of contexts one node at a time, which is what
+foreach filters and event bursts use.
+"""
+import ast
+import re
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+
+class ConditionError(ValueError):
+    """The expression does not parse or uses something the language does not have"""
+
+
+ROOTS = ("payload", "steps", "item", "run_id")
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda left, right: left in right,
+    "not in": lambda left, right: left not in right,
+}
+
+# == and != never raise, so the batch path can skip the TypeError guard
+TOTAL_COMPARISONS = ("==", "!=")
+
+
+def _len(value) -> int:
+    try:
+        return len(value)
+    except TypeError:
+        return 0
+
+
+FUNCTIONS = {
+    "len": (1, _len),
+    "lower": (1, lambda value: value.lower() if isinstance(value, str) else value),
+    "upper": (1, lambda value: value.upper() if isinstance(value, str) else value),
+    "contains": (2, lambda container, value: container is not None and value in container),
+    "startswith": (2, lambda value, prefix: isinstance(value, str) and value.startswith(prefix)),
+    "endswith": (2, lambda value, suffix: isinstance(value, str) and value.endswith(suffix)),
+}
+
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<op>==|!=|<=|>=|<|>|\(|\)|\[|\]|,|\.)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+KEYWORDS = {"true": True, "false": False, "null": None}
+
+_MISSING = object()
+
+
+def tokenize(source: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    position = 0
+    source = source.rstrip()
+    while position < len(source):
+        match = TOKEN_RE.match(source, position)
+        if match is None or match.end() == position:
+            raise ConditionError(f"unexpected character at {position}: {source[position:position + 10]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind in ("number", "string"):
+            tokens.append(("literal", ast.literal_eval(text)))
+        else:
+            tokens.append((kind, text))
+        position = match.end()
+    tokens.append(("end", None))
+    return tokens
+
+
+class Parser:
+    """
+    Recursive descent over the token list. Nodes are tuples:
+    ("literal", value), ("path", parts), ("list", nodes), ("not", node),
+    ("and" | "or", left, right), ("compare", op, left, right),
+    ("call", name, args), ("exists", parts).
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens = tokenize(source)
+        self.position = 0
+
+    def peek(self, offset: int = 0):
+        return self.tokens[self.position + offset]
+
+    def advance(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, kind: str, text: Optional[str] = None):
+        token = self.advance()
+        if token[0] != kind or (text is not None and token[1] != text):
+            raise ConditionError(f"expected {text or kind} in {self.source!r}, got {token[1]!r}")
+        return token
+
+    def accept(self, kind: str, text: str) -> bool:
+        if self.peek() == (kind, text):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek()[0] != "end":
+            raise ConditionError(f"unexpected {self.peek()[1]!r} in {self.source!r}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.accept("name", "or"):
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.accept("name", "and"):
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == ("name", "not") and self.peek(1) != ("name", "in"):
+            self.advance()
+            return ("not", self.parse_not())
+        return self.parse_compare()
+
+    def parse_compare(self):
+        left = self.parse_primary()
+        kind, text = self.peek()
+        if kind == "op" and text in COMPARISONS:
+            self.advance()
+            return ("compare", text, left, self.parse_primary())
+        if (kind, text) == ("name", "in"):
+            self.advance()
+            return ("compare", "in", left, self.parse_primary())
+        if (kind, text) == ("name", "not") and self.peek(1) == ("name", "in"):
+            self.position += 2
+            return ("compare", "not in", left, self.parse_primary())
+        return left
+
+    def parse_primary(self):
+        kind, text = self.advance()
+        if kind == "literal":
+            return ("literal", text)
+        if (kind, text) == ("op", "("):
+            node = self.parse_or()
+            self.expect("op", ")")
+            return node
+        if (kind, text) == ("op", "["):
+            items = []
+            if not self.accept("op", "]"):
+                items.append(self.parse_primary())
+                while self.accept("op", ","):
+                    items.append(self.parse_primary())
+                self.expect("op", "]")
+            return ("list", tuple(items))
+        if kind == "name":
+            if text in KEYWORDS:
+                return ("literal", KEYWORDS[text])
+            if self.peek() == ("op", "("):
+                return self.parse_call(text)
+            return ("path", self.parse_path(text))
+        raise ConditionError(f"unexpected {text!r} in {self.source!r}")
+
+    def parse_path(self, root: str) -> Tuple[str, ...]:
+        if root not in ROOTS:
+            raise ConditionError(f"unknown name {root!r} in {self.source!r} (paths start with {', '.join(ROOTS)})")
+        parts = [root]
+        while True:
+            if self.accept("op", "."):
+                kind, text = self.advance()
+                if kind == "name":
+                    parts.append(text)
+                elif kind == "literal" and isinstance(text, int) and text >= 0:
+                    parts.append(str(text))
+                else:
+                    raise ConditionError(f"expected a field name after '.' in {self.source!r}")
+            elif self.accept("op", "["):
+                kind, text = self.advance()
+                if kind != "literal" or not isinstance(text, (str, int)) or isinstance(text, bool):
+                    raise ConditionError(f"expected a key or index inside [] in {self.source!r}")
+                parts.append(str(text))
+                self.expect("op", "]")
+            else:
+                return tuple(parts)
+
+    def parse_call(self, name: str):
+        self.expect("op", "(")
+        args = []
+        if not self.accept("op", ")"):
+            args.append(self.parse_or())
+            while self.accept("op", ","):
+                args.append(self.parse_or())
+            self.expect("op", ")")
+
+        if name == "exists":
+            if len(args) != 1 or args[0][0] != "path":
+                raise ConditionError(f"exists() takes one field path in {self.source!r}")
+            return ("exists", args[0][1])
+        if name not in FUNCTIONS:
+            raise ConditionError(f"unknown function {name}() in {self.source!r}")
+        arity = FUNCTIONS[name][0]
+        if len(args) != arity:
+            raise ConditionError(f"{name}() takes {arity} argument(s) in {self.source!r}")
+        return ("call", name, tuple(args))
+
+
+def resolve(context: Any, parts: Tuple[str, ...], default: Any = None) -> Any:
+    """Walks dict keys and list indexes; anything missing along the way is `default`"""
+    value = context
+    for part in parts:
+        if isinstance(value, Mapping):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, (list, tuple)) and part.lstrip("-").isdigit():
+            index = int(part)
+            value = value[index] if -len(value) <= index < len(value) else _MISSING
+        else:
+            return default
+        if value is _MISSING:
+            return default
+    return value
+
+
+def _guarded(func: Callable) -> Callable:
+    def call(*args):
+        try:
+            return func(*args)
+        except TypeError:
+            return False
+    return call
+
+
+# -- scalar form: one closure per node, called with the run context ---------
+
+def _scalar(node) -> Callable[[Dict[str, Any]], Any]:
+    kind = node[0]
+    if kind == "literal":
+        value = node[1]
+        return lambda context: value
+    if kind == "path":
+        parts = node[1]
+        return lambda context: resolve(context, parts)
+    if kind == "exists":
+        parts = node[1]
+        return lambda context: resolve(context, parts, _MISSING) is not _MISSING
+    if kind == "list":
+        items = [_scalar(item) for item in node[1]]
+        if all(item[0] == "literal" for item in node[1]):
+            constant = [item[1] for item in node[1]]
+            return lambda context: constant
+        return lambda context: [item(context) for item in items]
+    if kind == "not":
+        inner = _scalar(node[1])
+        return lambda context: not inner(context)
+    if kind == "and":
+        left, right = _scalar(node[1]), _scalar(node[2])
+        return lambda context: bool(left(context)) and bool(right(context))
+    if kind == "or":
+        left, right = _scalar(node[1]), _scalar(node[2])
+        return lambda context: bool(left(context)) or bool(right(context))
+    if kind == "compare":
+        op = _guarded(COMPARISONS[node[1]])
+        left, right = _scalar(node[2]), _scalar(node[3])
+        return lambda context: op(left(context), right(context))
+    if kind == "call":
+        func = _guarded(FUNCTIONS[node[1]][1])
+        args = [_scalar(arg) for arg in node[2]]
+        if len(args) == 1:
+            only = args[0]
+            return lambda context: func(only(context))
+        return lambda context: func(*(arg(context) for arg in args))
+    raise ConditionError(f"unknown node {kind!r}")
+
+
+# -- batch form: one pass per node over a column of rows ----------------------
+
+class _Const:
+    """A value shared by every row of a batch (literals, fields outside the row)"""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _column(values, size: int) -> list:
+    return [values.value] * size if isinstance(values, _Const) else values
+
+
+def _batch(node) -> Callable:
+    """
+    Compiles a node to fn(rows, scope) -> list or _Const. `scope` is
+    (row root name or None, shared context): with a root, only paths under
+    it vary per row and every other path is resolved once for the batch.
+    """
+    kind = node[0]
+    if kind == "literal":
+        constant = _Const(node[1])
+        return lambda rows, scope: constant
+    if kind in ("path", "exists"):
+        parts = node[1]
+        default = _MISSING if kind == "exists" else None
+        finish = (lambda value: value is not _MISSING) if kind == "exists" else None
+
+        def path(rows, scope):
+            root, shared = scope
+            if root is None:
+                values = [resolve(row, parts, default) for row in rows]
+            elif parts[0] != root:
+                value = resolve(shared, parts, default)
+                return _Const(finish(value) if finish else value)
+            else:
+                rest = parts[1:]
+                values = [resolve(row, rest, default) for row in rows]
+            return [finish(value) for value in values] if finish else values
+        return path
+    if kind == "list":
+        if all(item[0] == "literal" for item in node[1]):
+            constant = _Const([item[1] for item in node[1]])
+            return lambda rows, scope: constant
+        items = [_batch(item) for item in node[1]]
+        return lambda rows, scope: [list(values) for values in zip(*(_column(item(rows, scope), len(rows)) for item in items))]
+    if kind == "not":
+        inner = _batch(node[1])
+
+        def negate(rows, scope):
+            values = inner(rows, scope)
+            if isinstance(values, _Const):
+                return _Const(not values.value)
+            return [not value for value in values]
+        return negate
+    if kind in ("and", "or"):
+        return _batch_logical(kind, _batch(node[1]), _batch(node[2]))
+    if kind == "compare":
+        return _batch_compare(node[1], _batch(node[2]), _batch(node[3]))
+    if kind == "call":
+        func = _guarded(FUNCTIONS[node[1]][1])
+        args = [_batch(arg) for arg in node[2]]
+
+        def call(rows, scope):
+            columns = [arg(rows, scope) for arg in args]
+            if all(isinstance(column, _Const) for column in columns):
+                return _Const(func(*(column.value for column in columns)))
+            if len(columns) == 1:
+                return [func(value) for value in columns[0]]
+            return [func(*values) for values in zip(*(_column(column, len(rows)) for column in columns))]
+        return call
+    raise ConditionError(f"unknown node {kind!r}")
+
+
+def _batch_logical(kind: str, left, right) -> Callable:
+    """Short-circuits per row: the right side only sees rows the left side did not decide"""
+    want = kind == "and"
+
+    def logical(rows, scope):
+        first = left(rows, scope)
+        if isinstance(first, _Const):
+            if bool(first.value) != want:
+                return _Const(not want)
+            second = right(rows, scope)
+            return _Const(bool(second.value)) if isinstance(second, _Const) else [bool(value) for value in second]
+
+        pending = [index for index, value in enumerate(first) if bool(value) == want]
+        result = [not want] * len(rows)
+        if not pending:
+            return result
+        second = right([rows[index] for index in pending], scope)
+        for index, value in zip(pending, _column(second, len(pending))):
+            result[index] = bool(value)
+        return result
+    return logical
+
+
+def _batch_compare(name: str, left, right) -> Callable:
+    op = COMPARISONS[name]
+    guarded = _guarded(op)
+
+    def compare(rows, scope):
+        lhs, rhs = left(rows, scope), right(rows, scope)
+        if isinstance(lhs, _Const) and isinstance(rhs, _Const):
+            return _Const(guarded(lhs.value, rhs.value))
+        if isinstance(rhs, _Const):
+            value = rhs.value
+            if name in TOTAL_COMPARISONS:
+                return [op(item, value) for item in lhs]
+            if name in ("in", "not in") and isinstance(value, (list, tuple)):
+                # Hash lookups instead of a scan per row when every member is hashable
+                try:
+                    members = frozenset(value)
+                except TypeError:
+                    members = None
+                if members is not None:
+                    def member(item):
+                        try:
+                            return item in members
+                        except TypeError:
+                            return item in value
+                    inside = [member(item) for item in lhs]
+                    return inside if name == "in" else [not found for found in inside]
+            return [guarded(item, value) for item in lhs]
+        return [guarded(a, b) for a, b in zip(_column(lhs, len(rows)), rhs)]
+    return compare
+
+
+class Condition:
+    """
+    A compiled expression. Call it with a run context for one answer, or
+    use `evaluate_batch` / `filter_items` to answer for many rows at once.
+    Instances are immutable and shared between plans.
+    """
+
+    __slots__ = ("source", "_scalar", "_batch")
+
+    def __init__(self, source: str, tree):
+        self.source = source
+        self._scalar = _scalar(tree)
+        self._batch = _batch(tree)
+
+    def __call__(self, context: Dict[str, Any]) -> bool:
+        return bool(self._scalar(context))
+
+    def evaluate_batch(self, contexts: Sequence[Dict[str, Any]]) -> List[bool]:
+        """One answer per context, evaluated node by node across the whole batch"""
+        contexts = list(contexts)
+        return [bool(value) for value in _column(self._batch(contexts, (None, None)), len(contexts))]
+
+    def filter_items(self, items: Sequence[Any], context: Dict[str, Any], name: str = "item") -> List[bool]:
+        """
+        One answer per item, with the item bound to `name` in `context`.
+        Paths outside `name` (payload, steps) are resolved once per batch.
+        """
+        items = list(items)
+        return [bool(value) for value in _column(self._batch(items, (name, context)), len(items))]
+
+    def __repr__(self) -> str:
+        return f"Condition({self.source!r})"
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(source: str) -> Condition:
+    """Parses and compiles an expression; identical sources share one Condition"""
+    if not isinstance(source, str) or not source.strip():
+        raise ConditionError("condition expression is empty")
+    return Condition(source, Parser(source).parse())
+
+
+def from_tree(source: str, tree) -> Condition:
+    """A Condition for an already-built tree (the structured condition form)"""
+    return Condition(source, tree)
@@ -1,20 +1,151 @@
-from sqlalchemy import create_engine
+import threading
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
+# Same database through aiosqlite, for the FastAPI routers
+ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT
+}
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the log writer; NORMAL sync only fsyncs at checkpoints"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+# Engines are built on first use: workers never pay for the aiosqlite engine,
+# and importing a module never opens a pool
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine():
+    """Sync engine: scheduler, workers, log writer and CLI tools"""
+    if "sync" not in _engines:
+        with _engines_lock:
+            if "sync" not in _engines:
+                sync_engine = create_engine(
+                    SQLALCHEMY_DATABASE_URL,
+                    connect_args={"check_same_thread": False},
+                    **pool_options
+                )
+                event.listen(sync_engine, "connect", set_sqlite_pragmas)
+                _engines["sync"] = sync_engine
+    return _engines["sync"]
+
+def get_async_engine():
+    """aiosqlite engine for the FastAPI routers"""
+    if "async" not in _engines:
+        with _engines_lock:
+            if "async" not in _engines:
+                # aiosqlite defaults to NullPool (a new connection per session); pool it like the sync engine
+                async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, **pool_options)
+                event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+                _engines["async"] = async_engine
+    return _engines["async"]
+
+def __getattr__(name):
+    # `from app.services.database import engine` keeps working, lazily
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./data/automation.db"
+async def dispose_engines():
+    """Closes whichever pools were created"""
+    async_engine = _engines.get("async")
+    if async_engine is not None:
+        await async_engine.dispose()
+    sync_engine = _engines.get("sync")
+    if sync_engine is not None:
+        sync_engine.dispose()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+class LazySessionMaker(sessionmaker):
+    """Binds to its engine the first time a session is created"""
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    def __init__(self, engine_factory, **kw):
+        super().__init__(**kw)
+        self.engine_factory = engine_factory
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self.engine_factory())
+        return super().__call__(**local_kw)
+
+class LazyAsyncSessionMaker(async_sessionmaker):
+    def __init__(self, engine_factory, **kw):
+        super().__init__(**kw)
+        self.engine_factory = engine_factory
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self.engine_factory())
+        return super().__call__(**local_kw)
+
+SessionLocal = LazySessionMaker(get_engine, autocommit=False, autoflush=False)
+# expire_on_commit=False: attribute access after commit must not trigger lazy IO
+AsyncSessionLocal = LazyAsyncSessionMaker(get_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+def migrate(bind=None):
+    """
+    Creates missing tables, then applies additive upgrades. Run once per
+    deploy (`python -m app.init_db`), not on every process start.
+    """
+    import app.models  # noqa: F401 (registers the tables)
+    bind = bind or get_engine()
+    Base.metadata.create_all(bind=bind)
+    upgrade_schema(bind)
+
+def check_schema(bind=None):
+    """Fails fast, with the fix, when the migration step has not been run"""
+    import app.models  # noqa: F401 (registers the tables)
+    missing = set(Base.metadata.tables) - set(inspect(bind or get_engine()).get_table_names())
+    if missing:
+        raise RuntimeError(f"database is missing tables {', '.join(sorted(missing))}; run `python -m app.init_db` first")
+
+def upgrade_schema(bind=None):
+    """
+    Additive migration for tables that already exist: create_all() only creates
+    missing tables, so add any new model columns and indexes it would skip.
+    """
+    bind = bind or get_engine()
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -1,77 +1,499 @@
 import time
+import json
+import uuid
 import logging
-from typing import Any, Dict
-from functools import wraps
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+from functools import partial
+from dataclasses import replace
+from types import MappingProxyType
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from app.services.database import SessionLocal
+from app.services.workflow_service import get_workflow_definition
+from app.services.plan import ExecutionPlan, compile_plan, plan_cache
+from app.services.timers import timer_service
+from app.services.log_writer import log_writer
+from app.services.clients import client_registry
+from app.services.health import health_prober
+from app.services.outbound import outbound_batcher
+from app.services.ratelimit import RateLimited
+from app.services.retry import circuit_breaker, CircuitOpen, retry_delay, is_retryable
+from app.services.foreach import ForeachFailed, foreach_progress, iter_items, chunks, render_params
+from app.services.checkpoints import run_journal
+from app.services.metrics import STEP_DURATION, RUN_DURATION, STEP_RETRIES
+from app.core.config import RETRY_MAX_ATTEMPTS
 
 class ActionHandlers:
+    """
+    Step handlers. Steps that name an `integration_id` get that integration's
+    pooled client (app/services/clients.py) passed as `client`, and send
+    through the rate-limited batcher (app/services/outbound.py).
+    """
+
     @staticmethod
-    def email(params: Dict[str, Any]):
-        # Placeholder for your SMTP logic
+    def email(params: Dict[str, Any], client=None, integration_id: Optional[int] = None):
         print(f"📧 Sending Email to: {params.get('to')} | Subject: {params.get('subject')}")
+        if client is None:
+            return True
+        message = EmailMessage()
+        message["To"] = params["to"]
+        message["From"] = params.get("from") or client.username
+        message["Subject"] = params.get("subject", "")
+        message.set_content(params.get("body", ""))
+        if integration_id is None:
+            client.send_message(message)
+        else:
+            outbound_batcher.send(integration_id, message)
         return True
 
     @staticmethod
-    def whatsapp(params: Dict[str, Any]):
-        # Placeholder for your Twilio or Meta API logic
+    def whatsapp(params: Dict[str, Any], client=None, integration_id: Optional[int] = None):
         print(f"💬 Sending WhatsApp to: {params.get('phone')} | Body: {params.get('body')}")
+        if client is None:
+            return True
+        # Meta Cloud API: the integration's base_url points at /{phone-number-id}
+        message = {"path": "/messages", "json": {
+            "messaging_product": "whatsapp",
+            "to": params["phone"],
+            "type": "text",
+            "text": {"body": params.get("body", "")}
+        }}
+        if integration_id is None:
+            client.post(message["path"], json=message["json"]).raise_for_status()
+        else:
+            outbound_batcher.send(integration_id, message)
         return True
 
     @staticmethod
     def delay(params: Dict[str, Any]):
-        seconds = params.get("seconds", 5)
-        print(f"⏳ Delaying for {seconds} seconds...")
-        time.sleep(seconds)
-        return True
+        # Never sleeps: run_workflow_logic parks the run and the timer
+        # service (app/services/timers.py) resumes it when the delay is due.
+        return params.get("seconds", 5)
+
+def run_workflow_logic(
+    steps,
+    context: Optional[Dict[str, Any]] = None,
+    start_step: int = 0,
+    attempt: int = 0,
+    checkpoint: Optional[Callable] = None,
+    completed: Iterable[str] = (),
+    attempts: Optional[Dict[str, int]] = None
+):
+    """
+    The Parser: Runs a compiled plan (or a raw JSON step list) step by step.
+    `attempt` counts earlier failed tries of `start_step` when the run is a retry.
+    Step outputs are kept in `context["steps"]` by step id for later conditions.
+    `checkpoint(step, output)` is called after every completed step; DAG runs
+    resuming from a checkpoint pass the ids already `completed` and the
+    failed `attempts` per step id.
+    """
+    plan = steps if isinstance(steps, ExecutionPlan) else compile_plan(steps, ActionHandlers)
+    context = context if context is not None else {}
+    context.setdefault("steps", {})
+    if plan.is_dag:
+        return run_dag(plan, context, checkpoint=checkpoint, completed=completed, attempts=attempts)
+    result = {"status": "success", "steps_run": 0, "timings": []}
+
+    for step in plan.steps[start_step:]:
+        # 1. Delays park the run instead of holding the worker
+        if step.type == "delay":
+            seconds = step.handler(step.params)
+            if seconds > 0:
+                print(f"⏳ Parking run for {seconds} seconds at step {step.index}")
+                if checkpoint:
+                    checkpoint(step, None)
+                result["status"] = "waiting"
+                result["resume_step"] = step.index + 1
+                result["resume_at"] = time.time() + seconds
+                break
+            continue
 
-def run_workflow_logic(steps: list):
-    """The Parser: Loops through JSON steps and executes them"""
-    for step in steps:
-        action_type = step.get("type")
-        params = step.get("params", {})
-        
         # 2. Conditional Logic implementation
-        if action_type == "condition":
-            condition_met = eval_condition(params) # A helper to check logic
-            if not condition_met:
+        if step.predicate is not None:
+            if not step.predicate(context):
                 print("🚫 Condition not met, stopping flow.")
+                result["status"] = "stopped"
                 break
             continue
 
-        # 3. Dynamic Action Calling
-        handler = getattr(ActionHandlers, action_type, None)
-        if handler:
-            try:
-                # 4. Error Handling & Retries
-                execute_with_retry(handler, params)
-            except Exception as e:
-                logging.error(f"❌ Action {action_type} failed: {e}")
-                break 
-
-def execute_with_retry(func, params, retries=3):
-    """Simple Retry Logic for Pi 5 stability"""
-    for i in range(retries):
+        # 3. Dynamic Action Calling (handler resolved at compile time)
         try:
-            return func(params)
+            output = context["steps"][step.id] = timed_step(step, result["timings"], context)
+            result["steps_run"] += 1
+            if checkpoint:
+                checkpoint(step, output)
         except Exception as e:
-            if i == retries - 1: raise e
-            time.sleep(2 ** i) # Exponential backoff
-
-def retry_action(retries: int = 3, delay: int = 2):
-    """Decorator to retry actions with exponential backoff."""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            m_delay = delay
-            for i in range(retries):
+            # 4. Error Handling: park the run for a later retry instead of sleeping here
+            logging.error(f"❌ Action {step.type} failed: {e}")
+            result["error"] = f"step {step.index} ({step.type}): {e}"
+            if step.integration_id is not None:
+                result["circuit"] = {"integration_id": step.integration_id, "state": circuit_breaker.state(step.integration_id)}
+            tries = (attempt if step.index == start_step else 0) + 1
+            if is_retryable(e) and tries < RETRY_MAX_ATTEMPTS:
+                result["status"] = "retrying"
+                result["resume_step"] = step.index
+                result["resume_at"] = time.time() + backoff(e, tries - 1)
+                result["attempt"] = tries
+                result["attempts"] = {step.id: tries}
+                STEP_RETRIES.labels(step.type).inc()
+            else:
+                result["status"] = "failed"
+            break
+
+    return result
+
+def backoff(error: Exception, attempt: int) -> float:
+    """Seconds until the next try: the provider's or breaker's own wait when known"""
+    wait = retry_delay(attempt)
+    if isinstance(error, (RateLimited, CircuitOpen)):
+        wait = max(wait, error.retry_after)
+    return wait
+
+class IntegrationUnavailable(RuntimeError):
+    """The prober recently saw this step's integration fail; skip instead of retrying"""
+
+    # Retrying would only spend attempts until the next successful probe
+    retryable = False
+
+def bind_handler(step):
+    """Attaches the integration's pooled client when the step names one"""
+    if step.integration_id is None:
+        return step.handler
+    if health_prober.is_down(step.integration_id):
+        raise IntegrationUnavailable(f"integration {step.integration_id} is down")
+    client = client_registry.get(step.integration_id)
+    if step.type in ("email", "whatsapp"):
+        return partial(step.handler, client=client, integration_id=step.integration_id)
+    return partial(step.handler, client=client)
+
+def call_step(step):
+    """Runs an action step once, through its integration's circuit breaker"""
+    handler = bind_handler(step)
+    if step.integration_id is None:
+        return handler(dict(step.params))
+
+    probe = circuit_breaker.allow(step.integration_id)
+    try:
+        outcome = handler(dict(step.params))
+    except RateLimited:
+        # Our own budget, not a provider fault
+        raise
+    except Exception:
+        circuit_breaker.record(step.integration_id, False, probe=probe)
+        raise
+    circuit_breaker.record(step.integration_id, True, probe=probe)
+    return outcome
+
+def run_foreach(step, context: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Streams the step's items through its inner action, `chunk_size` at a
+    time with up to `concurrency` in flight, and checkpoints after every
+    chunk so a restarted run picks up after the last finished chunk. Only
+    aggregate counts are kept, never per-item results.
+    """
+    settings = step.params
+    run_id = context.get("run_id")
+    progress = foreach_progress.load(run_id, step.id)
+    counts = {"succeeded": progress.get("succeeded", 0), "failed": progress.get("failed", 0)}
+    if settings["where"] is not None:
+        counts["filtered"] = progress.get("filtered", 0)
+    if progress.get("done"):
+        return counts
+
+    errors = []
+    blocked = None
+    items = iter_items(settings, context, progress.get("page_cursor"), progress.get("page_offset", 0))
+    with ThreadPoolExecutor(max_workers=settings["concurrency"], thread_name_prefix="wf-foreach") as pool:
+        for chunk in chunks(items, settings["chunk_size"]):
+            selected = [item for item, _, _ in chunk]
+            if settings["where"] is not None:
+                matches = settings["where"].filter_items(selected, context)
+                selected = [item for item, match in zip(selected, matches) if match]
+                counts["filtered"] += len(chunk) - len(selected)
+            futures = [
+                pool.submit(call_step, replace(step.inner, params=MappingProxyType(render_params(step.inner.params, settings["item_params"], item))))
+                for item in selected
+            ]
+            for future in futures:
                 try:
-                    return func(*args, **kwargs)
+                    future.result()
+                    counts["succeeded"] += 1
                 except Exception as e:
-                    if i == retries - 1: # Last attempt
-                        logging.error(f"❌ Final attempt failed for {func.__name__}: {e}")
-                        raise e
-                    logging.warning(f"⚠️ {func.__name__} failed. Retrying in {m_delay}s... (Attempt {i+1}/{retries})")
-                    time.sleep(m_delay)
-                    m_delay *= 2 # Exponentially increase wait time
-            return None
-        return wrapper
-    return decorator
\ No newline at end of file
+                    counts["failed"] += 1
+                    if len(errors) < 5:
+                        errors.append(str(e))
+                    if isinstance(e, (CircuitOpen, IntegrationUnavailable)):
+                        blocked = e
+
+            _, page_cursor, index = chunk[-1]
+            foreach_progress.save(run_id, step.id, {"page_cursor": page_cursor, "page_offset": index + 1, **counts})
+            if blocked is not None:
+                # Don't burn the rest of the list against a dead provider; a retry (breaker open) resumes here
+                raise blocked
+            if settings["max_failures"] is not None and counts["failed"] > settings["max_failures"]:
+                raise ForeachFailed(f"{counts['failed']} item(s) failed, {counts['succeeded']} succeeded; first errors: {'; '.join(errors)}")
+
+    foreach_progress.save(run_id, step.id, {**counts, "done": True})
+    print(f"🔁 foreach {step.id}: {counts['succeeded']} succeeded, {counts['failed']} failed")
+    return counts
+
+def timed_step(step, timings: list, context: Optional[Dict[str, Any]] = None):
+    """Runs a step with its latency recorded in metrics and in the run's timings; returns its output"""
+    started = time.perf_counter()
+    outcome = "error"
+    entry = {"step": step.id, "type": step.type}
+    try:
+        if step.type == "foreach":
+            output = entry["items"] = run_foreach(step, context if context is not None else {})
+        else:
+            output = call_step(step)
+        outcome = "ok"
+        return output
+    finally:
+        elapsed = time.perf_counter() - started
+        STEP_DURATION.labels(step.type, outcome).observe(elapsed)
+        entry.update(ms=round(elapsed * 1000, 1), ok=outcome == "ok")
+        timings.append(entry)
+
+def _run_dag_step(step, context: Dict[str, Any], timings: list, checkpoint: Optional[Callable] = None) -> bool:
+    """Runs one DAG node once; returns False when a condition gates its dependents off"""
+    if step.predicate is not None:
+        return step.predicate(context)
+    output = context["steps"][step.id] = timed_step(step, timings, context)
+    if checkpoint:
+        checkpoint(step, output)
+    return True
+
+def run_dag(
+    plan: ExecutionPlan,
+    context: Dict[str, Any],
+    checkpoint: Optional[Callable] = None,
+    completed: Iterable[str] = (),
+    attempts: Optional[Dict[str, int]] = None
+):
+    """
+    Runs steps as soon as everything they `need` has succeeded, with at most
+    `plan.max_parallel` in flight. Dependents of a failed step or of an unmet
+    condition are skipped. With on_failure="cancel" a failure also stops
+    every branch that has not started yet. Steps in `completed` (journaled by
+    an interrupted run) count as succeeded without running again.
+
+    A step that fails with a retryable error is not retried here: its
+    dependents wait while independent branches finish, then the run comes
+    back "retrying" and is parked like a linear one. The resumed run skips
+    the journaled steps and tries the failed ones again; `attempts` carries
+    their earlier failures.
+    """
+    result = {"status": "success", "steps_run": 0, "skipped": [], "timings": []}
+    context.setdefault("steps", {})
+    completed = set(completed)
+    attempts = attempts or {}
+    # step id -> (tries so far, seconds to wait), for failures parked for another attempt
+    retries = {}
+    retry_errors = []
+    waiting_on = {step.id: set(step.needs) for step in plan.steps}
+    dependents = {step.id: [] for step in plan.steps}
+    for step in plan.steps:
+        for need in step.needs:
+            dependents[need].append(step)
+
+    ready = [step for step in plan.steps if not step.needs]
+    running = {}
+    finished = set()
+    errors = []
+    cancelled = False
+
+    def release(step):
+        for dependent in dependents[step.id]:
+            waiting_on[dependent.id].discard(step.id)
+            if not waiting_on[dependent.id]:
+                ready.append(dependent)
+
+    with ThreadPoolExecutor(max_workers=plan.max_parallel, thread_name_prefix="wf-dag") as pool:
+        while ready or running:
+            while ready and not cancelled and len(running) < plan.max_parallel:
+                step = ready.pop(0)
+                if step.id in completed:
+                    finished.add(step.id)
+                    release(step)
+                    continue
+                running[pool.submit(_run_dag_step, step, context, result["timings"], checkpoint)] = step
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                finished.add(step.id)
+                try:
+                    proceed = future.result()
+                except Exception as e:
+                    logging.error(f"❌ Action {step.type} ({step.id}) failed: {e}")
+                    tries = attempts.get(step.id, 0) + 1
+                    if is_retryable(e) and tries < RETRY_MAX_ATTEMPTS:
+                        # Its dependents wait for the retry; other branches carry on
+                        retries[step.id] = (tries, backoff(e, tries - 1))
+                        retry_errors.append(f"step {step.id} ({step.type}): {e}")
+                        STEP_RETRIES.labels(step.type).inc()
+                        continue
+                    errors.append(f"step {step.id} ({step.type}): {e}")
+                    if plan.on_failure == "cancel":
+                        cancelled = True
+                    continue
+
+                if step.predicate is None:
+                    result["steps_run"] += 1
+                if not proceed:
+                    print(f"🚫 Condition {step.id} not met, skipping its branch.")
+                    continue
+                release(step)
+
+    result["skipped"] = [step.id for step in plan.steps if step.id not in finished]
+    if errors:
+        result["status"] = "failed"
+        result["error"] = "; ".join(errors + retry_errors)
+    elif retries:
+        first = min((step for step in plan.steps if step.id in retries), key=lambda step: step.index)
+        result["status"] = "retrying"
+        result["error"] = "; ".join(retry_errors)
+        result["resume_step"] = first.index
+        result["attempt"] = retries[first.id][0]
+        result["attempts"] = {step_id: tries for step_id, (tries, _) in retries.items()}
+        # Late enough for every parked step's backoff (or breaker cooldown)
+        result["resume_at"] = time.time() + max(wait for _, wait in retries.values())
+    return result
+
+def execute_workflow(
+    workflow_id: int,
+    payload: Optional[Dict[str, Any]] = None,
+    run_id: Optional[str] = None,
+    start_step: int = 0,
+    attempt: int = 0,
+    retries: int = 0,
+    task_id: Optional[str] = None
+):
+    """
+    Loads a workflow, runs its steps and records the outcome as a TaskLog.
+    Runs whose TaskLog already exists (queued by the ingestion path, or
+    resumed after a delay or retry at `start_step`) pass its `run_id`.
+    `attempt` counts failed tries of `start_step`, `retries` every retry
+    the run has made so far.
+
+    Every completed step is journaled (app/services/checkpoints.py), so a
+    redelivered or recovered run continues after its last completed step.
+    New runs take the queue `task_id` as their run id, which is what makes
+    a redelivery of the same task find its journal.
+    """
+    db = SessionLocal()
+    try:
+        definition = get_workflow_definition(workflow_id, db)
+    finally:
+        db.close()
+    if definition is None:
+        logging.error(f"❌ Workflow {workflow_id} not found")
+        if run_id is not None:
+            # The run's TaskLog was written at ingest; close it so it does not sit "queued" forever
+            log_writer.update(
+                run_id,
+                status="failed",
+                error_message=f"Workflow {workflow_id} not found",
+                completed_at=datetime.utcnow()
+            )
+        return None
+
+    fresh = run_id is None
+    run_id = run_id or task_id or uuid.uuid4().hex
+    cursor, held = run_journal.start(run_id, workflow_id, payload)
+    if cursor and cursor["done"]:
+        print(f"⏭️ Run {run_id} already finished ({cursor['done']}), dropping redelivery")
+        return cursor["done"]
+    if not held or (cursor and cursor["parked_until"] and cursor["parked_until"] > time.time() + 1):
+        print(f"⏭️ Run {run_id} is running or parked elsewhere, dropping duplicate")
+        return None
+
+    completed = ()
+    outputs = {}
+    if cursor:
+        completed = cursor["completed"]
+        outputs = dict(cursor["outputs"])
+        start_step = max(start_step, cursor["next_step"])
+        if completed:
+            print(f"♻️ Resuming run {run_id} after {len(completed)} journaled step(s)")
+
+    if fresh and cursor is None:
+        log_writer.create(workflow_id, "running", run_id=run_id)
+    else:
+        log_writer.update(run_id, status="running")
+
+    outcome = {}
+    result = {}
+    started = time.perf_counter()
+    try:
+        plan = plan_cache.get(definition, ActionHandlers)
+        if cursor and start_step < len(plan.steps):
+            attempt = max(attempt, cursor["attempts"].get(plan.steps[start_step].id, 0))
+        result = run_workflow_logic(
+            plan,
+            {"payload": payload or {}, "run_id": run_id, "steps": outputs},
+            start_step=start_step,
+            attempt=attempt,
+            checkpoint=partial(run_journal.record, run_id),
+            completed=completed,
+            attempts=cursor["attempts"] if cursor else None
+        )
+        result["run_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        RUN_DURATION.labels(result["status"]).observe(result["run_ms"] / 1000)
+        if result["status"] == "waiting":
+            timer_service.schedule(workflow_id, run_id, result["resume_step"], result["resume_at"], payload, retries=retries)
+            run_journal.park(run_id, result["resume_at"])
+            log_writer.update(run_id, status="waiting", execution_data=json.dumps(run_data(payload, result)))
+            return "waiting"
+        if result["status"] == "retrying":
+            print(f"🔁 Retrying step {result['resume_step']} of run {run_id} in {result['resume_at'] - time.time():.1f}s")
+            for step in plan.steps:
+                if step.id in result["attempts"]:
+                    run_journal.record_attempt(run_id, step, result["attempts"][step.id])
+            timer_service.schedule(
+                workflow_id, run_id, result["resume_step"], result["resume_at"], payload,
+                action="retry", attempt=result["attempt"], retries=retries + 1
+            )
+            run_journal.park(run_id, result["resume_at"])
+            log_writer.update(
+                run_id,
+                status="retrying",
+                attempts=retries + 1,
+                error_message=result["error"],
+                execution_data=json.dumps(run_data(payload, result))
+            )
+            return "retrying"
+        outcome["status"] = "failed" if result["status"] == "failed" else "success"
+        outcome["error_message"] = result.get("error")
+    except Exception as e:
+        logging.error(f"❌ Workflow {workflow_id} failed: {e}")
+        outcome["status"] = "failed"
+        outcome["error_message"] = str(e)
+        RUN_DURATION.labels("failed").observe(time.perf_counter() - started)
+
+    outcome["completed_at"] = datetime.utcnow()
+    data = run_data(payload, result)
+    if data:
+        outcome["execution_data"] = json.dumps(data)
+    log_writer.update(run_id, **outcome)
+    run_journal.finish(run_id, outcome["status"])
+    return outcome["status"]
+
+def run_data(payload: Optional[Dict[str, Any]], result: Dict[str, Any]) -> Dict[str, Any]:
+    """What a TaskLog keeps in execution_data: payload, timings and the breaker seen at failure"""
+    data = {}
+    if payload:
+        data["payload"] = payload
+    if "run_ms" in result:
+        data["timings"] = {"run_ms": result["run_ms"], "steps": result.get("timings", [])}
+        foreach = {timing["step"]: timing["items"] for timing in result.get("timings", []) if "items" in timing}
+        if foreach:
+            data["foreach"] = foreach
+    if result.get("circuit"):
+        data["circuit"] = result["circuit"]
+    return data
@@ -0,0 +1,127 @@
+from itertools import islice
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.core.config import redis_client, FOREACH_CHECKPOINT_TTL
+from app.services.clients import client_registry
+from app.services.ratelimit import rate_limiter
+
+CHECKPOINT_KEY = "foreach:{run_id}:{step_id}"
+
+
+class ForeachFailed(RuntimeError):
+    """More items failed than the step's `max_failures` allows"""
+
+    # Failed items are not re-sent, so retrying the step cannot help
+    retryable = False
+
+
+def resolve(value: Any, path: Tuple[str, ...]) -> Any:
+    """Walks a dotted path through dicts; an empty path is the value itself"""
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def render_params(static: Dict[str, Any], mapping: Dict[str, Tuple[str, ...]], item: Any) -> Dict[str, Any]:
+    """The inner step's params for one item: static params plus fields taken from the item"""
+    params = dict(static)
+    for name, path in mapping.items():
+        params[name] = resolve(item, path)
+    return params
+
+
+def fetch_pages(source: Dict[str, Any], cursor: Optional[str]) -> Iterator[Tuple[Optional[str], list]]:
+    """
+    Pages through an integration's list endpoint, one page in memory at a
+    time. Yields (cursor that fetched the page, items).
+    """
+    integration_id = source["integration_id"]
+    client = client_registry.get(integration_id)
+    while True:
+        params = dict(source.get("params") or {})
+        if cursor is not None:
+            params[source.get("cursor_param", "cursor")] = cursor
+        rate_limiter.acquire(integration_id)
+        response = client.get(source["path"], params=params)
+        response.raise_for_status()
+        body = response.json()
+        items = resolve(body, source["items_field"]) or []
+        yield cursor, items
+        cursor = resolve(body, source["next_field"])
+        if not cursor or not items:
+            return
+
+
+def iter_items(settings: Dict[str, Any], context: Dict[str, Any], page_cursor: Optional[str] = None, page_offset: int = 0):
+    """
+    Yields (item, page cursor, index in page) starting after a checkpoint.
+    Inline lists are a single page with no cursor.
+    """
+    if settings["source"] is None:
+        items = resolve(context, settings["items"]) or []
+        for index in range(page_offset, len(items)):
+            yield items[index], None, index
+        return
+
+    skip = page_offset
+    for cursor, items in fetch_pages(settings["source"], page_cursor):
+        for index in range(skip, len(items)):
+            yield items[index], cursor, index
+        skip = 0
+
+
+def chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ForeachProgress:
+    """
+    Per-run, per-step checkpoints in a Redis hash, written after every chunk:
+    where to resume in the source and the counts so far. A finished step is
+    marked `done`, so a replayed run does not send to the list again.
+    """
+
+    def __init__(self, client=None, ttl: int = FOREACH_CHECKPOINT_TTL):
+        self.redis = client or redis_client
+        self.ttl = ttl
+
+    def load(self, run_id: Optional[str], step_id: str) -> Dict[str, Any]:
+        if not run_id:
+            return {}
+        saved = self.redis.hgetall(CHECKPOINT_KEY.format(run_id=run_id, step_id=step_id))
+        if not saved:
+            return {}
+        return {
+            "page_cursor": saved.get("page_cursor") or None,
+            "page_offset": int(saved.get("page_offset", 0)),
+            "succeeded": int(saved.get("succeeded", 0)),
+            "failed": int(saved.get("failed", 0)),
+            "filtered": int(saved.get("filtered", 0)),
+            "done": saved.get("done") == "1",
+        }
+
+    def save(self, run_id: Optional[str], step_id: str, progress: Dict[str, Any]):
+        if not run_id:
+            return
+        key = CHECKPOINT_KEY.format(run_id=run_id, step_id=step_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping={
+            "page_cursor": progress.get("page_cursor") or "",
+            "page_offset": progress.get("page_offset", 0),
+            "succeeded": progress["succeeded"],
+            "failed": progress["failed"],
+            "filtered": progress.get("filtered", 0),
+            "done": "1" if progress.get("done") else "0",
+        })
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+
+foreach_progress = ForeachProgress()
@@ -0,0 +1,193 @@
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+import redis
+from sqlalchemy import select, update
+
+from app.core.config import redis_client, HEALTH_PROBE_INTERVAL, HEALTH_PROBE_TIMEOUT
+from app.services.database import SessionLocal
+from app.services.clients import client_registry
+from app.services.changes import change_feed
+from app.models import Integration
+
+HEALTH_KEY = "integration_health"
+LOCK_KEY = "integration_health:lock"
+
+
+def probe_client(client, config: Dict[str, Any]):
+    """Raises if the integration's pooled client cannot reach its service"""
+    if hasattr(client, "ping"):
+        # redis.Redis and SMTPClient
+        client.ping()
+    else:
+        response = client.get(config.get("health_path", "/"))
+        if response.status_code >= 500:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+
+class HealthProber:
+    """
+    Probes every integration concurrently on a schedule and caches the result
+    in a Redis hash, so the health endpoints and the executor read a cached
+    status instead of calling external services.
+
+    Only one process probes per interval (a Redis NX lock), however many API
+    replicas run this thread.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        session_factory=SessionLocal,
+        registry=client_registry,
+        interval: int = HEALTH_PROBE_INTERVAL,
+        timeout: float = HEALTH_PROBE_TIMEOUT,
+        max_workers: int = 16
+    ):
+        self.redis = client or redis_client
+        self.session_factory = session_factory
+        self.registry = registry
+        self.interval = interval
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="health-probe")
+        self.stopping = threading.Event()
+        self._thread = None
+        # Short-lived local copy of the Redis hash for the executor's hot path
+        self._down = set()
+        self._down_loaded_at = 0.0
+
+    def _probe(self, integration_id: int, config: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            probe_client(self.registry.get(integration_id), config)
+            status, error = "healthy", None
+        except Exception as e:
+            status, error = "unhealthy", str(e)
+        return {
+            "integration_id": integration_id,
+            "status": status,
+            "error": error,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "checked_at": time.time()
+        }
+
+    def probe_all(self) -> List[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            integrations = db.execute(select(Integration.id, Integration.config, Integration.is_connected)).all()
+        finally:
+            db.close()
+
+        futures = {
+            self.pool.submit(self._probe, row.id, row.config or {}): row
+            for row in integrations
+        }
+        wait(futures, timeout=self.timeout)
+
+        results = []
+        for future, row in futures.items():
+            if future.done():
+                result = future.result()
+            else:
+                # The probe thread finishes on its own; we just stop waiting for it
+                future.cancel()
+                result = {
+                    "integration_id": row.id,
+                    "status": "unhealthy",
+                    "error": f"probe timed out after {self.timeout}s",
+                    "latency_ms": self.timeout * 1000,
+                    "checked_at": time.time()
+                }
+            result["was_connected"] = bool(row.is_connected)
+            results.append(result)
+
+        self._store(results)
+        return results
+
+    def _store(self, results: List[Dict[str, Any]]):
+        if results:
+            self.redis.hset(HEALTH_KEY, mapping={
+                str(result["integration_id"]): json.dumps(result) for result in results
+            })
+
+        changed = [r for r in results if (r["status"] == "healthy") != r["was_connected"]]
+        if not changed:
+            return
+        db = self.session_factory()
+        try:
+            for result in changed:
+                db.execute(
+                    update(Integration)
+                    .where(Integration.id == result["integration_id"])
+                    .values(is_connected=result["status"] == "healthy")
+                )
+            db.commit()
+        finally:
+            db.close()
+        change_feed.bump("integrations", {
+            "op": "health",
+            "ids": [result["integration_id"] for result in changed]
+        })
+
+    def get_status(self, integration_id: int) -> Optional[Dict[str, Any]]:
+        raw = self.redis.hget(HEALTH_KEY, str(integration_id))
+        return self._with_staleness(json.loads(raw)) if raw else None
+
+    def get_all(self) -> List[Dict[str, Any]]:
+        return [self._with_staleness(json.loads(raw)) for raw in self.redis.hvals(HEALTH_KEY)]
+
+    def forget(self, integration_id: int):
+        self.redis.hdel(HEALTH_KEY, str(integration_id))
+
+    def _with_staleness(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        age = time.time() - result["checked_at"]
+        result["age_seconds"] = round(age, 1)
+        result["stale"] = age > 2 * self.interval
+        return result
+
+    def is_down(self, integration_id: int) -> bool:
+        """Cheap check for the executor: known-unhealthy and not stale"""
+        now = time.monotonic()
+        if now - self._down_loaded_at > 5:
+            try:
+                self._down = {
+                    result["integration_id"] for result in self.get_all()
+                    if result["status"] == "unhealthy" and not result["stale"]
+                }
+            except redis.RedisError:
+                # Without health data, let the step try the integration itself
+                self._down = set()
+            self._down_loaded_at = now
+        return integration_id in self._down
+
+    def run_once(self) -> bool:
+        """Probes if no other process has this interval; returns whether it probed"""
+        if not self.redis.set(LOCK_KEY, "1", nx=True, ex=max(1, self.interval - 1)):
+            return False
+        self.probe_all()
+        return True
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"❌ Integration health probe failed: {e}")
+            self.stopping.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+
+health_prober = HealthProber()
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+import orjson
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy import select
+
+from app.core.config import LIST_CACHE_SIZE
+from app.services.changes import change_feed
+
+
+def projection(model, schema: Type[BaseModel], order_by=None):
+    """SELECT of exactly the columns `schema` exposes, so list rows skip the ORM"""
+    query = select(*(getattr(model, field) for field in schema.model_fields))
+    return query.order_by(*(order_by or (model.id,)))
+
+
+def rows_to_dicts(result) -> List[Dict[str, Any]]:
+    return [dict(row) for row in result.mappings()]
+
+
+class ListCache:
+    """
+    The last rendered body of each list URL, tagged with its ETag. A hit
+    means the tables behind it have not changed since it was rendered, so
+    the body is served without touching the database or re-serializing.
+    """
+
+    def __init__(self, size: int = LIST_CACHE_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[str, Tuple[str, bytes, Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"not_modified": 0, "hits": 0, "misses": 0}
+
+    def get(self, key: str, etag: str) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key: str, etag: str, body: bytes, headers: Dict[str, str]):
+        with self._lock:
+            self._entries[key] = (etag, body, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+list_cache = ListCache()
+
+# Loaders return the rows plus any extra headers (e.g. X-Next-Cursor)
+Loader = Callable[[], Awaitable[Tuple[List[Dict[str, Any]], Dict[str, str]]]]
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+
+async def conditional_list(request: Request, tables: Tuple[str, ...], load: Loader) -> Response:
+    """
+    Serves a list endpoint with a weak ETag built from the version counters
+    of `tables` and the query string. The counters are read before the
+    query runs, so a write racing the read can only make the tag older
+    than the body, never newer: clients refetch once more instead of
+    keeping stale data. When the counters are unavailable the list is
+    served without an ETag.
+    """
+    versions = change_feed.local_versions(tables)
+    if versions is None:
+        # Listener not live yet: the counters come from Redis, off the event loop
+        versions = await run_in_threadpool(change_feed.versions, tables)
+    if versions is None:
+        rows, headers = await load()
+        return Response(orjson.dumps(rows), media_type="application/json", headers=headers)
+
+    key = f"{request.url.path}?{request.url.query}"
+    digest = hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+    etag = f'W/"{digest}-{"-".join(map(str, versions))}"'
+    # no-cache: browsers may store the body but must revalidate it every time
+    base = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _matches(request.headers.get("if-none-match"), etag):
+        list_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=base)
+
+    cached = list_cache.get(key, etag)
+    if cached is not None:
+        list_cache.stats["hits"] += 1
+        body, headers = cached
+    else:
+        list_cache.stats["misses"] += 1
+        rows, headers = await load()
+        body = orjson.dumps(rows)
+        list_cache.put(key, etag, body, headers)
+    return Response(body, media_type="application/json", headers={**base, **headers})
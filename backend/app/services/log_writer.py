@@ -0,0 +1,255 @@
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as upsert
+
+from app.core.config import LOG_WRITER_BATCH_SIZE, LOG_WRITER_FLUSH_INTERVAL, LOG_WRITER_BUFFER_SIZE, LOG_WRITER_RETRIES
+from app.services.database import SessionLocal
+from app.services.changes import change_feed
+from app.services.payloads import encode_payload, truncate_error
+from app.models import TaskLog, TaskLogPayload
+
+# Columns every buffered insert carries, so a batch is one executemany
+# (execution_data is not one: it goes to task_log_payloads, compressed)
+INSERT_COLUMNS = ("run_id", "workflow_id", "status", "started_at", "completed_at", "error_message", "attempts")
+
+
+def _insert_rows():
+    """
+    INSERT for buffered creates. The row may already exist when another
+    process's updates for the run committed first (a worker finishing a run
+    before the API flushed its 'queued' row): its status is newer, so only
+    what those updates could not know is filled in.
+    """
+    statement = upsert(TaskLog)
+    return statement.on_conflict_do_update(
+        index_elements=[TaskLog.run_id],
+        set_={
+            "workflow_id": func.coalesce(TaskLog.workflow_id, statement.excluded.workflow_id),
+            "started_at": func.min(TaskLog.started_at, statement.excluded.started_at)
+        }
+    )
+
+
+def _update_row(run_id: str, fields: Dict[str, Any]):
+    """UPDATE of one run's row that creates it when the insert has not landed yet"""
+    row = dict.fromkeys(INSERT_COLUMNS)
+    row.update({"status": "queued", "attempts": 0}, **fields)
+    row["run_id"] = run_id
+    row["started_at"] = row["started_at"] or row["completed_at"] or datetime.utcnow()
+    return upsert(TaskLog).values(**row).on_conflict_do_update(index_elements=[TaskLog.run_id], set_=fields)
+
+
+class LogBufferFull(RuntimeError):
+    """Raised when the write-behind buffer stays full longer than the put timeout"""
+
+
+class LogWriter:
+    """
+    Write-behind persistence for TaskLog rows.
+
+    Callers enqueue inserts and status updates (keyed by `run_id`, which is
+    assigned up front so no caller has to wait for an autoincrement id).
+    execution_data is compressed on the caller's thread and goes to
+    task_log_payloads; error_message is capped. A background thread flushes
+    them in one transaction per batch, when the batch is full or
+    `flush_interval` has passed. Updates to rows inserted in the same batch
+    are folded into the insert; the rest are upserts, since the insert may
+    come from another process (the API's 'queued' row) and land after the
+    worker's updates. When the buffer is full, producers block for up to
+    `put_timeout` seconds and then get LogBufferFull.
+
+    A batch that fails on a transient error ("database is locked") is
+    retried with backoff; one that keeps failing is written one change at a
+    time, so only the change that cannot be written is dropped.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_size: int = LOG_WRITER_BATCH_SIZE,
+        flush_interval: float = LOG_WRITER_FLUSH_INTERVAL,
+        buffer_size: int = LOG_WRITER_BUFFER_SIZE,
+        put_timeout: float = 5.0,
+        retries: int = LOG_WRITER_RETRIES,
+        retry_backoff: float = 0.1
+    ):
+        self.session_factory = session_factory
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.buffer = queue.Queue(maxsize=buffer_size)
+        self.stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _put(self, op):
+        self.start()
+        try:
+            self.buffer.put(op, timeout=self.put_timeout)
+        except queue.Full:
+            raise LogBufferFull(f"TaskLog buffer full ({self.buffer.maxsize} pending writes)")
+
+    @staticmethod
+    def _payload(run_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Pops execution_data out of `fields` as an encoded payload row"""
+        if fields.get("error_message") is not None:
+            fields["error_message"] = truncate_error(fields["error_message"])
+        text = fields.pop("execution_data", None)
+        return encode_payload(run_id, text) if text is not None else None
+
+    def create(self, workflow_id: Optional[int], status: str, run_id: Optional[str] = None, **fields) -> str:
+        """Buffers a new TaskLog row and returns its run id"""
+        run_id = run_id or uuid.uuid4().hex
+        payload = self._payload(run_id, fields)
+        row = dict.fromkeys(INSERT_COLUMNS)
+        row.update(fields)
+        row["run_id"] = run_id
+        row["workflow_id"] = workflow_id
+        row["status"] = status
+        row["started_at"] = row["started_at"] or datetime.utcnow()
+        row["attempts"] = row["attempts"] or 0
+        self._put(("insert", row))
+        if payload is not None:
+            self._put(("payload", payload))
+        return run_id
+
+    def update(self, run_id: str, **fields):
+        """Buffers a partial update (status, completed_at, execution_data, ...) for a run"""
+        payload = self._payload(run_id, fields)
+        if fields:
+            self._put(("update", run_id, fields))
+        if payload is not None:
+            self._put(("payload", payload))
+
+    def _drain(self, first) -> list:
+        ops = [first]
+        while len(ops) < self.batch_size:
+            try:
+                ops.append(self.buffer.get_nowait())
+            except queue.Empty:
+                break
+        return ops
+
+    def _write(self, ops: list, retries: Optional[int] = None):
+        """Commits `ops` as one batch, falling back to one transaction per op"""
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                self._commit(ops)
+                return
+            except OperationalError as e:
+                error = e
+                if attempt < retries:
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+            except Exception as e:
+                error = e
+                break
+
+        if len(ops) == 1:
+            op = ops[0]
+            run_id = op[1] if op[0] == "update" else op[1]["run_id"]
+            logging.error(f"❌ Dropped a TaskLog {op[0]} for run {run_id}: {error}")
+            return
+        logging.warning(f"⚠️ Failed to write {len(ops)} TaskLog change(s) ({error}); writing them one at a time")
+        for op in ops:
+            self._write([op], retries=1)
+
+    def _commit(self, ops: list):
+        inserts = {}
+        updates = []
+        payloads = {}
+        for op in ops:
+            if op[0] == "insert":
+                # A copy: updates are folded in, and a retry starts from the original
+                inserts[op[1]["run_id"]] = dict(op[1])
+            elif op[0] == "payload":
+                # A run's later payload replaces its earlier one
+                payloads[op[1]["run_id"]] = op[1]
+            elif op[1] in inserts:
+                inserts[op[1]].update(op[2])
+            else:
+                updates.append((op[1], op[2]))
+
+        db = self.session_factory()
+        try:
+            if inserts:
+                db.execute(_insert_rows(), list(inserts.values()))
+            for run_id, fields in updates:
+                db.execute(_update_row(run_id, fields))
+            if payloads:
+                db.execute(delete(TaskLogPayload).where(TaskLogPayload.run_id.in_(list(payloads))))
+                db.execute(insert(TaskLogPayload), list(payloads.values()))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # One version bump and one stream message per batch, not per row
+        change_feed.bump("task_logs", {
+            "created": list(inserts.values()),
+            "updated": [{"run_id": run_id, **fields} for run_id, fields in updates]
+        })
+
+    def flush(self):
+        """Writes everything buffered so far; safe to call from any thread"""
+        with self._flush_lock:
+            while True:
+                try:
+                    first = self.buffer.get_nowait()
+                except queue.Empty:
+                    return
+                self._write(self._drain(first))
+
+    def _run(self):
+        while not self.stopping.is_set():
+            # Hold the flush lock while an op is out of the buffer, so a
+            # concurrent flush() cannot write later ops ahead of it
+            with self._flush_lock:
+                try:
+                    first = self.buffer.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                # Give a burst a moment to fill the batch before paying for a commit
+                deadline = time.monotonic() + self.flush_interval
+                while self.buffer.qsize() + 1 < self.batch_size and time.monotonic() < deadline:
+                    if self.stopping.wait(0.01):
+                        break
+                self._write(self._drain(first))
+        self.flush()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="tasklog-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flushes the buffer and stops the background thread"""
+        self.stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.stop)
@@ -0,0 +1,113 @@
+import time
+import logging
+
+import redis
+from prometheus_client import Counter, Histogram, REGISTRY, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import redis_client
+from app.services.queue import QUEUE_KEY, PROCESSING_KEY
+from app.services.timers import TIMERS_KEY
+from app.services.workflow_service import definition_cache
+
+# Buckets span a fast in-process step (ms) to a slow provider call (tens of s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STEP_DURATION = Histogram(
+    "workflow_step_duration_seconds", "Time spent in one action step", ["action", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+RUN_DURATION = Histogram(
+    "workflow_run_duration_seconds", "Time a worker spent on one run (or one resumed segment of it)", ["status"],
+    buckets=LATENCY_BUCKETS + (120, 300)
+)
+QUEUE_WAIT = Histogram(
+    "workflow_queue_wait_seconds", "Time between a task becoming due and a worker starting it",
+    buckets=LATENCY_BUCKETS + (120, 300)
+)
+STEP_RETRIES = Counter("workflow_step_retries_total", "Step retries scheduled", ["action"])
+SCHEDULER_LAG = Histogram(
+    "scheduler_dispatch_lag_seconds", "Delay between a cron fire time and its enqueue",
+    buckets=LATENCY_BUCKETS
+)
+DB_COMMIT_DURATION = Histogram(
+    "db_commit_duration_seconds", "Session commit time, including the flush",
+    buckets=LATENCY_BUCKETS
+)
+
+
+@event.listens_for(Session, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_DURATION.observe(time.perf_counter() - started)
+
+
+class QueueCollector:
+    """Reads queue depths from Redis at scrape time rather than tracking them"""
+
+    def __init__(self, client=None):
+        self.redis = client or redis_client
+
+    def describe(self):
+        # Without this the registry calls collect() at registration, i.e. Redis IO on import
+        yield GaugeMetricFamily("workflow_queue_depth", "Tasks per queue stage", labels=["stage"])
+
+    def collect(self):
+        depth = GaugeMetricFamily("workflow_queue_depth", "Tasks per queue stage", labels=["stage"])
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.llen(QUEUE_KEY)
+            pipe.llen(PROCESSING_KEY)
+            pipe.zcard(TIMERS_KEY)
+            queued, processing, timers = pipe.execute()
+        except redis.RedisError as e:
+            logging.warning(f"⚠️ Could not read queue depth for metrics: {e}")
+            return
+        depth.add_metric(["queued"], queued)
+        depth.add_metric(["processing"], processing)
+        depth.add_metric(["timers"], timers)
+        yield depth
+
+
+class DefinitionCacheCollector:
+    """Exposes this process's workflow definition cache counters"""
+
+    def collect(self):
+        stats = definition_cache.get_stats()
+        lookups = CounterMetricFamily("workflow_definition_cache_lookups", "Definition lookups by where they were served", labels=["result"])
+        lookups.add_metric(["local_hit"], stats["local_hits"])
+        lookups.add_metric(["redis_hit"], stats["redis_hits"])
+        lookups.add_metric(["miss"], stats["misses"])
+        yield lookups
+        yield GaugeMetricFamily("workflow_definition_cache_size", "Definitions held in the local LRU", value=stats["size"])
+        if stats["hit_ratio"] is not None:
+            yield GaugeMetricFamily("workflow_definition_cache_hit_ratio", "Share of lookups served from a cache", value=stats["hit_ratio"])
+
+
+REGISTRY.register(QueueCollector())
+REGISTRY.register(DefinitionCacheCollector())
+
+
+def serve_metrics(port: int) -> bool:
+    """
+    Exposes /metrics for processes without the API (worker, scheduler); 0
+    disables. A port another process already holds is logged, not fatal:
+    the process runs without its own metrics endpoint.
+    """
+    if not port:
+        return False
+    try:
+        start_http_server(port)
+    except OSError as e:
+        logging.warning(f"⚠️ Metrics disabled: cannot listen on :{port} ({e}); set another port for this process")
+        return False
+    print(f"📈 Metrics on :{port}/metrics")
+    return True
@@ -0,0 +1,193 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Tuple
+
+from app.core.config import OUTBOUND_BATCH_SIZE, OUTBOUND_BATCH_LINGER, OUTBOUND_SEND_TIMEOUT
+from app.services.clients import client_registry
+from app.services.ratelimit import rate_limiter, RateLimited
+
+
+def retry_after(response, default: float = 1.0) -> float:
+    try:
+        return max(float(response.headers.get("Retry-After", default)), 0.1)
+    except (TypeError, ValueError):
+        return default
+
+
+class OutboundBatcher:
+    """
+    Groups outbound messages for the same integration from concurrent runs.
+
+    Handlers `send()` a message and block until it is delivered. Messages
+    queue per integration for up to `linger` seconds (or until `max_batch`
+    are waiting), then go out together: one rate-limiter call for the whole
+    batch, and one provider request (the integration's `config.bulk_path`)
+    or one SMTP session for all of them. A 429 from the provider pauses the
+    integration for every worker via the shared limiter.
+
+    HTTP messages are {"path": ..., "json": ...}; SMTP messages are
+    `email.message.EmailMessage` objects.
+    """
+
+    def __init__(
+        self,
+        limiter=rate_limiter,
+        registry=client_registry,
+        max_batch: int = OUTBOUND_BATCH_SIZE,
+        linger: float = OUTBOUND_BATCH_LINGER,
+        max_workers: int = 8
+    ):
+        self.limiter = limiter
+        self.registry = registry
+        self.max_batch = max_batch
+        self.linger = linger
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="outbound")
+        self.stopping = threading.Event()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, integration_id: int, message) -> Future:
+        future = Future()
+        self.start()
+        with self._cond:
+            batch = self._pending.setdefault(integration_id, {"items": [], "since": time.monotonic()})
+            batch["items"].append((message, future))
+            if len(batch["items"]) in (1, self.max_batch):
+                self._cond.notify()
+        return future
+
+    def send(self, integration_id: int, message, timeout: float = OUTBOUND_SEND_TIMEOUT):
+        """Queues a message and waits for its delivery; raises the send error, or TimeoutError"""
+        future = self.submit(integration_id, message)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # Not picked up for delivery yet: drop it so a retry cannot double-send
+            if future.cancel():
+                raise TimeoutError(f"message to integration {integration_id} not sent within {timeout}s")
+            # Already being delivered: its outcome is moments away
+            return future.result()
+
+    def _take_ready(self, force: bool = False) -> Tuple[List[tuple], float]:
+        """Pops batches that are full or have lingered; returns (ready, seconds to next)"""
+        now = time.monotonic()
+        ready = []
+        next_due = self.linger
+        for integration_id, batch in list(self._pending.items()):
+            age = now - batch["since"]
+            if force or age >= self.linger or len(batch["items"]) >= self.max_batch:
+                ready.append((integration_id, self._pending.pop(integration_id)["items"]))
+            else:
+                next_due = min(next_due, self.linger - age)
+        return ready, next_due
+
+    def _run(self):
+        while not self.stopping.is_set():
+            with self._cond:
+                ready, next_due = self._take_ready()
+                if not ready:
+                    # Idle until a message arrives, otherwise until the oldest batch is due
+                    self._cond.wait(next_due if self._pending else None)
+                    continue
+            for integration_id, items in ready:
+                self.pool.submit(self._flush, integration_id, items)
+
+    def _flush(self, integration_id: int, items: list):
+        try:
+            limit = self.limiter.limits(integration_id)
+            # limits() never reports a burst under one message
+            chunk = min(self.max_batch, int(limit["burst"])) if limit else self.max_batch
+        except Exception as e:
+            self._resolve(items, [e] * len(items))
+            return
+
+        for start in range(0, len(items), chunk):
+            part = items[start:start + chunk]
+            try:
+                self.limiter.acquire(integration_id, cost=len(part))
+            except Exception as e:
+                self._resolve(part, [e] * len(part))
+                continue
+            # Drop messages whose sender timed out; the rest can no longer be cancelled
+            part = [item for item in part if item[1].set_running_or_notify_cancel()]
+            if not part:
+                continue
+            try:
+                results = self._deliver(integration_id, [message for message, _ in part])
+            except Exception as e:
+                results = [e] * len(part)
+            self._resolve(part, results)
+
+    @staticmethod
+    def _resolve(items: list, results: list):
+        for (_, future), result in zip(items, results):
+            if future.done():
+                # Cancelled by a sender that timed out
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _deliver(self, integration_id: int, messages: list) -> list:
+        """Sends one batch; returns the exception (or None) for each message"""
+        client = self.registry.get(integration_id)
+        if hasattr(client, "send_messages"):
+            return client.send_messages(messages)
+
+        bulk_path = self.registry.settings(integration_id)["config"].get("bulk_path")
+        if bulk_path:
+            response = client.post(bulk_path, json={"messages": [message["json"] for message in messages]})
+            self._check(integration_id, response)
+            return [None] * len(messages)
+
+        results = []
+        for index, message in enumerate(messages):
+            try:
+                self._check(integration_id, client.post(message["path"], json=message["json"]))
+                results.append(None)
+            except RateLimited as e:
+                # The rest of the batch would be throttled too
+                results.extend([e] * (len(messages) - index))
+                break
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _check(self, integration_id: int, response):
+        if response.status_code == 429:
+            wait = retry_after(response)
+            self.limiter.penalize(integration_id, wait)
+            raise RateLimited(integration_id, wait)
+        response.raise_for_status()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="outbound-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Sends everything still queued, then stops the dispatcher"""
+        self.stopping.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            ready, _ = self._take_ready(force=True)
+        for integration_id, items in ready:
+            self._flush(integration_id, items)
+        logging.info("📤 Outbound batcher stopped")
+
+
+outbound_batcher = OutboundBatcher()
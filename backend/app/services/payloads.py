@@ -0,0 +1,150 @@
+import os
+import json
+import zlib
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, insert, select, update
+
+from app.core.config import PAYLOAD_MAX_BYTES, PAYLOAD_INLINE_MAX, PAYLOAD_SPILL_DIR, ERROR_MESSAGE_MAX_CHARS
+
+# Shorter payloads are stored as-is: zlib's framing would outweigh the saving
+COMPRESS_MIN_BYTES = 128
+
+# Preset zlib dictionaries by codec name. zlib starts each payload with the
+# dictionary already in its window, so the keys every run_data() repeats
+# compress to a few bytes even in small payloads; the most common strings
+# go last, where matches are cheapest. Rows record the codec they were
+# written with, so never edit a dictionary in place: add "zlib-d2".
+DICTIONARIES = {
+    "zlib-d1": (
+        b'"state": "half_open"}"state": "open"}, "circuit": {"integration_id": '
+        b'"filtered": "failed": 0, "succeeded": "foreach": {"items": {"succeeded": '
+        b'"type": "delay", "type": "condition", "type": "foreach", "type": "whatsapp", "type": "email", '
+        b'"ok": false}, "ok": true}, {"step": "ok": true}]}, '
+        b'{"payload": {"timings": {"run_ms": , "steps": [{"step": "'
+        b', "ms": '
+    ),
+}
+CODEC = "zlib-d1"
+RAW = "raw"
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    compressor = zlib.compressobj(level=6, zdict=DICTIONARIES[codec])
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == RAW:
+        return data
+    if codec not in DICTIONARIES:
+        raise ValueError(f"unknown payload codec '{codec}'")
+    decompressor = zlib.decompressobj(zdict=DICTIONARIES[codec])
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def _spill_path(run_id: str) -> str:
+    # Two-character fan-out keeps directories small
+    return os.path.join(run_id[:2], f"{run_id}.z")
+
+
+def _write_spill(relative: str, data: bytes):
+    path = os.path.join(PAYLOAD_SPILL_DIR, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so a reader never sees half a file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+def remove_spill(relative: str):
+    """Deletes a spilled payload file; one that is already gone is fine"""
+    try:
+        os.remove(os.path.join(PAYLOAD_SPILL_DIR, relative))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.warning(f"⚠️ Could not remove spilled payload {relative}: {e}")
+
+
+def truncate_error(message: Optional[str]) -> Optional[str]:
+    """Caps error_message, which stays in task_logs, at ERROR_MESSAGE_MAX_CHARS"""
+    if message is None or len(message) <= ERROR_MESSAGE_MAX_CHARS:
+        return message
+    return message[:ERROR_MESSAGE_MAX_CHARS] + f"… ({len(message) - ERROR_MESSAGE_MAX_CHARS} more chars)"
+
+
+def encode_payload(run_id: str, text: str) -> Dict[str, Any]:
+    """
+    Turns a run's execution_data into a task_log_payloads row: compressed
+    with the shared dictionary, written to a file under PAYLOAD_SPILL_DIR
+    when still larger than PAYLOAD_INLINE_MAX, and replaced by a short note
+    when larger than PAYLOAD_MAX_BYTES uncompressed.
+    """
+    raw = text.encode()
+    if len(raw) > PAYLOAD_MAX_BYTES:
+        logging.warning(f"⚠️ Run {run_id} execution data is {len(raw)} bytes, over the {PAYLOAD_MAX_BYTES} byte limit; not stored")
+        raw = json.dumps({"truncated": True, "size": len(raw), "limit": PAYLOAD_MAX_BYTES}).encode()
+
+    row = {"run_id": run_id, "codec": RAW, "size": len(raw), "data": raw, "path": None}
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return row
+    row["codec"] = CODEC
+    row["data"] = _compress(raw, CODEC)
+    if len(row["data"]) > PAYLOAD_INLINE_MAX:
+        row["path"] = _spill_path(run_id)
+        _write_spill(row["path"], row["data"])
+        row["data"] = None
+    return row
+
+
+def decode_payload(codec: str, data: Optional[bytes], path: Optional[str]) -> str:
+    """The original execution_data text; reads the spill file when there is one"""
+    if path is not None:
+        with open(os.path.join(PAYLOAD_SPILL_DIR, path), "rb") as handle:
+            data = handle.read()
+    return _decompress(data, codec).decode()
+
+
+def move_legacy_payloads(session_factory=None, batch: int = 1000) -> int:
+    """
+    Moves execution_data written before payloads had their own table into
+    task_log_payloads, compressed, and clears the old column. Rows from
+    before run ids existed get one derived from their id ("legacy-<id>")
+    first, since payloads are keyed by it. Part of the migration step; safe
+    to re-run. Returns how many payloads moved (VACUUM afterwards to give
+    the space back to the filesystem).
+    """
+    from app.models import TaskLog, TaskLogPayload
+    from app.services.database import SessionLocal
+
+    moved = 0
+    db = (session_factory or SessionLocal)()
+    try:
+        while True:
+            rows = db.execute(
+                select(TaskLog.id, TaskLog.run_id, TaskLog.execution_data)
+                .where(TaskLog.execution_data.is_not(None))
+                .order_by(TaskLog.id)
+                .limit(batch)
+            ).all()
+            if not rows:
+                break
+            run_ids = {row.id: row.run_id or f"legacy-{row.id}" for row in rows}
+            backfill = [{"id": row.id, "run_id": run_ids[row.id]} for row in rows if not row.run_id]
+            if backfill:
+                db.execute(update(TaskLog), backfill)
+            payloads = [encode_payload(run_ids[row.id], row.execution_data) for row in rows]
+            db.execute(delete(TaskLogPayload).where(TaskLogPayload.run_id.in_(list(run_ids.values()))))
+            db.execute(insert(TaskLogPayload), payloads)
+            # Only rows whose payload was written above lose their inline copy
+            db.execute(update(TaskLog).where(TaskLog.id.in_(list(run_ids))).values(execution_data=None))
+            db.commit()
+            moved += len(payloads)
+    finally:
+        db.close()
+    if moved:
+        print(f"🗜️ Moved {moved} legacy execution payload(s) into task_log_payloads")
+    return moved
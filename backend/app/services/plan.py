@@ -0,0 +1,324 @@
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from app.core.config import DAG_MAX_PARALLEL, FOREACH_CHUNK_SIZE, FOREACH_CONCURRENCY
+from app.services.conditions import Condition, ConditionError, compile_expression, from_tree
+
+
+class PlanCompileError(ValueError):
+    """Raised when a workflow's step list cannot be turned into a plan"""
+
+
+@dataclass(frozen=True)
+class CompiledStep:
+    index: int
+    type: str
+    params: Mapping[str, Any]
+    handler: Optional[Callable] = None
+    predicate: Optional[Condition] = None
+    id: str = ""
+    needs: Tuple[str, ...] = ()
+    integration_id: Optional[int] = None
+    # foreach: the action run once per item
+    inner: Optional["CompiledStep"] = None
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    workflow_id: Optional[int]
+    version: Optional[str]
+    steps: Tuple[CompiledStep, ...]
+    # DAG mode: set when any step declares `needs`; steps are then in topological order
+    is_dag: bool = False
+    max_parallel: int = 1
+    on_failure: str = "cancel"  # "cancel" stops sibling branches, "continue" lets them finish
+
+
+FAILURE_POLICIES = ("cancel", "continue")
+
+
+# Required params per action type, checked once at compile time
+REQUIRED_PARAMS = {
+    "email": ("to",),
+    "whatsapp": ("phone",),
+}
+
+# Structured conditions ({"field", "operator", "value"}) map onto the expression language
+CONDITION_OPERATORS = {
+    "eq": "==",
+    "ne": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+    "in": "in",
+}
+
+
+def compile_condition(params: Mapping[str, Any]) -> Condition:
+    """
+    Turns {"expression": "payload.status == 'paid' and payload.total > 10"}
+    or the structured {"field": "payload.status", "operator": "eq", "value":
+    "paid"} into a compiled Condition (app/services/conditions.py). Parsing
+    happens here, once per plan; structured conditions stay false when their
+    field is missing.
+    """
+    expression = params.get("expression")
+    if expression is not None:
+        if not isinstance(expression, str):
+            raise PlanCompileError("condition 'expression' must be a string")
+        try:
+            return compile_expression(expression)
+        except ConditionError as e:
+            raise PlanCompileError(f"invalid condition: {e}") from e
+
+    field = params.get("field")
+    if not field:
+        raise PlanCompileError("condition step requires an 'expression' or a 'field'")
+    path = tuple(str(field).split("."))
+    op_name = params.get("operator", "eq")
+    exists = ("exists", path)
+    if op_name == "exists":
+        return from_tree(f"exists({field})", exists)
+
+    value = ("literal", params.get("value"))
+    if op_name == "contains":
+        check = ("call", "contains", (("path", path), value))
+    elif op_name in CONDITION_OPERATORS:
+        check = ("compare", CONDITION_OPERATORS[op_name], ("path", path), value)
+    else:
+        raise PlanCompileError(f"unknown condition operator '{op_name}'")
+    return from_tree(f"{field} {op_name} {params.get('value')!r}", ("and", exists, check))
+
+
+def _validate_params(action_type: str, params: Dict[str, Any], index: int):
+    missing = [name for name in REQUIRED_PARAMS.get(action_type, ()) if name not in params]
+    if missing:
+        raise PlanCompileError(f"step {index} ({action_type}) is missing params: {', '.join(missing)}")
+    if action_type == "delay":
+        seconds = params.get("seconds", 5)
+        if not isinstance(seconds, (int, float)) or seconds < 0:
+            raise PlanCompileError(f"step {index} (delay) needs a non-negative 'seconds'")
+
+
+def _positive_int(value, name: str, index: int) -> int:
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise PlanCompileError(f"step {index} (foreach) needs a positive integer '{name}'")
+    return value
+
+
+def _compile_foreach(params: Dict[str, Any], handlers, index: int, step_id: str, needs: Tuple[str, ...]) -> CompiledStep:
+    """
+    {"items": "payload.recipients"} or {"source": {"integration_id", "path",
+    "items_field", "next_field", ...}} streams the items; "step" is the
+    action to run per item, with "item_params" mapping its params to item
+    fields ("." is the whole item). An optional "where" expression over
+    `item` skips items that do not match, evaluated a chunk at a time.
+    """
+    items, source = params.get("items"), params.get("source")
+    if (items is None) == (source is None):
+        raise PlanCompileError(f"step {index} (foreach) needs exactly one of 'items' or 'source'")
+    if items is not None and not isinstance(items, str):
+        raise PlanCompileError(f"step {index} (foreach) 'items' must be a context path")
+    if source is not None:
+        if not isinstance(source, dict) or not isinstance(source.get("integration_id"), int) or not source.get("path"):
+            raise PlanCompileError(f"step {index} (foreach) 'source' needs an integer integration_id and a path")
+        source = {
+            **source,
+            "items_field": tuple(filter(None, str(source.get("items_field", "data")).split("."))),
+            "next_field": tuple(filter(None, str(source.get("next_field", "next_cursor")).split("."))),
+        }
+
+    max_failures = params.get("max_failures")
+    if max_failures is not None and (not isinstance(max_failures, int) or max_failures < 0):
+        raise PlanCompileError(f"step {index} (foreach) 'max_failures' must be a non-negative integer")
+
+    inner = params.get("step")
+    inner_type = inner.get("type") if isinstance(inner, dict) else None
+    if inner_type in (None, "foreach", "condition", "delay"):
+        raise PlanCompileError(f"step {index} (foreach) needs an action 'step' to run per item")
+    handler = getattr(handlers, inner_type, None)
+    if handler is None:
+        raise PlanCompileError(f"step {index} (foreach) has unknown action type '{inner_type}'")
+    item_params = params.get("item_params") or {}
+    if not isinstance(item_params, dict):
+        raise PlanCompileError(f"step {index} (foreach) 'item_params' must map params to item fields")
+    inner_params = dict(inner.get("params") or {})
+    _validate_params(inner_type, {**inner_params, **item_params}, index)
+    integration_id = inner.get("integration_id")
+    if integration_id is not None and not isinstance(integration_id, int):
+        raise PlanCompileError(f"step {index} (foreach) has a non-integer integration_id")
+
+    where = params.get("where")
+    if where is not None:
+        try:
+            where = compile_expression(where) if isinstance(where, str) else None
+        except ConditionError as e:
+            raise PlanCompileError(f"step {index} (foreach) has an invalid 'where': {e}") from e
+        if where is None:
+            raise PlanCompileError(f"step {index} (foreach) 'where' must be an expression string")
+
+    settings = {
+        "items": tuple(filter(None, items.split("."))) if items is not None else None,
+        "source": source,
+        "chunk_size": _positive_int(params.get("chunk_size", FOREACH_CHUNK_SIZE), "chunk_size", index),
+        "concurrency": _positive_int(params.get("concurrency", FOREACH_CONCURRENCY), "concurrency", index),
+        "max_failures": max_failures,
+        "where": where,
+        "item_params": {name: tuple(filter(None, str(path).split("."))) for name, path in item_params.items()},
+    }
+    return CompiledStep(
+        index=index,
+        type="foreach",
+        params=MappingProxyType(settings),
+        id=step_id,
+        needs=needs,
+        inner=CompiledStep(
+            index=index,
+            type=inner_type,
+            params=MappingProxyType(inner_params),
+            handler=handler,
+            id=f"{step_id}.item",
+            integration_id=integration_id
+        )
+    )
+
+
+def _topological_order(steps: list) -> list:
+    """Kahn's algorithm; keeps declaration order among steps that are ready together"""
+    by_id = {step.id: step for step in steps}
+    if len(by_id) != len(steps):
+        raise PlanCompileError("step ids must be unique")
+    for step in steps:
+        unknown = [need for need in step.needs if need not in by_id]
+        if unknown:
+            raise PlanCompileError(f"step '{step.id}' needs unknown steps: {', '.join(unknown)}")
+
+    pending = {step.id: len(step.needs) for step in steps}
+    ordered = []
+    ready = [step for step in steps if not step.needs]
+    while ready:
+        step = ready.pop(0)
+        ordered.append(step)
+        for other in steps:
+            if step.id in other.needs:
+                pending[other.id] -= 1
+                if pending[other.id] == 0:
+                    ready.append(other)
+
+    if len(ordered) != len(steps):
+        raise PlanCompileError("step dependencies contain a cycle")
+    return ordered
+
+
+def compile_plan(
+    steps: list,
+    handlers,
+    workflow_id: Optional[int] = None,
+    version: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None
+) -> ExecutionPlan:
+    """Resolves handlers, pre-parses conditions and validates params for every step"""
+    options = options or {}
+    compiled = []
+    for index, step in enumerate(steps):
+        action_type = step.get("type")
+        params = dict(step.get("params") or {})
+        step_id = str(step.get("id", index))
+        needs = tuple(str(need) for need in step.get("needs") or ())
+
+        if action_type == "condition":
+            compiled.append(CompiledStep(
+                index=index,
+                type=action_type,
+                params=MappingProxyType(params),
+                predicate=compile_condition(params),
+                id=step_id,
+                needs=needs
+            ))
+            continue
+
+        if action_type == "foreach":
+            compiled.append(_compile_foreach(params, handlers, index, step_id, needs))
+            continue
+
+        handler = getattr(handlers, action_type, None) if action_type else None
+        if handler is None:
+            raise PlanCompileError(f"step {index} has unknown action type '{action_type}'")
+        _validate_params(action_type, params, index)
+        integration_id = step.get("integration_id")
+        if integration_id is not None and not isinstance(integration_id, int):
+            raise PlanCompileError(f"step {index} ({action_type}) has a non-integer integration_id")
+        compiled.append(CompiledStep(
+            index=index,
+            type=action_type,
+            params=MappingProxyType(params),
+            handler=handler,
+            id=step_id,
+            needs=needs,
+            integration_id=integration_id
+        ))
+
+    if not any(step.needs for step in compiled):
+        return ExecutionPlan(workflow_id=workflow_id, version=version, steps=tuple(compiled))
+
+    if any(step.type == "delay" for step in compiled):
+        # A parked run only records a single resume position, which a DAG does not have
+        raise PlanCompileError("delay steps are not supported in workflows that use 'needs'")
+
+    on_failure = options.get("on_failure", "cancel")
+    if on_failure not in FAILURE_POLICIES:
+        raise PlanCompileError(f"unknown on_failure policy '{on_failure}'")
+    max_parallel = options.get("max_parallel", DAG_MAX_PARALLEL)
+    if not isinstance(max_parallel, int) or max_parallel < 1:
+        raise PlanCompileError("max_parallel must be a positive integer")
+
+    return ExecutionPlan(
+        workflow_id=workflow_id,
+        version=version,
+        steps=tuple(_topological_order(compiled)),
+        is_dag=True,
+        max_parallel=max_parallel,
+        on_failure=on_failure
+    )
+
+
+class PlanCache:
+    """
+    In-process cache of compiled plans keyed by workflow id + `updated_at`.
+    Only the latest version per workflow is kept, so an edit replaces the
+    old plan the first time the new definition is executed.
+    """
+
+    def __init__(self):
+        self._plans: Dict[int, ExecutionPlan] = {}
+        self._lock = threading.Lock()
+
+    def get(self, definition: Dict[str, Any], handlers) -> ExecutionPlan:
+        workflow_id = definition.get("id")
+        version = definition.get("updated_at")
+        options = definition.get("options")
+        if workflow_id is None:
+            return compile_plan(definition.get("steps", []), handlers, options=options)
+
+        plan = self._plans.get(workflow_id)
+        if plan is not None and plan.version == version:
+            return plan
+
+        plan = compile_plan(definition.get("steps", []), handlers, workflow_id, version, options)
+        with self._lock:
+            self._plans[workflow_id] = plan
+        return plan
+
+    def invalidate(self, workflow_id: int):
+        with self._lock:
+            self._plans.pop(workflow_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+plan_cache = PlanCache()
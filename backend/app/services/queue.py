@@ -0,0 +1,144 @@
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import redis_client, LazyScript
+
+QUEUE_KEY = "workflow_queue"
+PROCESSING_KEY = "workflow_queue:processing"
+LEASES_KEY = "workflow_queue:leases"
+
+# Moves up to ARGV[3] more tasks onto the processing list and leases them,
+# together with the task BLMOVE already moved (ARGV[1], "" for none)
+FETCH_SCRIPT = """
+local items = {}
+if ARGV[1] ~= '' then
+    redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+end
+for i = 1, tonumber(ARGV[3]) do
+    local raw = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+    if not raw then
+        break
+    end
+    redis.call('ZADD', KEYS[3], ARGV[2], raw)
+    items[#items + 1] = raw
+end
+return items
+"""
+
+# Requeues tasks whose lease expired, then leases any processing-list task
+# that has none (its worker died between BLMOVE and FETCH_SCRIPT), so it
+# expires and comes back too instead of sitting there forever
+REAP_SCRIPT = """
+local requeued = 0
+for _, raw in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])) do
+    redis.call('ZREM', KEYS[3], raw)
+    if redis.call('LREM', KEYS[2], 1, raw) > 0 then
+        redis.call('RPUSH', KEYS[1], raw)
+        requeued = requeued + 1
+    end
+end
+for _, raw in ipairs(redis.call('LRANGE', KEYS[2], 0, -1)) do
+    if not redis.call('ZSCORE', KEYS[3], raw) then
+        redis.call('ZADD', KEYS[3], ARGV[2], raw)
+    end
+end
+return requeued
+"""
+
+
+def enqueue_task(
+    workflow_id: int,
+    payload: Optional[Dict[str, Any]] = None,
+    client=None,
+    run_id: Optional[str] = None
+) -> str:
+    """
+    Pushes a workflow task into the Redis queue and returns its task id.
+    Pass `run_id` when a TaskLog row for the run already exists.
+    """
+    client = client or redis_client
+    task_id, task_data = _task(workflow_id, payload, run_id)
+    client.lpush(QUEUE_KEY, task_data)
+    return task_id
+
+
+def enqueue_tasks(tasks: List[Tuple[int, Optional[str]]], payload: Optional[Dict[str, Any]] = None, client=None) -> List[str]:
+    """
+    Enqueues one task per (workflow_id, run_id) with a shared payload in a
+    single LPUSH, e.g. every workflow an event fans out to.
+    """
+    if not tasks:
+        return []
+    client = client or redis_client
+    built = [_task(workflow_id, payload, run_id) for workflow_id, run_id in tasks]
+    client.lpush(QUEUE_KEY, *(task_data for _, task_data in built))
+    return [task_id for task_id, _ in built]
+
+
+def _task(workflow_id: int, payload: Optional[Dict[str, Any]], run_id: Optional[str]) -> Tuple[str, str]:
+    task_id = uuid.uuid4().hex
+    return task_id, json.dumps({
+        "task_id": task_id,
+        "workflow_id": workflow_id,
+        "action": "execute",
+        "run_id": run_id,
+        "payload": payload or {},
+        "enqueued_at": time.time()
+    })
+
+
+def queue_depth(client=None) -> int:
+    client = client or redis_client
+    return client.llen(QUEUE_KEY)
+
+
+class ReliableQueue:
+    """
+    Reliable consumer side of `workflow_queue`.
+
+    Producers LPUSH, consumers atomically move items from the tail of the queue
+    onto a shared processing list and record a lease (deadline) in a sorted set.
+    A task stays in the processing list until it is acked; if its lease expires
+    (the worker crashed or hung) `requeue_expired` puts it back on the queue.
+    Moving and leasing, and expiring and requeueing, are each one Lua script,
+    so a crash between the steps cannot lose a task.
+    """
+
+    def __init__(self, client=None, visibility_timeout: int = 300):
+        self.redis = client or redis_client
+        self.visibility_timeout = visibility_timeout
+        self._fetch = LazyScript(self.redis, FETCH_SCRIPT)
+        self._reap = LazyScript(self.redis, REAP_SCRIPT)
+
+    def fetch(self, max_items: int, block_timeout: int = 5) -> List[str]:
+        """Blocks for the first task, then drains up to `max_items` without blocking"""
+        if max_items <= 0:
+            return []
+
+        # Blocking commands cannot run inside a script; a task BLMOVE moved
+        # but never leased is picked up by the reaper's lease-less sweep
+        first = self.redis.blmove(QUEUE_KEY, PROCESSING_KEY, block_timeout, "RIGHT", "LEFT")
+        if first is None:
+            return []
+
+        deadline = time.time() + self.visibility_timeout
+        rest = self._fetch(keys=[QUEUE_KEY, PROCESSING_KEY, LEASES_KEY], args=[first, deadline, max_items - 1])
+        return [first, *rest]
+
+    def extend(self, raw: str):
+        """Pushes the lease of a long-running task further into the future"""
+        self.redis.zadd(LEASES_KEY, {raw: time.time() + self.visibility_timeout}, xx=True)
+
+    def ack(self, raw: str):
+        pipe = self.redis.pipeline()
+        pipe.lrem(PROCESSING_KEY, 1, raw)
+        pipe.zrem(LEASES_KEY, raw)
+        pipe.execute()
+
+    def requeue_expired(self) -> int:
+        """Returns tasks whose lease has expired to the head of the queue"""
+        # One script, so concurrent reapers on several workers never duplicate a task
+        now = time.time()
+        return self._reap(keys=[QUEUE_KEY, PROCESSING_KEY, LEASES_KEY], args=[now, now + self.visibility_timeout])
@@ -0,0 +1,119 @@
+import time
+import logging
+from typing import Any, Dict, Optional
+
+from app.core.config import redis_client, RATE_LIMIT_MAX_WAIT, LazyScript
+from app.services.clients import client_registry
+
+BUCKET_KEY = "ratelimit:{integration_id}"
+BLOCKED_KEY = "ratelimit:{integration_id}:blocked"
+
+# Provider limits per service; an integration's `config.rate_limit`
+# ({"rate": tokens per second, "burst": bucket size}) overrides these.
+# Services without either are not limited.
+DEFAULT_LIMITS = {
+    "whatsapp_business": {"rate": 80, "burst": 80},
+    "google_workspace": {"rate": 10, "burst": 20},
+    "smtp": {"rate": 10, "burst": 20},
+}
+
+# Refills the bucket from the time elapsed since the last call, then takes
+# `cost` tokens if there are enough. Returns {taken, seconds to wait}. Uses the
+# Redis clock so workers with skewed clocks still share one budget.
+TOKEN_BUCKET_SCRIPT = """
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then
+    return {0, tostring(blocked / 1000)}
+end
+
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+return {1, '0'}
+"""
+
+
+class RateLimited(RuntimeError):
+    """The integration's budget will not allow the call within the caller's wait limit"""
+
+    def __init__(self, integration_id: int, retry_after: float):
+        super().__init__(f"integration {integration_id} is rate limited (retry in {retry_after:.1f}s)")
+        self.integration_id = integration_id
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Token buckets in Redis, one per integration, so every worker process
+    draws from the same provider budget. `acquire()` waits for tokens
+    (up to `max_wait`) instead of letting the call hit the provider's
+    throttle; `penalize()` honours a provider's Retry-After for everyone.
+    """
+
+    def __init__(self, client=None, registry=client_registry, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.redis = client or redis_client
+        self.registry = registry
+        self.max_wait = max_wait
+        self._script = LazyScript(self.redis, TOKEN_BUCKET_SCRIPT)
+
+    def limits(self, integration_id: int) -> Optional[Dict[str, Any]]:
+        settings = self.registry.settings(integration_id)
+        limit = settings["config"].get("rate_limit") or DEFAULT_LIMITS.get(settings["service_name"])
+        if not limit or not limit.get("rate"):
+            return None
+        rate = float(limit["rate"])
+        # A bucket must hold one whole call: {"rate": 0.5} means one call every
+        # two seconds, not half a call charged per second
+        return {"rate": rate, "burst": max(1.0, float(limit.get("burst") or rate))}
+
+    def try_acquire(self, integration_id: int, cost: int = 1) -> float:
+        """Takes `cost` tokens if available; returns 0, or the seconds to wait"""
+        limit = self.limits(integration_id)
+        if limit is None:
+            return 0.0
+        # A request larger than the bucket could never be granted
+        cost = min(cost, limit["burst"])
+        taken, wait = self._script(
+            keys=[BUCKET_KEY.format(integration_id=integration_id), BLOCKED_KEY.format(integration_id=integration_id)],
+            args=[limit["rate"], limit["burst"], cost]
+        )
+        return 0.0 if int(taken) else float(wait)
+
+    def acquire(self, integration_id: int, cost: int = 1, max_wait: Optional[float] = None):
+        """Blocks until `cost` tokens are taken; raises RateLimited past `max_wait`"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire(integration_id, cost)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimited(integration_id, wait)
+            time.sleep(wait)
+
+    def penalize(self, integration_id: int, retry_after: float):
+        """Stops every worker from calling the integration for `retry_after` seconds"""
+        logging.warning(f"⚠️ Integration {integration_id} throttled us; pausing sends for {retry_after}s")
+        self.redis.set(BLOCKED_KEY.format(integration_id=integration_id), "1", px=max(1, int(retry_after * 1000)))
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,195 @@
+import os
+import gzip
+import json
+import time
+import zlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, delete
+
+from app.core.config import (
+    LOG_RETENTION_POLICY,
+    LOG_ARCHIVE_DIR,
+    LOG_ARCHIVE_MAX_BYTES,
+    LOG_ARCHIVE_MAX_FILES,
+    RETENTION_CHUNK_SIZE
+)
+from app.services.database import SessionLocal
+from app.services.changes import change_feed
+from app.services.payloads import decode_payload, remove_spill
+from app.models import TaskLog, TaskLogPayload
+
+# Runs that can still receive status updates are never expired
+ACTIVE_STATUSES = ("queued", "running", "waiting", "retrying")
+
+
+class LogArchive:
+    """Appends expired rows to gzip'd JSONL files, rotated by day and size"""
+
+    def __init__(self, directory: str = LOG_ARCHIVE_DIR, max_bytes: int = LOG_ARCHIVE_MAX_BYTES, max_files: int = LOG_ARCHIVE_MAX_FILES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+
+    def _current_path(self) -> str:
+        day = datetime.utcnow().strftime("%Y%m%d")
+        part = 0
+        while True:
+            path = os.path.join(self.directory, f"task_logs-{day}-{part:03d}.jsonl.gz")
+            if not os.path.exists(path) or os.path.getsize(path) < self.max_bytes:
+                return path
+            part += 1
+
+    def write(self, rows: List[Dict[str, Any]]):
+        os.makedirs(self.directory, exist_ok=True)
+        # Each call appends a new gzip member; readers see one continuous stream
+        with gzip.open(self._current_path(), "at", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+        self._prune()
+
+    def _prune(self):
+        files = sorted(name for name in os.listdir(self.directory) if name.startswith("task_logs-"))
+        for name in files[:-self.max_files] if len(files) > self.max_files else []:
+            os.remove(os.path.join(self.directory, name))
+
+
+class RetentionEngine:
+    """
+    Deletes expired TaskLog rows in small chunks so no single statement holds
+    the SQLite write lock for long.
+
+    Policy shape (LOG_RETENTION_POLICY):
+        {"default_days": 30,
+         "statuses": {"failed": 90},
+         "workflows": {"12": {"days": 7, "statuses": {"failed": 30}}}}
+
+    The most specific match wins: workflow+status, workflow, status, default.
+    The policy is expanded into disjoint rules, each a SQL predicate plus a
+    `started_at` cutoff, so every chunk is an indexed range scan.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[Dict[str, Any]] = None,
+        session_factory=SessionLocal,
+        archive: Optional[LogArchive] = None,
+        chunk_size: int = RETENTION_CHUNK_SIZE,
+        pause: float = 0.05
+    ):
+        self.policy = policy if policy is not None else LOG_RETENTION_POLICY
+        self.session_factory = session_factory
+        self.archive = archive if archive is not None else LogArchive()
+        self.chunk_size = chunk_size
+        self.pause = pause
+
+    def rules(self, now: Optional[datetime] = None) -> List[tuple]:
+        """Returns [(predicate, cutoff)] covering every (workflow, status) exactly once"""
+        now = now or datetime.utcnow()
+        cutoff = lambda days: now - timedelta(days=days)
+        default_days = self.policy.get("default_days", 30)
+        statuses = self.policy.get("statuses", {})
+        workflows = {int(wid): spec for wid, spec in self.policy.get("workflows", {}).items()}
+
+        rules = []
+        for workflow_id, spec in workflows.items():
+            if isinstance(spec, (int, float)):
+                spec = {"days": spec}
+            wf_statuses = spec.get("statuses", {})
+            is_workflow = TaskLog.workflow_id == workflow_id
+            for status, days in wf_statuses.items():
+                rules.append((and_(is_workflow, TaskLog.status == status), cutoff(days)))
+
+            if "days" in spec:
+                rules.append((and_(is_workflow, TaskLog.status.notin_(list(wf_statuses))), cutoff(spec["days"])))
+                continue
+            for status, days in statuses.items():
+                if status not in wf_statuses:
+                    rules.append((and_(is_workflow, TaskLog.status == status), cutoff(days)))
+            covered = list(wf_statuses) + list(statuses)
+            rules.append((and_(is_workflow, TaskLog.status.notin_(covered)), cutoff(default_days)))
+
+        not_overridden = or_(TaskLog.workflow_id.is_(None), TaskLog.workflow_id.notin_(list(workflows)))
+        for status, days in statuses.items():
+            rules.append((and_(not_overridden, TaskLog.status == status), cutoff(days)))
+        rules.append((and_(not_overridden, TaskLog.status.notin_(list(statuses))), cutoff(default_days)))
+        return rules
+
+    def _purge_chunk(self, predicate, cutoff: datetime) -> int:
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(TaskLog.__table__)
+                .where(TaskLog.started_at < cutoff, TaskLog.status.notin_(ACTIVE_STATUSES), predicate)
+                .order_by(TaskLog.started_at, TaskLog.id)
+                .limit(self.chunk_size)
+            ).mappings().all()
+            if not rows:
+                return 0
+
+            # Payloads live in their own table (no FK), keyed by run id
+            run_ids = [row["run_id"] for row in rows if row["run_id"]]
+            payloads = {
+                payload.run_id: payload
+                for payload in db.execute(
+                    select(TaskLogPayload.run_id, TaskLogPayload.codec, TaskLogPayload.data, TaskLogPayload.path)
+                    .where(TaskLogPayload.run_id.in_(run_ids))
+                ).all()
+            } if run_ids else {}
+
+            if self.archive:
+                self.archive.write([self._archived(row, payloads.get(row["run_id"])) for row in rows])
+            db.execute(delete(TaskLog).where(TaskLog.id.in_([row["id"] for row in rows])))
+            if payloads:
+                db.execute(delete(TaskLogPayload).where(TaskLogPayload.run_id.in_(list(payloads))))
+            db.commit()
+        finally:
+            db.close()
+
+        # Only once the rows pointing at them are gone
+        for payload in payloads.values():
+            if payload.path is not None:
+                remove_spill(payload.path)
+
+        # Cached log lists and ETags must not keep serving the deleted rows
+        change_feed.bump("task_logs", {"deleted": len(rows)})
+        return len(rows)
+
+    @staticmethod
+    def _archived(row, payload) -> Dict[str, Any]:
+        """The row as archived, with its execution data decompressed back in"""
+        archived = dict(row)
+        if payload is not None:
+            try:
+                archived["execution_data"] = decode_payload(payload.codec, payload.data, payload.path)
+            except (OSError, ValueError, zlib.error) as e:
+                logging.warning(f"⚠️ Could not archive execution data of run {row['run_id']}: {e}")
+        return archived
+
+    def run(self) -> int:
+        """Applies every rule until nothing is left to expire; returns rows deleted"""
+        deleted = 0
+        for predicate, cutoff in self.rules():
+            while True:
+                purged = self._purge_chunk(predicate, cutoff)
+                deleted += purged
+                if purged < self.chunk_size:
+                    break
+                # Let the executor and log writer grab the write lock between chunks
+                time.sleep(self.pause)
+        return deleted
+
+
+retention_engine = RetentionEngine()
+
+
+def main():
+    started = time.time()
+    deleted = retention_engine.run()
+    print(f"🧹 Log retention complete: archived and deleted {deleted} rows in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import random
+
+import httpx
+
+from app.core.config import (
+    redis_client,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_WINDOW,
+    CIRCUIT_COOLDOWN,
+    LazyScript
+)
+
+STATE_KEY = "circuit:{integration_id}"
+WINDOW_KEY = "circuit:{integration_id}:window"
+PROBE_KEY = "circuit:{integration_id}:probe"
+
+
+def retry_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter, so retries of one outage spread out"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_retryable(error: Exception) -> bool:
+    """Bad step params and 4xx responses fail the same way on every attempt"""
+    if not getattr(error, "retryable", True):
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return not isinstance(error, (LookupError, ValueError, TypeError))
+
+
+# Counts an outcome in the current window and moves the breaker between
+# closed and open. Only the half-open probe's outcome closes (or re-opens) an
+# open breaker; late results from calls started before it opened are ignored.
+RECORD_SCRIPT = """
+local ok = ARGV[1] == '1'
+local probe = ARGV[2] == '1'
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+if redis.call('HGET', KEYS[1], 'state') == 'open' then
+    if not probe then
+        return 'open'
+    end
+    redis.call('DEL', KEYS[3])
+    if ok then
+        redis.call('DEL', KEYS[1], KEYS[2])
+        return 'closed'
+    end
+    redis.call('HSET', KEYS[1], 'opened_at', tostring(now))
+    return 'open'
+end
+
+redis.call('HINCRBY', KEYS[2], ok and 'ok' or 'fail', 1)
+if redis.call('TTL', KEYS[2]) < 0 then
+    redis.call('EXPIRE', KEYS[2], ARGV[5])
+end
+local counts = redis.call('HMGET', KEYS[2], 'ok', 'fail')
+local successes = tonumber(counts[1]) or 0
+local failures = tonumber(counts[2]) or 0
+local calls = successes + failures
+if calls >= tonumber(ARGV[4]) and failures / calls >= tonumber(ARGV[3]) then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', tostring(now))
+    redis.call('DEL', KEYS[2])
+    return 'open'
+end
+return 'closed'
+"""
+
+
+class CircuitOpen(RuntimeError):
+    """The integration's breaker is open; calls fail fast until the cooldown ends"""
+
+    def __init__(self, integration_id: int, retry_after: float):
+        super().__init__(f"circuit for integration {integration_id} is open (retry in {retry_after:.0f}s)")
+        self.integration_id = integration_id
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Per-integration circuit breakers shared by every worker through Redis.
+
+    Outcomes are counted in fixed `window`-second buckets. Once at least
+    `min_calls` calls in a window fail at `failure_rate` or worse, the
+    breaker opens and `allow()` raises CircuitOpen. After `cooldown` seconds
+    one caller is let through as a probe: its success closes the breaker,
+    its failure re-opens it for another cooldown.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        window: int = CIRCUIT_WINDOW,
+        cooldown: int = CIRCUIT_COOLDOWN
+    ):
+        self.redis = client or redis_client
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self._record = LazyScript(self.redis, RECORD_SCRIPT)
+
+    def _keys(self, integration_id: int) -> list:
+        return [key.format(integration_id=integration_id) for key in (STATE_KEY, WINDOW_KEY, PROBE_KEY)]
+
+    def allow(self, integration_id: int) -> bool:
+        """Raises CircuitOpen while open; returns True when the caller is the half-open probe"""
+        state, opened_at = self.redis.hmget(STATE_KEY.format(integration_id=integration_id), "state", "opened_at")
+        if state != "open":
+            return False
+        seconds, micros = self.redis.time()
+        remaining = float(opened_at) + self.cooldown - (seconds + micros / 1_000_000)
+        if remaining > 0:
+            raise CircuitOpen(integration_id, remaining)
+        if self.redis.set(PROBE_KEY.format(integration_id=integration_id), "1", nx=True, ex=self.cooldown):
+            return True
+        raise CircuitOpen(integration_id, self.cooldown)
+
+    def record(self, integration_id: int, ok: bool, probe: bool = False) -> str:
+        """Counts a call's outcome; returns the breaker state afterwards"""
+        return self._record(
+            keys=self._keys(integration_id),
+            args=[int(ok), int(probe), self.failure_rate, self.min_calls, self.window]
+        )
+
+    def state(self, integration_id: int) -> str:
+        """'closed', 'open' or 'half_open' (a probe is in flight)"""
+        state_key, _, probe_key = self._keys(integration_id)
+        if self.redis.hget(state_key, "state") != "open":
+            return "closed"
+        return "half_open" if self.redis.exists(probe_key) else "open"
+
+    def reset(self, integration_id: int):
+        self.redis.delete(*self._keys(integration_id))
+
+
+circuit_breaker = CircuitBreaker()
@@ -1,79 +1,337 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+import os
+import heapq
+import signal
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import redis
 from apscheduler.triggers.cron import CronTrigger
-from app.services.executor import execute_with_retry 
+from sqlalchemy import select, delete
+
+from app.core.config import redis_client, SCHEDULER_LOOKAHEAD, SCHEDULER_LEADER_TTL, SCHEDULER_BATCH_SIZE, SCHEDULER_METRICS_PORT
+from app.services.database import SessionLocal
+from app.services.queue import enqueue_task
+from app.services.retention import retention_engine
+from app.services.metrics import SCHEDULER_LAG, serve_metrics
+from app.models import Workflow, WorkflowSchedule
+
+LEADER_KEY = "scheduler:leader"
+CHANGES_KEY = "scheduler:changes"
+FIRED_KEY = "scheduler:fired:{workflow_id}:{fire_at}"
+# Claims only need to outlive a leader handover, not the whole day
+FIRED_KEY_TTL = 600
+RETENTION_KEY = "scheduler:retention"
+
+
+def parse_schedule(schedule: Optional[dict]) -> Optional[CronTrigger]:
+    """Returns the CronTrigger for a workflow's schedule, or None if it has no cron"""
+    if not schedule or "cron" not in schedule:
+        return None
+    return CronTrigger.from_crontab(schedule["cron"], timezone=schedule.get("timezone", "UTC"))
+
+
+def next_fire_time(trigger: CronTrigger, after: datetime) -> Optional[datetime]:
+    """Next fire strictly after `after` (naive UTC in, naive UTC out)"""
+    aware = after.replace(tzinfo=timezone.utc) + timedelta(microseconds=1)
+    fire = trigger.get_next_fire_time(None, aware)
+    return fire.astimezone(timezone.utc).replace(tzinfo=None) if fire else None
+
+
+def notify_schedule_changed(workflow_id: int, client=None):
+    """Called on workflow create/update/delete; the leader re-indexes just this workflow"""
+    client = client or redis_client
+    try:
+        client.lpush(CHANGES_KEY, workflow_id)
+    except redis.RedisError as e:
+        # The leader reconciles every workflow when it takes over, so this is recoverable
+        logging.error(f"❌ Could not notify scheduler about workflow {workflow_id}: {e}")
+
 
 class AutomationScheduler:
-    def __init__(self):
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.add_job(self.cleanup_logs, 'interval', hours=24)
-        self.scheduler.start()
+    """
+    Cron dispatcher for very large numbers of workflows.
+
+    - `workflow_schedules` is a persistent index of each cron workflow's next
+      fire time (UTC), so nothing is held per job in memory except what is due
+      within the next `lookahead` seconds, which sits in a heap.
+    - Only the replica holding the Redis leader lock dispatches, and every
+      (workflow, fire time) pair is claimed with SET NX before it is enqueued,
+      so a leader handover cannot enqueue a run twice.
+    - Fire times missed while no leader was running are coalesced into one run.
+    - Workflow edits arrive as ids on a Redis list and re-index only that
+      workflow; a full reconcile runs once each time leadership is acquired.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        session_factory=SessionLocal,
+        lookahead: int = SCHEDULER_LOOKAHEAD,
+        leader_ttl: int = SCHEDULER_LEADER_TTL,
+        batch_size: int = SCHEDULER_BATCH_SIZE
+    ):
+        self.redis = client or redis_client
+        self.session_factory = session_factory
+        self.lookahead = lookahead
+        self.leader_ttl = leader_ttl
+        self.batch_size = batch_size
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = None
+        self.is_leader = False
+        self.stopping = threading.Event()
+        self._heap: List[tuple] = []
+        # workflow_id -> fire time of its live heap entry; anything else in the heap is stale
+        self._planned: Dict[int, datetime] = {}
+        self._loaded_until = datetime.min
+        self._triggers: Dict[int, CronTrigger] = {}
+
+    # Leadership
+
+    def _hold_leadership(self) -> bool:
+        try:
+            if self.lock is None:
+                self.lock = self.redis.lock(LEADER_KEY, timeout=self.leader_ttl, blocking=False)
+            if self.is_leader:
+                self.lock.reacquire()
+            elif self.lock.acquire(blocking=False, token=self.node_id):
+                self.is_leader = True
+                print(f"👑 Scheduler {self.node_id} is now the leader")
+                self.reconcile()
+        except redis.exceptions.LockError:
+            self._step_down()
+        return self.is_leader
+
+    def _step_down(self):
+        if self.is_leader:
+            print(f"🪑 Scheduler {self.node_id} lost leadership")
+        self.is_leader = False
+        self._heap.clear()
+        self._planned.clear()
+        self._loaded_until = datetime.min
+
+    # Index maintenance
+
+    def _index_workflow(self, db, workflow: Optional[Workflow], now: datetime):
+        """Upserts one workflow's row in workflow_schedules; False if it should have none"""
+        if workflow is None or not workflow.enabled:
+            return False
+        config = workflow.definition.get("schedule") or {}
+        try:
+            trigger = parse_schedule(config)
+        except (ValueError, TypeError) as e:
+            logging.error(f"❌ Workflow {workflow.id} has an invalid schedule: {e}")
+            return False
+        if trigger is None:
+            return False
+
+        workflow_id = workflow.id
+        schedule = db.get(WorkflowSchedule, workflow_id)
+        cron = config["cron"]
+        tz = config.get("timezone", "UTC")
+        if schedule is not None and schedule.cron == cron and schedule.timezone == tz:
+            return True
+        fire_at = next_fire_time(trigger, now)
+        if schedule is None:
+            db.add(WorkflowSchedule(workflow_id=workflow_id, cron=cron, timezone=tz, next_fire_at=fire_at))
+        else:
+            schedule.cron, schedule.timezone, schedule.next_fire_at = cron, tz, fire_at
+        self._triggers[workflow_id] = trigger
+        return True
+
+    def apply_change(self, workflow_id: int, now: Optional[datetime] = None):
+        now = now or datetime.utcnow()
+        db = self.session_factory()
+        try:
+            workflow = db.get(Workflow, workflow_id)
+            if not self._index_workflow(db, workflow, now):
+                db.execute(delete(WorkflowSchedule).where(WorkflowSchedule.workflow_id == workflow_id))
+                self._triggers.pop(workflow_id, None)
+            db.commit()
+            schedule = db.get(WorkflowSchedule, workflow_id)
+            fire_at = schedule.next_fire_at if schedule else None
+        finally:
+            db.close()
+
+        self._planned.pop(workflow_id, None)
+        if fire_at is not None and fire_at < self._loaded_until:
+            self._plan(workflow_id, fire_at)
+
+    def reconcile(self):
+        """Full pass over workflows; only run when leadership changes hands"""
+        now = datetime.utcnow()
+        # Pending change notifications are covered by this pass
+        self.redis.delete(CHANGES_KEY)
+        db = self.session_factory()
+        try:
+            scheduled = set()
+            for workflow in db.execute(select(Workflow)).scalars():
+                if self._index_workflow(db, workflow, now):
+                    scheduled.add(workflow.id)
+            existing = set(db.execute(select(WorkflowSchedule.workflow_id)).scalars())
+            orphaned = list(existing - scheduled)
+            for start in range(0, len(orphaned), 500):
+                chunk = orphaned[start:start + 500]
+                db.execute(delete(WorkflowSchedule).where(WorkflowSchedule.workflow_id.in_(chunk)))
+            db.commit()
+        finally:
+            db.close()
+        print(f"🗓️ Scheduler index reconciled: {len(scheduled)} cron workflows")
+
+    def _drain_changes(self):
+        while True:
+            changed = self.redis.rpop(CHANGES_KEY, self.batch_size)
+            if not changed:
+                return
+            for workflow_id in set(changed):
+                self.apply_change(int(workflow_id))
+
+    # Dispatch
+
+    def _plan(self, workflow_id: int, fire_at: datetime):
+        self._planned[workflow_id] = fire_at
+        heapq.heappush(self._heap, (fire_at, workflow_id))
+
+    def _load_window(self, now: datetime):
+        """Pulls every job due before now + lookahead off the next_fire_at index"""
+        until = now + timedelta(seconds=self.lookahead)
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(WorkflowSchedule.workflow_id, WorkflowSchedule.next_fire_at)
+                .where(WorkflowSchedule.next_fire_at < until)
+                .where(WorkflowSchedule.next_fire_at >= self._loaded_until)
+                .order_by(WorkflowSchedule.next_fire_at)
+            ).all()
+        finally:
+            db.close()
+        for workflow_id, fire_at in rows:
+            if workflow_id not in self._planned:
+                self._plan(workflow_id, fire_at)
+        self._loaded_until = until
+
+    def dispatch_due(self, now: Optional[datetime] = None) -> int:
+        """Enqueues up to one batch of due jobs; returns how many due entries it handled"""
+        now = now or datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            fire_at, workflow_id = heapq.heappop(self._heap)
+            if self._planned.get(workflow_id) == fire_at:
+                del self._planned[workflow_id]
+                due.append((workflow_id, fire_at))
+        if not due:
+            return 0
+
+        # Claim every (workflow, fire time) in one round trip, then enqueue the winners in another
+        pipe = self.redis.pipeline(transaction=False)
+        for workflow_id, fire_at in due:
+            claim = FIRED_KEY.format(workflow_id=workflow_id, fire_at=int(fire_at.replace(tzinfo=timezone.utc).timestamp()))
+            pipe.set(claim, self.node_id, nx=True, ex=FIRED_KEY_TTL)
+        claimed = pipe.execute()
+
+        lag_base = datetime.utcnow()
+        pipe = self.redis.pipeline(transaction=False)
+        for (workflow_id, fire_at), won in zip(due, claimed):
+            if won:
+                SCHEDULER_LAG.observe(max(0.0, (lag_base - fire_at).total_seconds()))
+                enqueue_task(workflow_id, {"scheduled_for": fire_at.isoformat()}, client=pipe)
+        pipe.execute()
+
+        db = self.session_factory()
+        try:
+            ids = [workflow_id for workflow_id, _ in due]
+            schedules = {
+                schedule.workflow_id: schedule
+                for schedule in db.execute(select(WorkflowSchedule).where(WorkflowSchedule.workflow_id.in_(ids))).scalars()
+            }
+            for workflow_id, fire_at in due:
+                schedule = schedules.get(workflow_id)
+                if schedule is None:
+                    continue
+                trigger = self._triggers.get(workflow_id)
+                if trigger is None:
+                    trigger = self._triggers[workflow_id] = parse_schedule({"cron": schedule.cron, "timezone": schedule.timezone})
+                # Coalesce misfires: the next run is computed from now, not from fire_at
+                schedule.last_fired_at = fire_at
+                schedule.next_fire_at = next_fire_time(trigger, max(now, fire_at))
+                if schedule.next_fire_at is not None and schedule.next_fire_at < self._loaded_until:
+                    self._plan(workflow_id, schedule.next_fire_at)
+            db.commit()
+        finally:
+            db.close()
+        return len(due)
+
+    def _seconds_until_next(self, now: datetime) -> float:
+        horizon = self._loaded_until
+        if self._heap:
+            horizon = min(horizon, self._heap[0][0])
+        # Wake at least every second to renew the lock and pick up edits
+        return max(0.0, min(1.0, (horizon - now).total_seconds()))
+
+    def tick(self):
+        if not self._hold_leadership():
+            return
+        now = datetime.utcnow()
+        self._drain_changes()
+        if now >= self._loaded_until:
+            self._load_window(now)
+        while self.dispatch_due(now):
+            pass
+        if self.redis.set(RETENTION_KEY, self.node_id, nx=True, ex=86400):
+            threading.Thread(target=self.cleanup_logs, name="log-retention", daemon=True).start()
+
+    def start(self):
+        print(f"⏰ Scheduler {self.node_id} started")
+        while not self.stopping.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"❌ Scheduler tick failed: {e}")
+                self._step_down()
+            self.stopping.wait(self._seconds_until_next(datetime.utcnow()) if self.is_leader else self.leader_ttl / 3)
+        self.shutdown()
+
+    def stop(self, *_):
+        self.stopping.set()
+
+    def shutdown(self):
+        """Releases leadership so another replica can take over immediately"""
+        if self.is_leader and self.lock is not None:
+            try:
+                self.lock.release()
+            except redis.exceptions.LockError:
+                pass
+        self._step_down()
+
+    # Manual operations
 
     def run_workflow_now(self, workflow):
         """Executes a workflow immediately regardless of its schedule."""
-        # This runs the same function the scheduler usually calls
-        # but uses the 'add_job' with no trigger to run once, now.
-        self.scheduler.add_job(
-            id=f"manual_{workflow.id}",
-            func=self.execute_workflow, # The function that does the actual work
-            args=[workflow.id],
-            replace_existing=True
-        )
+        self.enqueue_task(workflow.id)
         print(f"🚀 Manually triggered workflow: {workflow.name}")
-        
-    def add_workflow_job(self, workflow):
-        """Adds a job to the scheduler based on workflow definition"""
-        trigger_config = workflow.definition.get("schedule", {})
-        
-        # Implement Cron Trigger Parsing
-        # Example: {"cron": "0 9 * * *"} (Every day at 9 AM)
-        if "cron" in trigger_config:
-            trigger = CronTrigger.from_crontab(trigger_config["cron"])
-            self.scheduler.add_job(
-                execute_workflow,
-                trigger=trigger,
-                args=[workflow.id],
-                id=f"workflow_{workflow.id}",
-                replace_existing=True
-            )
-        pass
-    
-    def shutdown(self):
-        """Cleanly stop the scheduler"""
-        self.scheduler.shutdown(wait=False)
 
     def enqueue_task(self, workflow_id: int):
         """Pushes a workflow task into the Redis queue"""
-        task_data = json.dumps({"workflow_id": workflow_id, "action": "execute"})
-        redis_client.lpush("workflow_queue", task_data)
+        enqueue_task(workflow_id, client=self.redis)
         print(f"📥 Enqueued workflow {workflow_id}")
 
-    def add_workflow_job(self, workflow):
-        # Update your scheduler to use the queue instead of direct execution
-        self.scheduler.add_job(
-            self.enqueue_task,
-            trigger=CronTrigger.from_crontab(workflow.definition["cron"]),
-            args=[workflow.id],
-            id=f"wf_{workflow.id}"
-        )
-    
     def cleanup_logs(self):
-        """Keep the database lean by removing old logs."""
-        db = SessionLocal()
-        try:
-            # Logic: Delete logs where ID is NOT in the top 1000
-            # This is high-performance for SQLite
-            db.execute("""
-                DELETE FROM task_logs 
-                WHERE id NOT IN (
-                    SELECT id FROM task_logs 
-                    ORDER BY execution_time DESC 
-                    LIMIT 1000
-                )
-            """)
-            db.commit()
-            print("🧹 Log cleanup complete: Kept last 1000 entries.")
-        finally:
-            db.close()
+        """Keep the database lean by archiving and removing expired logs in small chunks."""
+        deleted = retention_engine.run()
+        print(f"🧹 Log cleanup complete: archived and deleted {deleted} entries.")
+
+
+# Not started on import; run `python -m app.services.scheduler` in the scheduler role
+def main():
+    # Built here rather than at import: only the scheduler process runs one
+    scheduler = AutomationScheduler()
+    serve_metrics(SCHEDULER_METRICS_PORT)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.start()
 
 
-scheduler_service = AutomationScheduler()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
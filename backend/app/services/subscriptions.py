@@ -0,0 +1,246 @@
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from app.core.config import redis_client
+from app.models import Workflow
+from app.services.database import SessionLocal
+from app.services.conditions import Condition, ConditionError, compile_expression, resolve
+from app.services.workflow_service import INVALIDATION_CHANNEL
+
+EVENT_TRIGGER = "event"
+
+
+@dataclass(frozen=True)
+class Subscription:
+    workflow_id: int
+    event: str
+    # Dotted payload paths and the values they must equal, sorted by path
+    keys: Tuple[Tuple[str, ...], ...] = ()
+    values: Tuple[Any, ...] = ()
+    where: Optional[Condition] = None
+
+
+def _match_key(value: Any):
+    """Hashable lookup key; keeps True apart from 1, which Python hashes alike"""
+    return (isinstance(value, bool), value)
+
+
+def parse_subscription(workflow_id: Optional[int], trigger_type: Optional[str], config: Dict[str, Any]) -> Optional[Subscription]:
+    """
+    Reads an event trigger from a workflow's trigger_config:
+
+        {"event": "order.created",
+         "match": {"source": "shopify", "customer.tier": "gold"},
+         "where": "payload.total > 100"}
+
+    `match` values are compared for equality against the event payload and
+    are what the index is keyed on; the optional `where` expression is
+    checked only for workflows that already matched. Returns None for
+    workflows that are not event-triggered, raises ValueError for a bad config.
+    """
+    if trigger_type != EVENT_TRIGGER:
+        return None
+    event = config.get("event")
+    if not isinstance(event, str) or not event:
+        raise ValueError("event triggers need an 'event' type in trigger_config")
+
+    match = config.get("match") or {}
+    if not isinstance(match, dict):
+        raise ValueError("'match' must map payload fields to values")
+    for field, value in match.items():
+        if not isinstance(value, (str, int, float, bool)) and value is not None:
+            raise ValueError(f"match value for '{field}' must be a string, number, boolean or null")
+    ordered = sorted(match.items())
+
+    where = config.get("where")
+    if where is not None:
+        if not isinstance(where, str):
+            raise ValueError("'where' must be an expression string")
+        try:
+            where = compile_expression(where)
+        except ConditionError as e:
+            raise ValueError(f"invalid 'where': {e}") from e
+
+    return Subscription(
+        workflow_id=workflow_id,
+        event=event,
+        keys=tuple(tuple(field.split(".")) for field, _ in ordered),
+        values=tuple(_match_key(value) for _, value in ordered),
+        where=where
+    )
+
+
+class SubscriptionIndex:
+    """
+    In-memory index from events to the workflows subscribed to them.
+
+    Subscriptions are grouped by event type, then by which payload fields
+    they match on (their "signature"), then by the values of those fields.
+    Matching an event is one dict lookup per distinct signature of its
+    type, no matter how many workflows subscribe, and `where` conditions
+    only run for workflows that already matched.
+
+    Built from the database at startup; workflow edits update it for one
+    workflow at a time, here directly and in other processes through the
+    definition cache's invalidation channel.
+    """
+
+    def __init__(self, client=None):
+        self.redis = client or redis_client
+        # event -> signature (tuple of paths) -> values -> {workflow ids}
+        self._index: Dict[str, Dict[tuple, Dict[tuple, set]]] = {}
+        self._subscriptions: Dict[int, Subscription] = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self.loaded = False
+        self.stats = {"events": 0, "matches": 0, "refreshes": 0}
+
+    def _add(self, subscription: Subscription):
+        signatures = self._index.setdefault(subscription.event, {})
+        table = signatures.setdefault(subscription.keys, {})
+        table.setdefault(subscription.values, set()).add(subscription.workflow_id)
+        self._subscriptions[subscription.workflow_id] = subscription
+
+    def _remove(self, workflow_id: int):
+        subscription = self._subscriptions.pop(workflow_id, None)
+        if subscription is None:
+            return
+        signatures = self._index[subscription.event]
+        table = signatures[subscription.keys]
+        ids = table[subscription.values]
+        ids.discard(workflow_id)
+        # Prune empty levels so match cost tracks live signatures only
+        if not ids:
+            del table[subscription.values]
+        if not table:
+            del signatures[subscription.keys]
+        if not signatures:
+            del self._index[subscription.event]
+
+    @staticmethod
+    def _from_row(workflow_id: int, trigger_type: Optional[str], enabled: bool, trigger_config: Optional[str]) -> Optional[Subscription]:
+        if trigger_type != EVENT_TRIGGER or not enabled:
+            return None
+        try:
+            config = json.loads(trigger_config) if trigger_config else {}
+            return parse_subscription(workflow_id, trigger_type, config if isinstance(config, dict) else {})
+        except ValueError as e:
+            logging.warning(f"⚠️ Workflow {workflow_id} has an invalid event trigger, not subscribing it: {e}")
+            return None
+
+    def load(self):
+        """Rebuilds the whole index from the workflows table"""
+        db = SessionLocal()
+        try:
+            rows = db.query(Workflow.id, Workflow.trigger_type, Workflow.enabled, Workflow.trigger_config).filter(
+                Workflow.trigger_type == EVENT_TRIGGER
+            ).all()
+        finally:
+            db.close()
+
+        subscriptions = [sub for sub in (self._from_row(*row) for row in rows) if sub is not None]
+        with self._lock:
+            self._index = {}
+            self._subscriptions = {}
+            for subscription in subscriptions:
+                self._add(subscription)
+            self.loaded = True
+        print(f"🔔 Indexed {len(subscriptions)} event subscription(s)")
+
+    def put(self, workflow: Workflow):
+        """Re-indexes one workflow from its row (after create, update or enable/disable)"""
+        subscription = self._from_row(workflow.id, workflow.trigger_type, workflow.enabled, workflow.trigger_config)
+        with self._lock:
+            self.stats["refreshes"] += 1
+            self._remove(workflow.id)
+            if subscription is not None:
+                self._add(subscription)
+
+    def remove(self, workflow_id: int):
+        with self._lock:
+            self.stats["refreshes"] += 1
+            self._remove(workflow_id)
+
+    def refresh(self, workflow_id: int):
+        """Re-reads one workflow from the database; used for edits made by other processes"""
+        db = SessionLocal()
+        try:
+            workflow = db.get(Workflow, workflow_id)
+            if workflow is None:
+                self.remove(workflow_id)
+            else:
+                self.put(workflow)
+        finally:
+            db.close()
+
+    def match(self, event: str, payload: Optional[Dict[str, Any]]) -> List[int]:
+        """Ids of the enabled workflows subscribed to this event, in id order"""
+        payload = payload or {}
+        matched = []
+        with self._lock:
+            self.stats["events"] += 1
+            signatures = self._index.get(event)
+            if not signatures:
+                return []
+            for keys, table in signatures.items():
+                values = tuple(_match_key(resolve(payload, path)) for path in keys)
+                try:
+                    ids = table.get(values)
+                except TypeError:
+                    # A list or object where a scalar was expected matches nothing
+                    continue
+                if ids:
+                    matched.extend(self._subscriptions[workflow_id] for workflow_id in ids)
+
+        context = {"payload": payload}
+        workflow_ids = sorted(sub.workflow_id for sub in matched if sub.where is None or sub.where(context))
+        self.stats["matches"] += len(workflow_ids)
+        return workflow_ids
+
+    def _listen(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(INVALIDATION_CHANNEL)
+        for message in pubsub.listen():
+            try:
+                workflow_id = int(message["data"])
+            except (TypeError, ValueError):
+                continue
+            self.refresh(workflow_id)
+
+    def _listen_forever(self):
+        while True:
+            try:
+                self._listen()
+            except redis.RedisError as e:
+                # Edits published while disconnected are lost, so rebuild once reconnected
+                logging.warning(f"⚠️ Subscription listener disconnected: {e}")
+                threading.Event().wait(1)
+                try:
+                    self.load()
+                except Exception as load_error:
+                    logging.error(f"❌ Could not rebuild the subscription index: {load_error}")
+
+    def start_listener(self):
+        """Follows workflow edits made by other processes (idempotent)"""
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen_forever, name="wf-subscriptions", daemon=True)
+        self._listener.start()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "subscriptions": len(self._subscriptions),
+                "event_types": len(self._index),
+                "signatures": sum(len(signatures) for signatures in self._index.values()),
+                "loaded": self.loaded
+            }
+
+
+subscription_index = SubscriptionIndex()
@@ -0,0 +1,111 @@
+import json
+import time
+import uuid
+import signal
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from app.core.config import redis_client, LazyScript
+from app.services.queue import QUEUE_KEY
+
+TIMERS_KEY = "workflow_timers"
+
+# Pops up to ARGV[2] due timers and pushes them onto the queue in one step,
+# so a crash can never remove a timer without enqueueing it
+RELEASE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, entry in ipairs(due) do
+    redis.call('ZREM', KEYS[1], entry)
+    redis.call('LPUSH', KEYS[2], entry)
+end
+return #due
+"""
+
+
+class TimerService:
+    """
+    Durable wake-ups for parked workflow runs.
+
+    A `delay` step does not sleep: the executor records where the run stopped
+    in the `workflow_timers` sorted set (scored by due time) and frees its
+    worker slot. This service moves due entries back onto `workflow_queue` as
+    resume tasks, so any worker can continue the run at the next step.
+    Timers are only as durable as Redis: it must not evict keys and must
+    persist them across restarts (see the redis service in docker-compose.yml).
+    """
+
+    def __init__(self, client=None, poll_interval: float = 1.0, batch_size: int = 100):
+        self.redis = client or redis_client
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.stopping = threading.Event()
+        self._release = LazyScript(self.redis, RELEASE_SCRIPT)
+
+    def schedule(
+        self,
+        workflow_id: int,
+        run_id: str,
+        start_step: int,
+        due_at: float,
+        payload: Optional[Dict[str, Any]] = None,
+        action: str = "resume",
+        attempt: int = 0,
+        retries: int = 0
+    ) -> str:
+        """
+        Queues a run to continue at `start_step` once `due_at` passes. Failed
+        steps come back through here too (action "retry"), so a backoff never
+        holds a worker thread.
+        """
+        timer_id = uuid.uuid4().hex
+        entry = json.dumps({
+            "task_id": timer_id,
+            "workflow_id": workflow_id,
+            "action": action,
+            "run_id": run_id,
+            "start_step": start_step,
+            "attempt": attempt,
+            "retries": retries,
+            "payload": payload or {},
+            "enqueued_at": due_at
+        })
+        self.redis.zadd(TIMERS_KEY, {entry: due_at})
+        return timer_id
+
+    def pending(self) -> int:
+        return self.redis.zcard(TIMERS_KEY)
+
+    def release_due(self, now: Optional[float] = None) -> int:
+        """Enqueues every timer that is due, returns how many were released"""
+        now = now if now is not None else time.time()
+        # Atomic, so several timer loops never release the same entry twice
+        return self._release(keys=[TIMERS_KEY, QUEUE_KEY], args=[now, self.batch_size])
+
+    def start(self):
+        while not self.stopping.is_set():
+            try:
+                # Keep draining while full batches come back
+                while self.release_due() == self.batch_size:
+                    pass
+            except Exception as e:
+                logging.error(f"❌ Timer service failed: {e}")
+            self.stopping.wait(self.poll_interval)
+
+    def stop(self, *_):
+        self.stopping.set()
+
+
+timer_service = TimerService()
+
+
+def main():
+    service = TimerService()
+    signal.signal(signal.SIGTERM, service.stop)
+    signal.signal(signal.SIGINT, service.stop)
+    print("⏰ Timer service started")
+    service.start()
+
+
+if __name__ == "__main__":
+    main()
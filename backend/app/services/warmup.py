@@ -0,0 +1,83 @@
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+
+from app.core.config import WARMUP_WORKFLOWS, WARMUP_WINDOW
+from app.models import TaskLog
+from app.services.database import SessionLocal
+from app.services.workflow_service import definition_cache
+from app.services.plan import PlanCompileError, plan_cache
+from app.services.clients import client_registry
+
+
+def hot_workflow_ids(db, limit: int = WARMUP_WORKFLOWS, window: int = WARMUP_WINDOW) -> List[int]:
+    """The workflows that ran most in the last `window` seconds, busiest first"""
+    since = datetime.utcnow() - timedelta(seconds=window)
+    runs = func.count(TaskLog.id)
+    rows = db.execute(
+        select(TaskLog.workflow_id, runs)
+        .where(TaskLog.started_at >= since, TaskLog.workflow_id.is_not(None))
+        .group_by(TaskLog.workflow_id)
+        .order_by(runs.desc())
+        .limit(limit)
+    ).all()
+    return [workflow_id for workflow_id, _ in rows]
+
+
+def _integration_ids(plan) -> set:
+    ids = set()
+    for step in plan.steps:
+        for candidate in (step, step.inner):
+            if candidate is not None and candidate.integration_id is not None:
+                ids.add(candidate.integration_id)
+        source = step.params.get("source") if step.type == "foreach" else None
+        if source:
+            ids.add(source["integration_id"])
+    return ids
+
+
+def warm_up(handlers=None, limit: int = WARMUP_WORKFLOWS) -> Dict[str, Any]:
+    """
+    Loads the hottest workflow definitions into the definition cache so the
+    first triggers after a deploy are cache hits. With `handlers` (workers)
+    it also compiles their plans and opens the pooled clients of every
+    integration they use.
+    """
+    started = time.perf_counter()
+    summary = {"workflows": 0, "plans": 0, "integrations": 0}
+    if limit <= 0:
+        return summary
+
+    integration_ids = set()
+    db = SessionLocal()
+    try:
+        for workflow_id in hot_workflow_ids(db, limit):
+            definition = definition_cache.get(workflow_id, db)
+            if definition is None:
+                continue
+            summary["workflows"] += 1
+            if handlers is None:
+                continue
+            try:
+                plan = plan_cache.get(definition, handlers)
+            except PlanCompileError:
+                # Surfaces as a failed run when triggered; nothing to warm
+                continue
+            summary["plans"] += 1
+            integration_ids |= _integration_ids(plan)
+    finally:
+        db.close()
+
+    for integration_id in sorted(integration_ids):
+        try:
+            client_registry.get(integration_id)
+            summary["integrations"] += 1
+        except Exception as e:
+            logging.warning(f"⚠️ Could not preload client for integration {integration_id}: {e}")
+
+    summary["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"🔥 Warmed {summary['workflows']} workflow(s), {summary['plans']} plan(s), {summary['integrations']} client(s) in {summary['ms']}ms")
+    return summary
@@ -1,9 +1,136 @@
-from app.services.executor import execute_workflow
-
-@router.post("/{workflow_id}/trigger")
-async def manual_trigger(workflow_id: int):
-    """Manually trigger a workflow via API/Webhook"""
-    # In a real app, you'd move this to a background task
-    # so the API responds instantly.
-    execute_workflow(workflow_id)
-    return {"message": f"Workflow {workflow_id} triggered successfully"}
\ No newline at end of file
+import json
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.config import redis_client, INGEST_MAX_QUEUE_DEPTH, INGEST_IDEMPOTENCY_WINDOW
+from app.services.database import SessionLocal
+from app.services.queue import enqueue_task, enqueue_tasks, queue_depth
+from app.services.log_writer import log_writer
+from app.services.workflow_service import get_workflow_definition
+from app.services.subscriptions import subscription_index
+
+
+class WorkflowNotFound(LookupError):
+    pass
+
+
+class WorkflowDisabled(RuntimeError):
+    pass
+
+
+class QueueFull(RuntimeError):
+    """The execution queue is deeper than INGEST_MAX_QUEUE_DEPTH"""
+
+    def __init__(self, depth: int, retry_after: int = 5):
+        super().__init__(f"execution queue is full ({depth} pending)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+def idempotency_key(workflow_id: int, key: str) -> str:
+    return f"trigger_idem:{workflow_id}:{key}"
+
+
+def load_definition(workflow_id: int):
+    # Normally an in-process LRU hit; the session is only used on a miss
+    db = SessionLocal()
+    try:
+        return get_workflow_definition(workflow_id, db)
+    finally:
+        db.close()
+
+
+def ingest_trigger(
+    workflow_id: int,
+    payload: Optional[Dict[str, Any]] = None,
+    key: Optional[str] = None,
+    client=None
+) -> Dict[str, Any]:
+    """
+    Accepts a trigger without running it: validates the workflow, dedupes on
+    the client's idempotency key, records a 'queued' TaskLog and enqueues the
+    run for the worker pool. Returns the run id (the original one for a
+    duplicate delivery).
+    """
+    client = client or redis_client
+    definition = load_definition(workflow_id)
+    if definition is None:
+        raise WorkflowNotFound(f"Workflow {workflow_id} not found")
+    if not definition.get("enabled", True):
+        raise WorkflowDisabled(f"Workflow {workflow_id} is disabled")
+
+    idem_key = idempotency_key(workflow_id, key) if key else None
+    if idem_key:
+        existing = client.get(idem_key)
+        if existing:
+            return {"run_id": existing, "duplicate": True}
+
+    depth = queue_depth(client)
+    if depth >= INGEST_MAX_QUEUE_DEPTH:
+        raise QueueFull(depth)
+
+    run_id = uuid.uuid4().hex
+    # Claim the key before doing any work so concurrent retries of the same delivery collapse
+    if idem_key and not client.set(idem_key, run_id, nx=True, ex=INGEST_IDEMPOTENCY_WINDOW):
+        return {"run_id": client.get(idem_key), "duplicate": True}
+
+    try:
+        # Buffered: the worker may record the run before this row is written; LogWriter upserts either order
+        log_writer.create(workflow_id, "queued", run_id=run_id)
+        try:
+            enqueue_task(workflow_id, payload, client=client, run_id=run_id)
+        except Exception as e:
+            log_writer.update(run_id, status="failed", error_message=f"enqueue failed: {e}")
+            raise
+    except Exception:
+        # Let the provider's retry go through
+        if idem_key:
+            client.delete(idem_key)
+        raise
+    return {"run_id": run_id, "duplicate": False}
+
+
+def ingest_event(
+    event: str,
+    payload: Optional[Dict[str, Any]] = None,
+    key: Optional[str] = None,
+    client=None
+) -> Dict[str, Any]:
+    """
+    Fans an event out to every enabled workflow subscribed to it: one
+    'queued' TaskLog per matching workflow and a single LPUSH for all of
+    their tasks. A repeated idempotency key returns the original runs.
+    """
+    client = client or redis_client
+    idem_key = f"event_idem:{key}" if key else None
+    if idem_key:
+        existing = client.get(idem_key)
+        if existing:
+            return {"runs": json.loads(existing), "duplicate": True}
+
+    workflow_ids = subscription_index.match(event, payload)
+    if not workflow_ids:
+        return {"runs": [], "duplicate": False}
+
+    depth = queue_depth(client)
+    if depth >= INGEST_MAX_QUEUE_DEPTH:
+        raise QueueFull(depth)
+
+    runs = [{"workflow_id": workflow_id, "run_id": uuid.uuid4().hex} for workflow_id in workflow_ids]
+    if idem_key and not client.set(idem_key, json.dumps(runs), nx=True, ex=INGEST_IDEMPOTENCY_WINDOW):
+        return {"runs": json.loads(client.get(idem_key) or "[]"), "duplicate": True}
+
+    try:
+        for run in runs:
+            log_writer.create(run["workflow_id"], "queued", run_id=run["run_id"])
+        try:
+            enqueue_tasks([(run["workflow_id"], run["run_id"]) for run in runs], payload, client=client)
+        except Exception as e:
+            for run in runs:
+                log_writer.update(run["run_id"], status="failed", error_message=f"enqueue failed: {e}")
+            raise
+    except Exception:
+        if idem_key:
+            client.delete(idem_key)
+        raise
+    return {"runs": runs, "duplicate": False}
@@ -0,0 +1,226 @@
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import (
+    WORKER_CONCURRENCY,
+    WORKER_BATCH_SIZE,
+    WORKER_VISIBILITY_TIMEOUT,
+    METRICS_PORT
+)
+from app.services.queue import ReliableQueue, enqueue_task
+from app.services.timers import TimerService
+from app.services.executor import execute_workflow, ActionHandlers
+from app.services.workflow_service import definition_cache
+from app.services.log_writer import log_writer
+from app.services.clients import client_registry
+from app.services.outbound import outbound_batcher
+from app.services.checkpoints import RunJournal, run_journal, worker_identity
+from app.services.metrics import QUEUE_WAIT, serve_metrics
+from app.services.warmup import warm_up
+
+
+class WorkflowWorker:
+    """
+    Drains `workflow_queue` and runs each task through the executor.
+
+    Tasks are only leased when a slot is free, so a busy worker never holds
+    work another worker could be running. Start as many of these per host as
+    needed: `python -m app.services.worker --concurrency 8`.
+
+    On startup, and on every reaper pass, runs interrupted by a dead worker
+    are re-enqueued from their step journal (app/services/checkpoints.py).
+    Give each worker a stable WORKER_NAME (qualified with the host name, so
+    scaled replicas stay distinct) so a restart recovers its own runs
+    immediately instead of waiting for their heartbeats to go stale.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        concurrency: int = WORKER_CONCURRENCY,
+        batch_size: int = WORKER_BATCH_SIZE,
+        visibility_timeout: int = WORKER_VISIBILITY_TIMEOUT,
+        handler=execute_workflow,
+        warmup: bool = True
+    ):
+        self.redis = client
+        self.queue = ReliableQueue(client, visibility_timeout=visibility_timeout)
+        self.journal = RunJournal(client) if client is not None else run_journal
+        self.timers = TimerService(client)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.handler = handler
+        self.warmup = warmup
+        self.worker_id = worker_identity()
+        self.slots = threading.Semaphore(concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="wf-worker")
+        self.stopping = threading.Event()
+        self.inflight = set()
+        # raw task -> run id, for journal heartbeats
+        self.running_runs = {}
+        self.inflight_lock = threading.Lock()
+        # Reap expired leases a few times per visibility window
+        self.reap_interval = max(1, visibility_timeout // 4)
+
+    def run_task(self, raw: str):
+        try:
+            task = json.loads(raw)
+            if task.get("enqueued_at"):
+                QUEUE_WAIT.observe(max(0.0, time.time() - task["enqueued_at"]))
+            with self.inflight_lock:
+                self.running_runs[raw] = task.get("run_id") or task.get("task_id")
+            self.handler(
+                task["workflow_id"],
+                task.get("payload"),
+                run_id=task.get("run_id"),
+                start_step=task.get("start_step", 0),
+                attempt=task.get("attempt", 0),
+                retries=task.get("retries", 0),
+                task_id=task.get("task_id")
+            )
+        except Exception as e:
+            # Poison or failed tasks are acked too: the failure is already in
+            # the TaskLog, and retrying here would loop forever.
+            logging.error(f"❌ Worker {self.worker_id} task failed: {e}")
+        finally:
+            self.queue.ack(raw)
+            with self.inflight_lock:
+                self.inflight.discard(raw)
+                self.running_runs.pop(raw, None)
+            self.slots.release()
+
+    def _acquire_free_slots(self) -> int:
+        """Waits for at least one slot, then grabs as many more as are free (up to batch size)"""
+        while not self.slots.acquire(timeout=1):
+            if self.stopping.is_set():
+                return 0
+        acquired = 1
+        while acquired < self.batch_size and self.slots.acquire(blocking=False):
+            acquired += 1
+        return acquired
+
+    def run_once(self, block_timeout: int = 5) -> int:
+        """Fetches and dispatches one batch, returns how many tasks were started"""
+        free = self._acquire_free_slots()
+        if not free:
+            return 0
+
+        try:
+            batch = self.queue.fetch(free, block_timeout=block_timeout)
+        except Exception:
+            for _ in range(free):
+                self.slots.release()
+            raise
+
+        # Give back the slots we reserved but did not fill
+        for _ in range(free - len(batch)):
+            self.slots.release()
+
+        with self.inflight_lock:
+            self.inflight.update(batch)
+        for raw in batch:
+            self.pool.submit(self.run_task, raw)
+        return len(batch)
+
+    def recover(self) -> int:
+        """Re-enqueues runs whose worker died mid-run; they resume after their last journaled step"""
+        recovered = self.journal.recover(
+            lambda workflow_id, payload, run_id: enqueue_task(workflow_id, payload, client=self.redis, run_id=run_id),
+            stale_after=self.queue.visibility_timeout
+        )
+        if recovered:
+            print(f"♻️ Recovered {recovered} interrupted run(s)")
+        return recovered
+
+    def _reap(self):
+        # Heartbeat our own running tasks so only dead workers' leases expire
+        with self.inflight_lock:
+            running = list(self.inflight)
+            run_ids = [run_id for run_id in self.running_runs.values() if run_id]
+        for raw in running:
+            self.queue.extend(raw)
+        self.journal.heartbeat(run_ids)
+
+        requeued = self.queue.requeue_expired()
+        if requeued:
+            print(f"♻️ Requeued {requeued} expired task(s)")
+        self.recover()
+
+    def _reaper(self):
+        while not self.stopping.wait(self.reap_interval):
+            try:
+                self._reap()
+            except Exception as e:
+                logging.error(f"❌ Lease reaper failed: {e}")
+
+    def start(self):
+        """Runs the fetch loop until `stop()` is called or a signal arrives"""
+        print(f"👷 Worker {self.worker_id} started with {self.concurrency} slots")
+        try:
+            # Pick up whatever the last deploy or crash interrupted before taking new work
+            self.queue.requeue_expired()
+            self.recover()
+        except Exception as e:
+            logging.error(f"❌ Startup recovery failed: {e}")
+        reaper = threading.Thread(target=self._reaper, name="wf-reaper", daemon=True)
+        reaper.start()
+        definition_cache.start_listener()
+        client_registry.start()
+        if self.warmup:
+            try:
+                # Hot plans compiled and their clients connected before the first fetch
+                warm_up(handlers=ActionHandlers)
+            except Exception as e:
+                logging.warning(f"⚠️ Warm-up failed, continuing cold: {e}")
+        # Every worker also releases due delay timers; claims are atomic
+        timers = threading.Thread(target=self.timers.start, name="wf-timers", daemon=True)
+        timers.start()
+        print(f"✅ Worker {self.worker_id} ready")
+
+        while not self.stopping.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"❌ Worker {self.worker_id} fetch failed: {e}")
+                self.stopping.wait(1)
+
+        self.timers.stop()
+        # Let in-flight tasks finish so they are acked rather than reaped
+        self.pool.shutdown(wait=True)
+        outbound_batcher.stop()
+        log_writer.flush()
+        client_registry.close_all()
+        print(f"👋 Worker {self.worker_id} stopped")
+
+    def stop(self, *_):
+        self.stopping.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workflow queue worker")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=WORKER_BATCH_SIZE)
+    parser.add_argument("--visibility-timeout", type=int, default=WORKER_VISIBILITY_TIMEOUT)
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="0 disables")
+    parser.add_argument("--no-warmup", action="store_true", help="skip preloading hot workflows and clients")
+    args = parser.parse_args()
+
+    serve_metrics(args.metrics_port)
+    worker = WorkflowWorker(
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        visibility_timeout=args.visibility_timeout,
+        warmup=not args.no_warmup
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,201 @@
 import json
-from app.core.config import redis_client
+import logging
+import threading
+from collections import OrderedDict
+
+import redis
+
+from app.core.config import redis_client, WORKFLOW_CACHE_SIZE, WORKFLOW_CACHE_TTL
+from app.models import Workflow
+from app.services.plan import plan_cache
+
+INVALIDATION_CHANNEL = "workflow_def:invalidate"
+
+
+class WorkflowDefinitionCache:
+    """
+    Two-tier cache for workflow definitions: a size-bounded in-process LRU in
+    front of Redis, in front of SQLite.
+
+    - Edits call `invalidate()`, which drops the Redis key and publishes the id
+      so every process evicts its local copy.
+    - Concurrent misses for the same id are collapsed into one DB load.
+    - A per-id generation counter stops a load that raced an invalidation from
+      re-populating either tier with the old definition.
+    - A failed load is re-raised in every caller waiting on it, not reported
+      as a missing workflow.
+    """
+
+    def __init__(self, client=None, max_size: int = WORKFLOW_CACHE_SIZE, ttl: int = WORKFLOW_CACHE_TTL):
+        self.redis = client or redis_client
+        self.max_size = max_size
+        self.ttl = ttl
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        self._generations = {}
+        self._listener = None
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def cache_key(workflow_id: int) -> str:
+        return f"workflow_def:{workflow_id}"
+
+    def _get_local(self, workflow_id: int):
+        with self._lock:
+            definition = self._local.get(workflow_id)
+            if definition is not None:
+                self._local.move_to_end(workflow_id)
+                self.stats["local_hits"] += 1
+            return definition
+
+    def _is_current(self, workflow_id: int, generation: int) -> bool:
+        with self._lock:
+            return self._generations.get(workflow_id, 0) == generation
+
+    def _put_local(self, workflow_id: int, definition, generation: int):
+        with self._lock:
+            if self._generations.get(workflow_id, 0) != generation:
+                return
+            self._local[workflow_id] = definition
+            self._local.move_to_end(workflow_id)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def _evict_local(self, workflow_id: int):
+        with self._lock:
+            self._local.pop(workflow_id, None)
+            self._generations[workflow_id] = self._generations.get(workflow_id, 0) + 1
+
+    def get(self, workflow_id: int, db_session):
+        # 1. Try the in-process LRU
+        definition = self._get_local(workflow_id)
+        if definition is not None:
+            return definition
+
+        # 2. Single-flight: only one caller per id goes further, the rest wait for it
+        with self._lock:
+            generation = self._generations.get(workflow_id, 0)
+            inflight = self._loading.get(workflow_id)
+            leader = inflight is None
+            if leader:
+                inflight = self._loading[workflow_id] = {"event": threading.Event(), "value": None, "error": None}
+
+        if not leader:
+            inflight["event"].wait()
+            if inflight["error"] is not None:
+                raise inflight["error"]
+            return inflight["value"]
+
+        try:
+            definition = self._load(workflow_id, db_session, generation)
+            inflight["value"] = definition
+            if definition is not None:
+                self._put_local(workflow_id, definition, generation)
+            return definition
+        except Exception as e:
+            inflight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(workflow_id, None)
+            inflight["event"].set()
+
+    def _load(self, workflow_id: int, db_session, generation: int):
+        cache_key = self.cache_key(workflow_id)
+
+        # 3. Try Redis; an unreachable Redis degrades to a DB read instead of failing the run
+        try:
+            cached_wf = self.redis.get(cache_key)
+        except redis.RedisError as e:
+            logging.warning(f"⚠️ Redis unavailable for {cache_key}: {e}")
+            cached_wf = None
+        if cached_wf:
+            self.stats["redis_hits"] += 1
+            return json.loads(cached_wf)
+
+        # 4. If not in cache, get from SQLite
+        self.stats["misses"] += 1
+        workflow = db_session.get(Workflow, workflow_id)
+        if workflow is None:
+            return None
+
+        definition = workflow.definition
+        if not self._is_current(workflow_id, generation):
+            # Invalidated while we read: the row we hold may already be stale
+            return definition
+        try:
+            self.redis.setex(cache_key, self.ttl, json.dumps(definition))
+            # An invalidation that landed between the check and the SETEX
+            # deleted the key before we wrote it; take our write back
+            if not self._is_current(workflow_id, generation):
+                self.redis.delete(cache_key)
+        except redis.RedisError as e:
+            logging.warning(f"⚠️ Could not cache {cache_key}: {e}")
+        return definition
+
+    def invalidate(self, workflow_id: int):
+        """Drops a definition from every tier and tells other processes to do the same"""
+        self.stats["invalidations"] += 1
+        self._evict_local(workflow_id)
+        plan_cache.invalidate(workflow_id)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(self.cache_key(workflow_id))
+            pipe.publish(INVALIDATION_CHANNEL, str(workflow_id))
+            pipe.execute()
+        except redis.RedisError as e:
+            logging.error(f"❌ Could not publish invalidation for workflow {workflow_id}: {e}")
+
+    def _listen(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(INVALIDATION_CHANNEL)
+        for message in pubsub.listen():
+            try:
+                workflow_id = int(message["data"])
+            except (TypeError, ValueError):
+                continue
+            self._evict_local(workflow_id)
+            plan_cache.invalidate(workflow_id)
+
+    def start_listener(self):
+        """Subscribes to invalidations from other processes (idempotent)"""
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen_forever, name="wf-cache-invalidation", daemon=True)
+        self._listener.start()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                self._listen()
+            except redis.RedisError as e:
+                # Anything published while disconnected is lost, so start clean
+                logging.warning(f"⚠️ Invalidation listener disconnected: {e}")
+                with self._lock:
+                    self._local.clear()
+                threading.Event().wait(1)
+
+    def get_stats(self):
+        with self._lock:
+            size = len(self._local)
+        lookups = self.stats["local_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        hits = self.stats["local_hits"] + self.stats["redis_hits"]
+        return {
+            **self.stats,
+            "size": size,
+            "max_size": self.max_size,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None
+        }
+
+
+definition_cache = WorkflowDefinitionCache()
+
 
 def get_workflow_definition(workflow_id: int, db_session):
-    cache_key = f"workflow_def:{workflow_id}"
-    
-    # 1. Try to get from Cache
-    cached_wf = redis_client.get(cache_key)
-    if cached_wf:
-        return json.loads(cached_wf)
-    
-    # 2. If not in cache, get from SQLite
-    workflow = db_session.query(Workflow).get(workflow_id)
-    if workflow:
-        # Save to Redis for next time (Expires in 1 hour)
-        redis_client.setex(cache_key, 3600, json.dumps(workflow.definition))
-        return workflow.definition
-    return None
\ No newline at end of file
+    return definition_cache.get(workflow_id, db_session)
+
+
+def invalidate_workflow_definition(workflow_id: int):
+    definition_cache.invalidate(workflow_id)
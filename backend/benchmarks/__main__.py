@@ -0,0 +1,84 @@
+"""
+Offline benchmarks for the trigger → execute → log pipeline.
+
+    cd backend
+    python -m benchmarks --profile quick --output bench.json
+    python -m benchmarks --compare baseline.json --threshold 0.15
+
+Runs against a throwaway SQLite database and an in-process fakeredis, with
+outbound sends stubbed (`--latency-ms` simulates provider latency). Exits
+with status 1 when `--compare` finds a regression.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+from benchmarks.environment import BenchEnvironment
+from benchmarks.compare import compare, format_table
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the workflow pipeline")
+    parser.add_argument("--profile", choices=["quick", "full"], default="full")
+    parser.add_argument("--only", nargs="+", help="scenarios to run (default: all)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per outbound send")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging (fraction)")
+    args = parser.parse_args()
+
+    env = BenchEnvironment().setup()
+    # Imported after setup: the app binds its database and Redis client on import
+    from benchmarks.scenarios import SCENARIOS, PROFILES
+
+    names = args.only or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "profile": args.profile,
+            "latency_ms": args.latency_ms,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": {}
+    }
+    for name in names:
+        print(f"⏱️ {name} ...", flush=True)
+        started = time.perf_counter()
+        sizes = dict(PROFILES[args.profile].get(name, {}))
+        report["results"][name] = SCENARIOS[name](env, latency_ms=args.latency_ms, **sizes)
+        print(f"   {json.dumps(report['results'][name])} ({time.perf_counter() - started:.1f}s)", flush=True)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Results written to {args.output} (workdir {env.workdir})")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print(format_table(rows))
+        regressions = [row for row in rows if row["regression"]]
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
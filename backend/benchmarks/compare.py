@@ -0,0 +1,47 @@
+from typing import Any, Dict, List, Optional
+
+
+def direction(metric: str) -> Optional[str]:
+    """'lower' or 'higher' is better, None for informational values"""
+    if metric.endswith(("_ms", "_s")):
+        return "lower"
+    if metric.endswith("_per_sec"):
+        return "higher"
+    return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Lines up every directional metric present in both result files. A metric
+    regresses when it is worse than the baseline by more than `threshold`
+    (a fraction: 0.15 = 15%).
+    """
+    rows = []
+    for scenario, metrics in current.get("results", {}).items():
+        base_metrics = baseline.get("results", {}).get(scenario, {})
+        for metric, value in metrics.items():
+            better = direction(metric)
+            base = base_metrics.get(metric)
+            if better is None or not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or not base:
+                continue
+            change = (value - base) / base
+            worse = change > threshold if better == "lower" else change < -threshold
+            rows.append({
+                "scenario": scenario,
+                "metric": metric,
+                "baseline": base,
+                "current": value,
+                "change_pct": round(change * 100, 1),
+                "regression": worse
+            })
+    return rows
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'scenario':<12} {'metric':<34} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for row in rows:
+        flag = "  ❌ REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['scenario']:<12} {row['metric']:<34} {row['baseline']:>12} {row['current']:>12} {row['change_pct']:>+7.1f}%{flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import tempfile
+import statistics
+from typing import Any, Dict, List
+
+
+class BenchEnvironment:
+    """
+    An isolated SQLite database in a temp dir plus an in-process fakeredis
+    server standing in for Redis. `setup()` must run before anything imports
+    `app`, because the config reads the database URL at import time and every
+    service captures the Redis client when it is first imported.
+    """
+
+    def __init__(self, workdir: str = None):
+        self.workdir = workdir or tempfile.mkdtemp(prefix="waltermelon-bench-")
+        self.redis = None
+
+    def setup(self):
+        os.environ["DATABASE_URL"] = f"sqlite:///{self.workdir}/bench.db"
+        os.environ["LOG_ARCHIVE_DIR"] = os.path.join(self.workdir, "archive")
+        os.environ["METRICS_PORT"] = "0"
+
+        import fakeredis
+        from app.core import config
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        config.redis_client = self.redis
+
+        from app.services.database import migrate
+        migrate()
+        return self
+
+    def reset_redis(self):
+        self.redis.flushall()
+
+    def add_workflows(self, count: int, actions: list, trigger_type: str = "webhook", trigger_config: Dict[str, Any] = None) -> List[int]:
+        from app.services.database import SessionLocal
+        from app.models import Workflow
+        db = SessionLocal()
+        try:
+            workflows = [
+                Workflow(
+                    name=f"bench-{i}",
+                    trigger_type=trigger_type,
+                    trigger_config=json.dumps(trigger_config or {}),
+                    actions=json.dumps(actions)
+                )
+                for i in range(count)
+            ]
+            db.add_all(workflows)
+            db.commit()
+            return [workflow.id for workflow in workflows]
+        finally:
+            db.close()
+
+
+def stub_handlers(latency_ms: float):
+    """ActionHandlers stand-in whose sends just take `latency_ms`"""
+    seconds = latency_ms / 1000
+
+    def send(params, client=None, integration_id=None):
+        if seconds:
+            time.sleep(seconds)
+        return True
+
+    class StubHandlers:
+        email = staticmethod(send)
+        whatsapp = staticmethod(send)
+
+        @staticmethod
+        def delay(params):
+            return params.get("seconds", 0)
+
+    return StubHandlers
+
+
+def latency_summary(samples: List[float], prefix: str = "") -> Dict[str, float]:
+    """p50/p95/p99/max of samples given in seconds, reported in ms"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    quantiles = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    return {
+        f"{prefix}p50_ms": round(quantiles[49] * 1000, 3),
+        f"{prefix}p95_ms": round(quantiles[94] * 1000, 3),
+        f"{prefix}p99_ms": round(quantiles[98] * 1000, 3),
+        f"{prefix}max_ms": round(ordered[-1] * 1000, 3),
+    }
@@ -0,0 +1,324 @@
+"""
+Benchmark scenarios. Each takes the BenchEnvironment plus its sizes and
+returns a flat dict of metrics. Metric names carry their direction for the
+comparison mode: `*_ms` / `*_s` are lower-is-better, `*_per_sec` is
+higher-is-better, anything else (counts, sizes) is informational.
+"""
+import json
+import time
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from benchmarks.environment import stub_handlers, latency_summary
+
+
+def bench_trigger(env, requests: int = 2000, **_) -> Dict[str, Any]:
+    """POST /api/workflows/{id}/trigger: validate, dedupe, log 'queued', enqueue"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.log_writer import log_writer
+
+    env.reset_redis()
+    workflow_id = env.add_workflows(1, [{"type": "email", "params": {"to": "bench@example.com"}}])[0]
+    client = TestClient(app)
+    # Warm the definition cache and the connection pools
+    client.post(f"/api/workflows/{workflow_id}/trigger", json={})
+
+    samples = []
+    started = time.perf_counter()
+    for i in range(requests):
+        begin = time.perf_counter()
+        response = client.post(
+            f"/api/workflows/{workflow_id}/trigger",
+            json={"n": i},
+            headers={"Idempotency-Key": f"bench-{i}"}
+        )
+        samples.append(time.perf_counter() - begin)
+        if response.status_code != 202:
+            raise RuntimeError(f"trigger returned {response.status_code}: {response.text}")
+    elapsed = time.perf_counter() - started
+    log_writer.flush()
+
+    return {"requests": requests, "throughput_per_sec": round(requests / elapsed, 1), **latency_summary(samples)}
+
+
+def _best_rate(func, runs: int, rounds: int = 3) -> float:
+    """Calls per second of the fastest round; the slower ones are mostly scheduler noise"""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(runs):
+            func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(runs / best, 1)
+
+
+def bench_executor(env, runs: int = 2000, step_counts=(1, 5, 20), latency_ms: float = 0.0, **_) -> Dict[str, Any]:
+    """run_workflow_logic on compiled plans, and execute_workflow end to end"""
+    from app.services import executor
+    from app.services.plan import compile_plan
+    from app.services.log_writer import log_writer
+
+    handlers = stub_handlers(latency_ms)
+    results = {"latency_ms_per_step": latency_ms}
+    for count in step_counts:
+        steps = [{"type": "email", "params": {"to": f"user{i}@example.com"}} for i in range(count)]
+        plan = compile_plan(steps, handlers)
+        results[f"steps_{count}_runs_per_sec"] = _best_rate(lambda: executor.run_workflow_logic(plan, {"payload": {}}), runs)
+
+    # Definition lookup, plan cache, TaskLog writes and all, with stubbed sends
+    steps = [{"type": "email", "params": {"to": f"user{i}@example.com"}} for i in range(5)]
+    workflow_id = env.add_workflows(1, steps)[0]
+    real_handlers = executor.ActionHandlers
+    executor.ActionHandlers = handlers
+    try:
+        executor.execute_workflow(workflow_id, {})
+        results["execute_workflow_runs_per_sec"] = _best_rate(lambda: executor.execute_workflow(workflow_id, {}), runs)
+        log_writer.flush()
+    finally:
+        executor.ActionHandlers = real_handlers
+    return results
+
+
+def bench_scheduler(env, jobs: int = 10000, **_) -> Dict[str, Any]:
+    """Time from a shared cron fire time until each of `jobs` workflows is enqueued"""
+    from app.services.scheduler import AutomationScheduler
+    from app.services.queue import QUEUE_KEY
+
+    env.reset_redis()
+    env.add_workflows(jobs, [], trigger_type="cron", trigger_config={"cron": "* * * * *"})
+    scheduler = AutomationScheduler(client=env.redis)
+
+    started = time.perf_counter()
+    scheduler.reconcile()
+    reconcile_s = time.perf_counter() - started
+
+    fire_at = (datetime.utcnow() + timedelta(minutes=1)).replace(second=0, microsecond=0)
+    scheduler._load_window(fire_at)
+    lags = []
+    started = time.perf_counter()
+    while True:
+        # Every job is treated as due the moment dispatch starts
+        handled = scheduler.dispatch_due(fire_at)
+        if not handled:
+            break
+        lags.extend([time.perf_counter() - started] * handled)
+    dispatch_s = time.perf_counter() - started
+
+    enqueued = env.redis.llen(QUEUE_KEY)
+    if enqueued < jobs:
+        raise RuntimeError(f"only {enqueued} of {jobs} cron jobs were enqueued")
+    return {
+        "jobs": jobs,
+        "reconcile_s": round(reconcile_s, 3),
+        "dispatch_s": round(dispatch_s, 3),
+        "dispatch_per_sec": round(jobs / dispatch_s, 1),
+        **latency_summary(lags, prefix="lag_")
+    }
+
+
+def bench_log_writes(env, rows: int = 50000, **_) -> Dict[str, Any]:
+    """LogWriter inserts plus one status update per run, as the executor issues them"""
+    from app.services.log_writer import LogWriter
+
+    writer = LogWriter()
+    started = time.perf_counter()
+    for _ in range(rows):
+        run_id = writer.create(1, "running")
+        writer.update(run_id, status="success", completed_at=datetime.utcnow())
+    writer.stop()
+    elapsed = time.perf_counter() - started
+    results = {"rows": rows, "rows_per_sec": round(rows / elapsed, 1)}
+
+    # Again with the execution_data a finished run carries, which is compressed on the way in
+    from sqlalchemy import func, select
+    from app.models import TaskLogPayload
+    from app.services.database import SessionLocal
+
+    writer = LogWriter()
+    started = time.perf_counter()
+    for i in range(rows):
+        run_id = writer.create(1, "running")
+        data = {
+            "payload": {"order_id": i, "customer": f"customer-{i % 500}", "total": i % 997},
+            "timings": {"run_ms": 12.5, "steps": [
+                {"step": str(step), "type": "email", "ms": 3.1, "ok": True} for step in range(4)
+            ]}
+        }
+        writer.update(run_id, status="success", completed_at=datetime.utcnow(), execution_data=json.dumps(data))
+    writer.stop()
+    elapsed = time.perf_counter() - started
+    db = SessionLocal()
+    try:
+        raw, stored = db.execute(select(func.sum(TaskLogPayload.size), func.sum(func.length(TaskLogPayload.data)))).one()
+    finally:
+        db.close()
+    results.update({
+        "payload_rows_per_sec": round(rows / elapsed, 1),
+        "payload_raw_bytes": raw,
+        "payload_stored_bytes": stored,
+    })
+    return results
+
+
+def bench_conditions(env, rows: int = 100000, **_) -> Dict[str, Any]:
+    """One compiled condition per row, and the same rows as a single batch"""
+    from app.services.conditions import compile_expression
+
+    condition = compile_expression(
+        'item.score > 0.5 and (item.country in ["US", "CA"] or contains(item.tags, "vip")) and payload.enabled'
+    )
+    rng = random.Random(17)
+    items = [
+        {"score": rng.random(), "country": rng.choice(["US", "CA", "DE"]), "tags": rng.choice([["vip"], []])}
+        for _ in range(rows)
+    ]
+    shared = {"payload": {"enabled": True}}
+    contexts = [{**shared, "item": item} for item in items]
+
+    best = {}
+    for name, run in (
+        ("scalar", lambda: [condition(context) for context in contexts]),
+        ("batch", lambda: condition.filter_items(items, shared)),
+    ):
+        for _ in range(3):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            best[name] = min(best.get(name, elapsed), elapsed)
+    return {
+        "rows": rows,
+        "scalar_rows_per_sec": round(rows / best["scalar"], 1),
+        "batch_rows_per_sec": round(rows / best["batch"], 1),
+    }
+
+
+def _seed_logs(rows: int, workflows: int = 1000, chunk: int = 50000):
+    from app.services.database import get_engine
+
+    statuses = ["success"] * 8 + ["failed", "running"]
+    now = datetime.utcnow()
+    rng = random.Random(17)
+    with get_engine().begin() as conn:
+        for start in range(0, rows, chunk):
+            batch = []
+            for i in range(start, min(rows, start + chunk)):
+                started_at = now - timedelta(seconds=rng.randrange(90 * 86400))
+                batch.append((f"seed-{i}", rng.randrange(1, workflows + 1), rng.choice(statuses), started_at, started_at + timedelta(seconds=2), 0))
+            conn.exec_driver_sql(
+                "INSERT INTO task_logs (run_id, workflow_id, status, started_at, completed_at, attempts) VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+
+
+def bench_log_queries(env, rows: int = 1_000_000, repeats: int = 50, pages: int = 20, **_) -> Dict[str, Any]:
+    """/api/logs first pages, filtered pages and deep cursor paging over `rows` TaskLogs"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.database import get_engine
+    from app.services.http_cache import list_cache
+
+    with get_engine().connect() as conn:
+        existing = conn.exec_driver_sql("SELECT COUNT(*) FROM task_logs").scalar()
+    started = time.perf_counter()
+    if existing < rows:
+        _seed_logs(rows - existing)
+    seed_s = time.perf_counter() - started
+
+    client = TestClient(app)
+    queries = {
+        "latest": "/api/logs/?limit=50",
+        "by_status": "/api/logs/?status=failed&limit=50",
+        "by_workflow": "/api/logs/?workflow_id=7&limit=50",
+    }
+    results = {"rows": max(rows, existing), "seed_seconds": round(seed_s, 1)}
+    for name, url in queries.items():
+        client.get(url)
+        samples = []
+        for _ in range(repeats):
+            # Measure the query, not the rendered-body cache (see bench_list_endpoints)
+            list_cache.clear()
+            begin = time.perf_counter()
+            response = client.get(url)
+            samples.append(time.perf_counter() - begin)
+            response.raise_for_status()
+        results.update(latency_summary(samples, prefix=f"{name}_"))
+
+    # Walking `pages` pages deep must cost the same per page as the first
+    samples = []
+    cursor = None
+    for _ in range(pages):
+        url = "/api/logs/?limit=100" + (f"&cursor={cursor}" if cursor else "")
+        list_cache.clear()
+        begin = time.perf_counter()
+        response = client.get(url)
+        samples.append(time.perf_counter() - begin)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    results.update(latency_summary(samples, prefix="paging_"))
+    return results
+
+
+def bench_list_endpoints(env, workflows: int = 1000, repeats: int = 200, **_) -> Dict[str, Any]:
+    """GET /api/workflows/ rendered from the database, from the body cache, and as a 304"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.http_cache import list_cache
+
+    env.add_workflows(workflows, [{"type": "email", "params": {"to": "bench@example.com"}}])
+    client = TestClient(app)
+    url = "/api/workflows/"
+    etag = client.get(url).headers["ETag"]
+
+    def measure(headers: Dict[str, str], clear: bool, expected: int):
+        samples = []
+        for _ in range(repeats):
+            if clear:
+                list_cache.clear()
+            begin = time.perf_counter()
+            response = client.get(url, headers=headers)
+            samples.append(time.perf_counter() - begin)
+            assert response.status_code == expected, response.status_code
+        return samples
+
+    results = {"workflows": workflows}
+    results.update(latency_summary(measure({}, True, 200), prefix="render_"))
+    results.update(latency_summary(measure({}, False, 200), prefix="cached_"))
+    results.update(latency_summary(measure({"If-None-Match": etag}, False, 304), prefix="not_modified_"))
+    return results
+
+
+SCENARIOS = {
+    "trigger": bench_trigger,
+    "executor": bench_executor,
+    "scheduler": bench_scheduler,
+    "log_writes": bench_log_writes,
+    "log_queries": bench_log_queries,
+    "conditions": bench_conditions,
+    "list_endpoints": bench_list_endpoints,
+}
+
+# Sizes per profile: `quick` is a sanity check, `full` is what baselines are recorded with
+PROFILES = {
+    "quick": {
+        "trigger": {"requests": 300},
+        "executor": {"runs": 300},
+        "scheduler": {"jobs": 1000},
+        "log_writes": {"rows": 5000},
+        "log_queries": {"rows": 50000, "repeats": 20},
+        "conditions": {"rows": 20000},
+        "list_endpoints": {"workflows": 200, "repeats": 50},
+    },
+    "full": {
+        "trigger": {"requests": 2000},
+        "executor": {"runs": 2000},
+        "scheduler": {"jobs": 10000},
+        "log_writes": {"rows": 50000},
+        "log_queries": {"rows": 1_000_000},
+        "conditions": {"rows": 100000},
+        "list_endpoints": {"workflows": 1000},
+    },
+}
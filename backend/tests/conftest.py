@@ -0,0 +1,87 @@
+"""
+Tests run against an in-process fakeredis server and a throwaway SQLite
+database. Like the benchmark environment, both are wired up before anything
+imports `app`: the config reads the database URL at import time and
+services capture the Redis client when they are first imported.
+"""
+import os
+import json
+import tempfile
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix="waltermelon-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORKDIR}/test.db"
+os.environ["LOG_ARCHIVE_DIR"] = os.path.join(WORKDIR, "archive")
+os.environ["PAYLOAD_SPILL_DIR"] = os.path.join(WORKDIR, "payloads")
+os.environ["METRICS_PORT"] = "0"
+
+import fakeredis  # noqa: E402
+from app.core import config  # noqa: E402
+
+config.redis_client = fakeredis.FakeRedis(decode_responses=True)
+
+from app.services.database import SessionLocal, migrate  # noqa: E402
+from app.services.log_writer import log_writer  # noqa: E402
+from app.services.workflow_service import invalidate_workflow_definition  # noqa: E402
+from app.models import TaskLog, TaskLogPayload, Workflow  # noqa: E402
+
+migrate()
+
+
+@pytest.fixture
+def redis_client():
+    config.redis_client.flushall()
+    yield config.redis_client
+    config.redis_client.flushall()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        # Whatever the shared writer still holds belongs to this test
+        log_writer.flush()
+        session.query(TaskLogPayload).delete()
+        session.query(TaskLog).delete()
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def make_workflow(db):
+    """Creates workflows from a step list (or {"steps": ..., options}); removed afterwards"""
+    created = []
+
+    def make(steps, name: str = "test", trigger_type: str = "webhook", trigger_config=None, enabled: bool = True):
+        workflow = Workflow(
+            name=name,
+            trigger_type=trigger_type,
+            trigger_config=json.dumps(trigger_config) if trigger_config is not None else None,
+            actions=json.dumps(steps),
+            enabled=enabled
+        )
+        db.add(workflow)
+        db.commit()
+        created.append(workflow.id)
+        return workflow
+
+    yield make
+    for workflow_id in created:
+        db.query(Workflow).filter_by(id=workflow_id).delete()
+        invalidate_workflow_definition(workflow_id)
+    db.commit()
+
+
+@pytest.fixture
+def api(db, redis_client):
+    """The FastAPI app without its lifespan: no listeners or background threads start"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.http_cache import list_cache
+
+    list_cache.clear()
+    return TestClient(app)
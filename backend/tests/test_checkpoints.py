@@ -0,0 +1,76 @@
+import time
+from types import SimpleNamespace
+
+from app.services import checkpoints
+from app.services.checkpoints import RunJournal, ACTIVE_KEY
+
+
+def _step(index: int, step_id: str = None):
+    return SimpleNamespace(id=step_id or f"step_{index}", index=index)
+
+
+def _recovered(journal: RunJournal, stale_after: float = 60):
+    runs = []
+    journal.recover(lambda workflow_id, payload, run_id: runs.append((workflow_id, payload, run_id)), stale_after)
+    return runs
+
+
+def test_worker_name_is_qualified_with_the_host(monkeypatch):
+    monkeypatch.setattr(checkpoints, "WORKER_NAME", "worker")
+    monkeypatch.setattr(checkpoints.socket, "gethostname", lambda: "3f2a9c1b")
+    assert checkpoints.worker_identity() == "worker@3f2a9c1b"
+
+
+def test_journaled_steps_fold_into_a_resume_cursor(redis_client):
+    journal = RunJournal(redis_client, owner="a")
+    cursor, held = journal.start("run-1", 7, {"x": 1})
+    assert (cursor, held) == (None, True)
+
+    journal.record("run-1", _step(0), {"ok": True})
+    journal.record_attempt("run-1", _step(1), 2)
+    journal.record("run-1", _step(1))
+
+    # A redelivery on another worker waits for the claim to lapse, then resumes
+    redelivered, held = RunJournal(redis_client, owner="b").start("run-1", 7, {"x": 1})
+    assert not held
+    assert redelivered["next_step"] == 2
+    assert redelivered["completed"] == {"step_0", "step_1"}
+    assert redelivered["outputs"] == {"step_0": {"ok": True}}
+    assert redelivered["attempts"] == {"step_1": 2}
+
+
+def test_finished_runs_drop_redeliveries(redis_client):
+    journal = RunJournal(redis_client, owner="a")
+    journal.start("run-1", 7, None)
+    journal.finish("run-1", "success")
+
+    cursor, held = RunJournal(redis_client, owner="b").start("run-1", 7, None)
+    assert cursor["done"] == "success"
+    assert redis_client.zscore(ACTIVE_KEY, "run-1") is None
+
+
+def test_replicas_never_recover_each_others_live_runs(redis_client):
+    first = RunJournal(redis_client, owner="worker@host-a")
+    second = RunJournal(redis_client, owner="worker@host-b")
+    first.start("run-1", 7, None)
+
+    assert _recovered(second) == []
+    assert redis_client.zscore(ACTIVE_KEY, "run-1") is not None
+
+
+def test_a_restarted_worker_recovers_its_previous_lifes_runs(redis_client):
+    RunJournal(redis_client, owner="worker@host-a").start("run-1", 7, {"x": 1})
+
+    assert _recovered(RunJournal(redis_client, owner="worker@host-a")) == [(7, {"x": 1}, "run-1")]
+
+
+def test_runs_without_a_claim_are_recovered_once_their_heartbeat_is_stale(redis_client):
+    journal = RunJournal(redis_client, owner="a")
+    journal.start("run-1", 7, None)
+    redis_client.delete("run_journal:run-1:claim")
+    redis_client.zadd(ACTIVE_KEY, {"run-1": time.time() - 120})
+
+    peer = RunJournal(redis_client, owner="b")
+    assert _recovered(peer) == [(7, {}, "run-1")]
+    # The active set entry is gone, so no second sweeper re-enqueues it
+    assert _recovered(peer) == []
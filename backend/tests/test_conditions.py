@@ -0,0 +1,123 @@
+import pytest
+
+from app.services.conditions import ConditionError, compile_expression
+from app.services.plan import compile_condition
+
+CONTEXT = {
+    "payload": {"amount": 150, "status": "paid", "tags": ["beta", "vip"], "customer": {"tier": "VIP"}, "lines": [{"sku": "a"}]},
+    "steps": {"lookup": {"ok": True}},
+}
+
+CASES = [
+    # precedence: not > and > or, parentheses override
+    ("true or false and false", True),
+    ("(true or false) and false", False),
+    ("not false and false", False),
+    ("not (false and false)", True),
+    ("not not true", True),
+    ("payload.amount > 100 and payload.status == 'paid'", True),
+    ("payload.amount > 200 or payload.status == 'paid' and payload.amount < 100", False),
+    # comparisons and literals
+    ("payload.amount >= 150", True),
+    ("payload.amount != 150.0", False),
+    ("payload.amount < -1", False),
+    ('payload.status == "paid"', True),
+    ("steps.lookup.ok == true", True),
+    ("payload.lines.0.sku == 'a'", True),
+    ("payload['customer']['tier'] == 'VIP'", True),
+    # in / not in
+    ("payload.status in ['paid', 'settled']", True),
+    ("payload.status not in ['paid', 'settled']", False),
+    ("'vip' in payload.tags", True),
+    ("'gold' not in payload.tags", True),
+    ("payload.amount in [1, 2, payload.amount]", True),
+    # missing fields read as null; comparisons with incompatible types are false
+    ("payload.missing == null", True),
+    ("payload.missing > 3", False),
+    ("payload.missing < 3", False),
+    ("payload.status > 3", False),
+    ("payload.customer.tier.deeper == 'x'", False),
+    ("'x' in payload.missing", False),
+    ("exists(payload.missing)", False),
+    ("exists(payload.customer.tier)", True),
+    ("not exists(payload.missing) or false", True),
+    # whitelisted functions
+    ("lower(payload.customer.tier) == 'vip'", True),
+    ("upper(payload.status) == 'PAID'", True),
+    ("len(payload.tags) == 2", True),
+    ("len(payload.missing) == 0", True),
+    ("contains(payload.tags, 'beta')", True),
+    ("contains(payload.missing, 'beta')", False),
+    ("startswith(payload.status, 'pa') and endswith(payload.status, 'id')", True),
+    ("startswith(payload.amount, '1')", False),
+]
+
+
+@pytest.mark.parametrize("source, expected", CASES)
+def test_scalar_evaluation(source, expected):
+    assert compile_expression(source)(CONTEXT) is expected
+
+
+@pytest.mark.parametrize("source, expected", CASES)
+def test_batch_evaluation_matches_scalar(source, expected):
+    condition = compile_expression(source)
+    other = {"payload": {"amount": 5, "status": "open", "tags": [], "lines": []}, "steps": {}}
+    contexts = [CONTEXT, other, {}, CONTEXT]
+    assert condition.evaluate_batch(contexts) == [condition(context) for context in contexts]
+
+
+@pytest.mark.parametrize("source", [
+    "item.score > 0.5 and payload.status == 'paid'",
+    "contains(item.tags, 'beta') or item.name in ['a', 'b']",
+    "not exists(item.score) or item.score < payload.amount",
+    "lower(item.name) == 'c' and len(item.tags) > 0",
+    "item.name in [payload.status, 'a']",
+    "payload.amount > 100",
+])
+def test_filter_items_matches_scalar(source):
+    condition = compile_expression(source)
+    items = [
+        {"score": 0.9, "tags": ["beta"], "name": "a"},
+        {"score": 0.1, "tags": [], "name": "C"},
+        {"name": "paid"},
+        {"score": "high", "tags": None, "name": ["unhashable"]},
+        None,
+    ]
+    expected = [condition({**CONTEXT, "item": item}) for item in items]
+    assert condition.filter_items(items, CONTEXT) == expected
+
+
+@pytest.mark.parametrize("source, message", [
+    ("", "empty"),
+    ("payload.amount >", "unexpected"),
+    ("(payload.amount > 1", r"expected \)"),
+    ("payload.amount > 1 payload", "unexpected"),
+    ("payload.amount ; 1", "unexpected character"),
+    ("secrets.token == 1", "unknown name"),
+    ("__import__('os')", "unknown function"),
+    ("eval('1')", "unknown function"),
+    ("len(payload.tags, 1) == 2", "takes 1 argument"),
+    ("exists('payload')", "one field path"),
+    ("payload.[0]", "field name"),
+    ("payload[true] == 1", "key or index"),
+])
+def test_parse_errors(source, message):
+    with pytest.raises(ConditionError, match=message):
+        compile_expression(source)
+
+
+def test_identical_sources_share_one_compiled_condition():
+    assert compile_expression("payload.amount > 1") is compile_expression("payload.amount > 1")
+
+
+@pytest.mark.parametrize("operator, value", [("eq", None), ("ne", "paid"), ("lt", 10), ("in", [None])])
+def test_structured_conditions_are_false_when_the_field_is_missing(operator, value):
+    condition = compile_condition({"field": "payload.missing", "operator": operator, "value": value})
+    assert condition(CONTEXT) is False
+    assert condition.evaluate_batch([CONTEXT, {}]) == [False, False]
+
+
+def test_structured_conditions_compare_present_fields():
+    assert compile_condition({"field": "payload.status", "operator": "ne", "value": "open"})(CONTEXT)
+    assert compile_condition({"field": "payload.tags", "operator": "contains", "value": "vip"})(CONTEXT)
+    assert compile_condition({"field": "payload.customer", "operator": "exists"})(CONTEXT)
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from app.services.executor import run_workflow_logic
+from app.services.plan import PlanCompileError, compile_plan
+
+
+class Handlers:
+    log = []
+    lock = threading.Lock()
+
+    @staticmethod
+    def delay(params):
+        return params.get("seconds", 5)
+
+    @classmethod
+    def act(cls, params):
+        if params.get("sleep"):
+            time.sleep(params["sleep"])
+        with cls.lock:
+            cls.log.append(params["name"])
+        if params.get("fail"):
+            raise ValueError(f"{params['name']} failed")
+        return {"name": params["name"]}
+
+
+def _step(step_id, needs=(), **params):
+    return {"id": step_id, "type": "act", "needs": list(needs), "params": {"name": step_id, **params}}
+
+
+def _run(steps, **options):
+    Handlers.log = []
+    return run_workflow_logic(compile_plan(steps, Handlers, options=options), {"payload": {"go": False}})
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([_step("a", ["b"]), _step("b", ["a"])], "cycle"),
+    ([_step("a", ["a"])], "cycle"),
+    ([_step("a"), _step("b", ["c"])], "unknown steps: c"),
+    ([_step("a"), _step("a", ["a"])], "unique"),
+    ([_step("a"), {"id": "wait", "type": "delay", "needs": ["a"], "params": {"seconds": 1}}], "delay steps"),
+])
+def test_invalid_graphs_fail_at_compile_time(steps, message):
+    with pytest.raises(PlanCompileError, match=message):
+        compile_plan(steps, Handlers)
+
+
+def test_invalid_dag_options_fail_at_compile_time():
+    with pytest.raises(PlanCompileError, match="on_failure"):
+        compile_plan([_step("a"), _step("b", ["a"])], Handlers, options={"on_failure": "ignore"})
+    with pytest.raises(PlanCompileError, match="max_parallel"):
+        compile_plan([_step("a"), _step("b", ["a"])], Handlers, options={"max_parallel": 0})
+
+
+def test_steps_run_after_their_needs_and_independent_ones_overlap():
+    steps = [_step("a", sleep=0.2), _step("b", sleep=0.2), _step("c", ["a", "b"])]
+    started = time.monotonic()
+    result = _run(steps, max_parallel=2)
+
+    assert result["status"] == "success"
+    assert time.monotonic() - started < 0.35
+    assert sorted(Handlers.log[:2]) == ["a", "b"] and Handlers.log[2] == "c"
+
+
+def test_cancel_stops_branches_that_have_not_started():
+    result = _run([_step("a", fail=True), _step("b"), _step("c", ["b"])], max_parallel=1)
+
+    assert result["status"] == "failed"
+    assert Handlers.log == ["a"]
+    assert result["skipped"] == ["b", "c"]
+
+
+def test_continue_lets_other_branches_finish():
+    result = _run([_step("a", fail=True), _step("b"), _step("c", ["a"])], max_parallel=1, on_failure="continue")
+
+    assert result["status"] == "failed"
+    assert Handlers.log == ["a", "b"]
+    assert result["skipped"] == ["c"]
+
+
+def test_an_unmet_condition_skips_only_its_branch():
+    steps = [
+        {"id": "gate", "type": "condition", "params": {"expression": "payload.go"}},
+        _step("gated", ["gate"]),
+        _step("free"),
+    ]
+    result = _run(steps)
+
+    assert result["status"] == "success"
+    assert Handlers.log == ["free"]
+    assert result["skipped"] == ["gated"]
+
+
+def test_journaled_steps_are_not_run_again():
+    Handlers.log = []
+    plan = compile_plan([_step("a"), _step("b", ["a"])], Handlers)
+    result = run_workflow_logic(plan, {"payload": {}}, completed={"a"})
+
+    assert result["status"] == "success"
+    assert Handlers.log == ["b"]
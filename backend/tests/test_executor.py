@@ -0,0 +1,104 @@
+import time
+
+from app.core.config import RETRY_MAX_ATTEMPTS
+from app.services import executor
+from app.services.checkpoints import JOURNAL_KEY, RunJournal
+from app.services.executor import ActionHandlers, IntegrationUnavailable, execute_workflow, run_workflow_logic
+from app.services.health import health_prober
+from app.services.plan import compile_plan
+from app.services.retry import is_retryable
+from app.services.timers import TIMERS_KEY
+
+
+class Handlers:
+    """Actions that count their calls and fail on demand"""
+
+    calls = {}
+    failures = {}
+
+    @classmethod
+    def reset(cls, **failures):
+        cls.calls = {}
+        cls.failures = dict(failures)
+
+    @classmethod
+    def act(cls, params):
+        name = params["name"]
+        cls.calls[name] = cls.calls.get(name, 0) + 1
+        error = cls.failures.get(name)
+        if error is not None:
+            if params.get("once"):
+                del cls.failures[name]
+            raise error
+        return {"name": name}
+
+
+def _step(step_id, needs=(), **params):
+    return {"id": step_id, "type": "act", "needs": list(needs), "params": {"name": step_id, **params}}
+
+
+DAG = [_step("a"), _step("b", once=True), _step("c", needs=["b"]), _step("d", needs=["a"])]
+
+
+def test_steps_against_a_down_integration_fail_instead_of_retrying(redis_client, monkeypatch):
+    monkeypatch.setattr(health_prober, "is_down", lambda integration_id: True)
+
+    result = run_workflow_logic([{"type": "whatsapp", "integration_id": 3, "params": {"phone": "1"}}])
+
+    assert not is_retryable(IntegrationUnavailable("integration 3 is down"))
+    assert result["status"] == "failed"
+    assert "integration 3 is down" in result["error"]
+
+
+def test_a_flaky_dag_step_parks_the_run_instead_of_sleeping(redis_client):
+    Handlers.reset(b=RuntimeError("timeout"))
+    plan = compile_plan(DAG, Handlers)
+
+    started = time.monotonic()
+    result = run_workflow_logic(plan, {"payload": {}})
+
+    assert time.monotonic() - started < 0.5
+    assert result["status"] == "retrying"
+    assert result["attempts"] == {"b": 1}
+    assert result["resume_at"] >= time.time() - 1
+    # Independent branches finished; only b's dependents wait
+    assert Handlers.calls == {"a": 1, "b": 1, "d": 1}
+
+    resumed = run_workflow_logic(plan, {"payload": {}}, completed={"a", "d"}, attempts=result["attempts"])
+    assert resumed["status"] == "success"
+    assert Handlers.calls == {"a": 1, "b": 2, "c": 1, "d": 1}
+
+
+def test_a_dag_step_fails_once_its_attempts_are_spent(redis_client):
+    Handlers.reset(b=RuntimeError("timeout"))
+    plan = compile_plan(DAG, Handlers)
+
+    result = run_workflow_logic(plan, {"payload": {}}, completed={"a", "d"}, attempts={"b": RETRY_MAX_ATTEMPTS - 1})
+
+    assert result["status"] == "failed"
+    assert result["skipped"] == ["c"]
+
+
+def test_a_non_retryable_dag_failure_fails_the_run(redis_client):
+    Handlers.reset(a=ValueError("bad params"), b=RuntimeError("timeout"))
+    result = run_workflow_logic(compile_plan(DAG, Handlers), {"payload": {}})
+
+    assert result["status"] == "failed"
+    assert "bad params" in result["error"]
+
+
+def test_parked_dag_runs_resume_from_the_journal(db, redis_client, make_workflow, monkeypatch):
+    monkeypatch.setattr(ActionHandlers, "act", Handlers.act, raising=False)
+    monkeypatch.setattr(executor, "retry_delay", lambda attempt: 0)
+    Handlers.reset(b=RuntimeError("timeout"))
+    workflow = make_workflow({"steps": DAG})
+
+    assert execute_workflow(workflow.id, {"x": 1}, task_id="run-dag") == "retrying"
+    assert redis_client.zcard(TIMERS_KEY) == 1
+    journal = RunJournal.fold(redis_client.lrange(JOURNAL_KEY.format(run_id="run-dag"), 0, -1))
+    assert journal["completed"] == {"a", "d"}
+    assert journal["attempts"] == {"b": 1}
+
+    # What the timer's resume task runs
+    assert execute_workflow(workflow.id, {"x": 1}, run_id="run-dag", attempt=1, retries=1) == "success"
+    assert Handlers.calls == {"a": 1, "b": 2, "c": 1, "d": 1}
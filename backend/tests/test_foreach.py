@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from app.services import foreach
+from app.services.executor import run_foreach
+from app.services.foreach import ForeachFailed, foreach_progress
+from app.services.plan import compile_plan
+from app.services.retry import is_retryable
+
+
+class Handlers:
+    """Records every item sent; fails for the names in `failing`"""
+
+    sent = []
+    failing = set()
+    lock = threading.Lock()
+
+    @classmethod
+    def reset(cls, *failing):
+        cls.sent = []
+        cls.failing = set(failing)
+
+    @classmethod
+    def send(cls, params):
+        with cls.lock:
+            cls.sent.append(params["name"])
+        if params["name"] in cls.failing:
+            raise RuntimeError(f"rejected {params['name']}")
+
+
+def _foreach(**params):
+    step = {
+        "id": "fan",
+        "type": "foreach",
+        "params": {"step": {"type": "send"}, "item_params": {"name": "name"}, "chunk_size": 3, "concurrency": 2, **params}
+    }
+    return compile_plan([step], Handlers).steps[0]
+
+
+def _context(count: int, run_id: str = "run-1"):
+    return {"run_id": run_id, "payload": {"items": [{"name": f"i{n}", "n": n} for n in range(count)]}}
+
+
+def test_a_resumed_step_skips_finished_chunks_and_keeps_their_counts(redis_client):
+    Handlers.reset()
+    step = _foreach(items="payload.items")
+    # A previous attempt finished two chunks before the worker died
+    foreach_progress.save("run-1", "fan", {"page_cursor": None, "page_offset": 6, "succeeded": 5, "failed": 1})
+
+    counts = run_foreach(step, _context(10))
+
+    assert sorted(Handlers.sent) == ["i6", "i7", "i8", "i9"]
+    assert counts == {"succeeded": 9, "failed": 1}
+    assert foreach_progress.load("run-1", "fan")["done"]
+
+
+def test_a_finished_step_is_not_sent_again(redis_client):
+    Handlers.reset()
+    step = _foreach(items="payload.items")
+    first = run_foreach(step, _context(7))
+    Handlers.reset()
+
+    assert run_foreach(step, _context(7)) == first == {"succeeded": 7, "failed": 0}
+    assert Handlers.sent == []
+
+
+def test_too_many_failures_stop_after_the_chunk_and_checkpoint_it(redis_client):
+    Handlers.reset("i4")
+    step = _foreach(items="payload.items", max_failures=0)
+
+    with pytest.raises(ForeachFailed, match="rejected i4") as failure:
+        run_foreach(step, _context(10))
+
+    assert not is_retryable(failure.value)
+    assert sorted(Handlers.sent) == [f"i{n}" for n in range(6)]
+    progress = foreach_progress.load("run-1", "fan")
+    assert (progress["page_offset"], progress["succeeded"], progress["failed"], progress["done"]) == (6, 5, 1, False)
+
+
+def test_filtered_items_are_counted_and_resume_with_the_checkpoint(redis_client):
+    Handlers.reset()
+    step = _foreach(items="payload.items", where="item.n >= 5")
+    foreach_progress.save("run-1", "fan", {"page_cursor": None, "page_offset": 3, "succeeded": 0, "failed": 0, "filtered": 3})
+
+    counts = run_foreach(step, _context(8))
+
+    assert sorted(Handlers.sent) == ["i5", "i6", "i7"]
+    assert counts == {"succeeded": 3, "failed": 0, "filtered": 5}
+
+
+def test_a_paged_source_resumes_from_the_saved_cursor(redis_client, monkeypatch):
+    pages = {None: ("p2", ["a", "b"]), "p2": ("p3", ["c", "d"]), "p3": (None, ["e"])}
+    requested = []
+
+    def fetch_pages(source, cursor):
+        while True:
+            requested.append(cursor)
+            next_cursor, items = pages[cursor]
+            yield cursor, [{"name": name} for name in items]
+            if next_cursor is None:
+                return
+            cursor = next_cursor
+    monkeypatch.setattr(foreach, "fetch_pages", fetch_pages)
+    Handlers.reset()
+    step = _foreach(source={"integration_id": 1, "path": "/contacts"}, chunk_size=2)
+    foreach_progress.save("run-1", "fan", {"page_cursor": "p2", "page_offset": 1, "succeeded": 3, "failed": 0})
+
+    counts = run_foreach(step, {"run_id": "run-1"})
+
+    assert requested == ["p2", "p3"]
+    assert sorted(Handlers.sent) == ["d", "e"]
+    assert counts == {"succeeded": 5, "failed": 0}
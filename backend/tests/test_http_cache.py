@@ -0,0 +1,62 @@
+from app.services.changes import change_feed
+from app.services.http_cache import list_cache
+from app.services.log_writer import log_writer
+
+
+def test_an_unchanged_list_revalidates_with_a_304(api, redis_client, make_workflow):
+    make_workflow([], name="first")
+    listed = api.get("/api/workflows/")
+    etag = listed.headers["ETag"]
+
+    response = api.get("/api/workflows/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert listed.headers["Cache-Control"] == "no-cache"
+
+
+def test_an_edit_changes_the_etag_and_the_body(api, redis_client, make_workflow):
+    workflow = make_workflow([], name="first")
+    etag = api.get("/api/workflows/").headers["ETag"]
+
+    assert api.patch(f"/api/workflows/{workflow.id}", json={"name": "renamed"}).status_code == 200
+    response = api.get("/api/workflows/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [row["name"] for row in response.json()] == ["renamed"]
+
+
+def test_repeat_reads_are_served_from_the_list_cache(api, redis_client, make_workflow):
+    make_workflow([], name="first")
+    first = api.get("/api/workflows/")
+    hits = list_cache.stats["hits"]
+
+    second = api.get("/api/workflows/")
+
+    assert list_cache.stats["hits"] == hits + 1
+    assert second.content == first.content
+
+
+def test_each_query_string_has_its_own_etag(api, redis_client):
+    assert api.get("/api/logs/?limit=5").headers["ETag"] != api.get("/api/logs/?limit=6").headers["ETag"]
+
+
+def test_flushed_logs_change_the_logs_etag(api, redis_client):
+    etag = api.get("/api/logs/").headers["ETag"]
+    log_writer.create(1, "queued")
+    log_writer.flush()
+
+    assert api.get("/api/logs/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_lists_are_served_without_an_etag_when_versions_are_unknown(api, redis_client, make_workflow, monkeypatch):
+    make_workflow([], name="first")
+    monkeypatch.setattr(change_feed, "versions", lambda tables: None)
+
+    response = api.get("/api/workflows/", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert [row["name"] for row in response.json()] == ["first"]
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A fresh interpreter, since this test process has already built its clients
+SCRIPT = """
+from app.core import config
+
+def refuse():
+    raise AssertionError("a Redis client was built at import time")
+
+config.redis_client._factory = refuse
+
+import app.main
+import app.services.worker
+import app.services.scheduler
+import app.services.timers
+from app.services import database
+
+assert config.redis_client._client is None
+assert not database._engines, "a database engine was built at import time"
+"""
+
+
+def test_importing_the_app_opens_no_connections(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/imports.db", "PYTHONPATH": BACKEND}
+    completed = subprocess.run([sys.executable, "-c", SCRIPT], cwd=BACKEND, env=env, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
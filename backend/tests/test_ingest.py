@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from app.models import TaskLog
+from app.services import webhooks
+from app.services.log_writer import log_writer
+from app.services.queue import QUEUE_KEY
+from app.services.subscriptions import SubscriptionIndex
+from app.services.webhooks import ingest_trigger, idempotency_key
+
+STEPS = [{"type": "email", "params": {"to": "a@example.com"}}]
+
+
+def test_a_trigger_is_recorded_queued_and_acked(api, db, redis_client, make_workflow):
+    workflow = make_workflow(STEPS)
+
+    response = api.post(f"/api/workflows/{workflow.id}/trigger", json={"order": 1})
+
+    assert response.status_code == 202
+    run_id = response.json()["run_id"]
+    task = json.loads(redis_client.lindex(QUEUE_KEY, 0))
+    assert (task["workflow_id"], task["run_id"], task["payload"]) == (workflow.id, run_id, {"order": 1})
+    log_writer.flush()
+    assert db.query(TaskLog.status).filter_by(run_id=run_id).scalar() == "queued"
+
+
+def test_a_repeated_idempotency_key_returns_the_original_run(api, db, redis_client, make_workflow):
+    workflow = make_workflow(STEPS)
+    headers = {"Idempotency-Key": "delivery-1"}
+
+    first = api.post(f"/api/workflows/{workflow.id}/trigger", json={}, headers=headers).json()
+    second = api.post(f"/api/workflows/{workflow.id}/trigger", json={}, headers=headers).json()
+
+    assert second["run_id"] == first["run_id"]
+    assert (first["duplicate"], second["duplicate"]) == (False, True)
+    assert redis_client.llen(QUEUE_KEY) == 1
+
+
+def test_a_full_queue_is_a_429_with_retry_after(api, db, redis_client, make_workflow, monkeypatch):
+    monkeypatch.setattr(webhooks, "INGEST_MAX_QUEUE_DEPTH", 1)
+    workflow = make_workflow(STEPS)
+    assert api.post(f"/api/workflows/{workflow.id}/trigger", json={}).status_code == 202
+
+    response = api.post(f"/api/workflows/{workflow.id}/trigger", json={}, headers={"Idempotency-Key": "k"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
+    # The rejected delivery can be retried under the same key
+    assert redis_client.get(idempotency_key(workflow.id, "k")) is None
+
+
+def test_missing_and_disabled_workflows_are_rejected(api, db, redis_client, make_workflow):
+    disabled = make_workflow(STEPS, enabled=False)
+
+    assert api.post("/api/workflows/999999/trigger", json={}).status_code == 404
+    assert api.post(f"/api/workflows/{disabled.id}/trigger", json={}).status_code == 409
+    assert redis_client.llen(QUEUE_KEY) == 0
+
+
+def test_a_failed_enqueue_releases_the_key_and_fails_the_log(db, redis_client, make_workflow, monkeypatch):
+    workflow = make_workflow(STEPS)
+
+    def broken(*args, **kwargs):
+        raise ConnectionError("redis went away")
+    monkeypatch.setattr(webhooks, "enqueue_task", broken)
+
+    with pytest.raises(ConnectionError):
+        ingest_trigger(workflow.id, {}, key="k")
+
+    assert redis_client.get(idempotency_key(workflow.id, "k")) is None
+    log_writer.flush()
+    assert db.query(TaskLog.status, TaskLog.error_message).one() == ("failed", "enqueue failed: redis went away")
+
+
+def test_a_repeated_event_key_returns_the_original_fan_out(api, db, redis_client, make_workflow, monkeypatch):
+    index = SubscriptionIndex(redis_client)
+    monkeypatch.setattr(webhooks, "subscription_index", index)
+    for _ in range(2):
+        index.put(make_workflow(STEPS, trigger_type="event", trigger_config={"event": "order.created"}))
+    headers = {"Idempotency-Key": "evt-1"}
+
+    first = api.post("/api/events/", json={"type": "order.created", "payload": {}}, headers=headers).json()
+    second = api.post("/api/events/", json={"type": "order.created", "payload": {}}, headers=headers).json()
+
+    assert first["matched"] == 2 and not first["duplicate"]
+    assert second["runs"] == first["runs"] and second["duplicate"]
+    assert redis_client.llen(QUEUE_KEY) == 2
+
+
+def test_a_full_queue_rejects_events_with_a_429(api, db, redis_client, make_workflow, monkeypatch):
+    index = SubscriptionIndex(redis_client)
+    monkeypatch.setattr(webhooks, "subscription_index", index)
+    monkeypatch.setattr(webhooks, "INGEST_MAX_QUEUE_DEPTH", 0)
+    index.put(make_workflow(STEPS, trigger_type="event", trigger_config={"event": "order.created"}))
+
+    response = api.post("/api/events/", json={"type": "order.created", "payload": {}})
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
@@ -0,0 +1,72 @@
+import json
+from datetime import datetime, timedelta
+
+from app.models import TaskLog
+from app.services.log_writer import LogWriter
+
+
+def _seed(db, count: int = 7):
+    """Logs for workflows 1 and 2, two of them sharing a started_at"""
+    base = datetime(2024, 1, 1)
+    for index in range(count):
+        started_at = base + timedelta(minutes=min(index, count - 2))
+        db.add(TaskLog(run_id=f"run-{index}", workflow_id=1 + index % 2, status="success" if index % 3 else "failed", started_at=started_at))
+    db.commit()
+    return [log.id for log in db.query(TaskLog).order_by(TaskLog.started_at.desc(), TaskLog.id.desc())]
+
+
+def _pages(api, params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = api.get("/api/logs/", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        ids += [log["id"] for log in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids, pages
+
+
+def test_cursor_pages_walk_every_log_once_newest_first(api, db):
+    expected = _seed(db)
+
+    ids, pages = _pages(api, {"limit": 2})
+
+    assert ids == expected
+    assert pages == 4
+
+
+def test_filters_narrow_the_pages(api, db):
+    _seed(db)
+    expected = [log.id for log in db.query(TaskLog).filter_by(workflow_id=2, status="success").order_by(TaskLog.started_at.desc(), TaskLog.id.desc())]
+
+    ids, _ = _pages(api, {"limit": 1, "workflow_id": 2, "status": "success"})
+    assert ids == expected
+
+    since = api.get("/api/logs/", params={"since": "2024-01-01T00:04:00"}).json()
+    assert {log["run_id"] for log in since} == {"run-4", "run-5", "run-6"}
+
+
+def test_list_rows_are_summaries(api, db):
+    _seed(db, 1)
+    assert set(api.get("/api/logs/").json()[0]) == {"id", "run_id", "workflow_id", "status", "started_at", "completed_at", "attempts"}
+
+
+def test_an_invalid_cursor_is_a_400(api, db):
+    assert api.get("/api/logs/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_export_streams_every_log_with_its_execution_data(api, db, monkeypatch):
+    from app.routers import log as log_router
+    monkeypatch.setattr(log_router, "EXPORT_CHUNK_SIZE", 2)
+    writer = LogWriter()
+    writer.start = lambda: None
+    run_ids = [writer.create(1, "success", execution_data=json.dumps({"n": index})) for index in range(5)]
+    writer.flush()
+
+    response = api.get("/api/logs/export")
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["run_id"] for row in rows) == sorted(run_ids)
+    assert {row["execution_data"] for row in rows} == {json.dumps({"n": index}) for index in range(5)}
@@ -0,0 +1,107 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.models import TaskLog, TaskLogPayload
+from app.services.changes import VERSION_KEY
+from app.services.database import SessionLocal
+from app.services.log_writer import LogBufferFull, LogWriter
+
+
+def _writer() -> LogWriter:
+    # No background thread: the test decides when each process flushes
+    writer = LogWriter()
+    writer.start = lambda: None
+    return writer
+
+
+def test_worker_updates_committed_before_the_api_insert_are_kept(db, redis_client):
+    api, worker = _writer(), _writer()
+    queued_at = datetime.utcnow() - timedelta(seconds=5)
+    run_id = api.create(7, "queued", started_at=queued_at)
+    worker.update(run_id, status="running")
+    worker.update(run_id, status="success", completed_at=datetime.utcnow(), execution_data='{"payload": {"a": 1}}')
+
+    # The worker's batch commits first, then the API's
+    worker.flush()
+    api.flush()
+
+    row = db.query(TaskLog).filter_by(run_id=run_id).one()
+    assert (row.status, row.workflow_id, row.started_at) == ("success", 7, queued_at)
+    assert row.completed_at is not None
+    assert db.get(TaskLogPayload, run_id) is not None
+
+
+def test_api_insert_committed_first_is_updated_in_place(db, redis_client):
+    api, worker = _writer(), _writer()
+    run_id = api.create(7, "queued")
+    api.flush()
+    worker.update(run_id, status="failed", error_message="boom")
+    worker.flush()
+
+    row = db.query(TaskLog).filter_by(run_id=run_id).one()
+    assert (row.status, row.workflow_id, row.error_message) == ("failed", 7, "boom")
+    assert db.query(TaskLog).count() == 1
+
+
+def _locked(failures: list):
+    """A session factory whose first `len(failures)` commits fail with 'database is locked'"""
+    def factory():
+        session = SessionLocal()
+        if failures:
+            failures.pop()
+
+            def commit():
+                raise OperationalError("COMMIT", {}, sqlite3.OperationalError("database is locked"))
+            session.commit = commit
+        return session
+    return factory
+
+
+def test_transient_errors_are_retried(db, redis_client):
+    writer = _writer()
+    writer.session_factory = _locked([1, 1])
+    writer.retry_backoff = 0
+    run_ids = [writer.create(1, "queued") for _ in range(3)]
+    writer.flush()
+
+    assert sorted(run_id for (run_id,) in db.query(TaskLog.run_id)) == sorted(run_ids)
+
+
+def test_a_bad_change_only_drops_itself(db, redis_client):
+    writer = _writer()
+    writer.retry_backoff = 0
+    good = writer.create(1, "queued")
+    bad = writer.create(1, "queued")
+    # status is NOT NULL: this update can never be written
+    writer.update(bad, status=None)
+    writer.update(good, status="success")
+    writer.flush()
+
+    rows = dict(db.query(TaskLog.run_id, TaskLog.status))
+    assert rows == {good: "success", bad: "queued"}
+
+
+def test_a_batch_folds_updates_into_its_inserts_and_bumps_the_version_once(db, redis_client):
+    writer = _writer()
+    run_ids = [writer.create(1, "queued") for _ in range(3)]
+    for run_id in run_ids:
+        writer.update(run_id, status="running")
+        writer.update(run_id, status="success", execution_data=f'{{"run": "{run_id}"}}')
+    writer.flush()
+
+    assert dict(db.query(TaskLog.run_id, TaskLog.status)) == dict.fromkeys(run_ids, "success")
+    assert db.query(TaskLogPayload).count() == 3
+    assert redis_client.get(VERSION_KEY.format(table="task_logs")) == "1"
+
+
+def test_producers_get_log_buffer_full_when_the_buffer_stays_full(db, redis_client):
+    writer = LogWriter(buffer_size=1, put_timeout=0.05)
+    writer.start = lambda: None
+    writer.create(1, "queued")
+
+    with pytest.raises(LogBufferFull):
+        writer.create(1, "queued")
+    writer.flush()
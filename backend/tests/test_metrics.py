@@ -0,0 +1,14 @@
+import socket
+
+from app.services.metrics import serve_metrics
+
+
+def test_a_taken_port_disables_metrics_instead_of_crashing():
+    with socket.socket() as taken:
+        taken.bind(("", 0))
+        taken.listen()
+        assert serve_metrics(taken.getsockname()[1]) is False
+
+
+def test_port_zero_disables_metrics():
+    assert serve_metrics(0) is False
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from app.services.outbound import OutboundBatcher
+from app.services.ratelimit import RateLimiter
+
+
+class StubLimiter:
+    def __init__(self, limit=None, wait: float = 0.0):
+        self.limit = limit
+        self.wait = wait
+        self.costs = []
+
+    def limits(self, integration_id):
+        return self.limit
+
+    def acquire(self, integration_id, cost=1):
+        self.costs.append(cost)
+        time.sleep(self.wait)
+
+
+class StubRegistry:
+    def __init__(self, rate_limit=None):
+        self.rate_limit = rate_limit
+        self.sent = []
+        self.batches = []
+
+    def settings(self, integration_id):
+        return {"service_name": "webhook", "config": {"rate_limit": self.rate_limit}}
+
+    def get(self, integration_id):
+        registry = self
+
+        class Client:
+            def send_messages(self, messages):
+                registry.batches.append(len(messages))
+                registry.sent.extend(messages)
+                return [None] * len(messages)
+
+        return Client()
+
+
+def test_fractional_burst_sends_one_message_per_token(redis_client):
+    registry = StubRegistry({"rate": 20, "burst": 0.5})
+    batcher = OutboundBatcher(limiter=RateLimiter(redis_client, registry=registry), registry=registry, linger=0.01)
+    started = time.monotonic()
+    futures = [batcher.submit(1, {"n": index}) for index in range(3)]
+
+    assert [future.result(timeout=2) for future in futures] == [None, None, None]
+    assert registry.sent == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert registry.batches == [1, 1, 1]
+    # One full token per message at 20/s: the second and third wait 50ms each
+    assert time.monotonic() - started >= 0.09
+    batcher.stop()
+
+
+def test_send_times_out_and_drops_the_unsent_message():
+    registry = StubRegistry()
+    batcher = OutboundBatcher(limiter=StubLimiter({"rate": 1, "burst": 1}, wait=0.3), registry=registry, linger=0.01)
+
+    with pytest.raises(TimeoutError):
+        batcher.send(1, {"n": 1}, timeout=0.05)
+    time.sleep(0.5)
+    assert registry.sent == []
+    batcher.stop()
@@ -0,0 +1,74 @@
+import json
+import os
+import random
+import zlib
+
+from app.core.config import PAYLOAD_SPILL_DIR
+from app.models import TaskLog, TaskLogPayload
+from app.services import payloads
+from app.services.payloads import decode_payload, encode_payload, move_legacy_payloads
+
+
+def _random_text(size: int) -> str:
+    rng = random.Random(7)
+    return json.dumps({"values": [rng.random() for _ in range(size)]})
+
+
+def test_small_payloads_are_stored_raw():
+    row = encode_payload("run-small", '{"a": 1}')
+    assert (row["codec"], row["data"], row["path"]) == ("raw", b'{"a": 1}', None)
+    assert decode_payload(row["codec"], row["data"], row["path"]) == '{"a": 1}'
+
+
+def test_compressed_round_trip_beats_plain_zlib():
+    text = json.dumps({
+        "payload": {"order": 1},
+        "timings": {"run_ms": 3.2, "steps": [
+            {"step": str(step), "type": "email", "ms": 1.1, "ok": True} for step in range(3)
+        ]}
+    })
+    row = encode_payload("run-compressed", text)
+    assert row["codec"] == payloads.CODEC and row["path"] is None
+    # The shared dictionary is what makes small payloads worth compressing
+    assert len(row["data"]) < len(zlib.compress(text.encode())) < len(text)
+    assert decode_payload(row["codec"], row["data"], row["path"]) == text
+
+
+def test_large_payloads_spill_to_files(monkeypatch):
+    monkeypatch.setattr(payloads, "PAYLOAD_INLINE_MAX", 1024)
+    text = _random_text(2000)
+    row = encode_payload("spilled-run", text)
+
+    assert row["data"] is None
+    assert os.path.exists(os.path.join(PAYLOAD_SPILL_DIR, row["path"]))
+    assert decode_payload(row["codec"], row["data"], row["path"]) == text
+
+
+def test_oversized_payloads_are_replaced_by_a_note(monkeypatch):
+    monkeypatch.setattr(payloads, "PAYLOAD_MAX_BYTES", 100)
+    row = encode_payload("huge-run", "x" * 500)
+    note = json.loads(decode_payload(row["codec"], row["data"], row["path"]))
+    assert note == {"truncated": True, "size": 500, "limit": 100}
+
+
+def test_move_legacy_payloads_keeps_rows_without_a_run_id(db):
+    legacy = [TaskLog(workflow_id=1, status="success", execution_data=json.dumps({"n": index})) for index in range(3)]
+    modern = TaskLog(run_id="run-modern", workflow_id=1, status="success", execution_data='{"n": "modern"}')
+    untouched = TaskLog(run_id="run-empty", workflow_id=1, status="success")
+    db.add_all(legacy + [modern, untouched])
+    db.commit()
+
+    assert move_legacy_payloads(batch=2) == 4
+    db.expire_all()
+
+    for index, log in enumerate(legacy):
+        assert log.run_id == f"legacy-{log.id}"
+        assert log.execution_data is None
+        stored = db.get(TaskLogPayload, log.run_id)
+        assert json.loads(decode_payload(stored.codec, stored.data, stored.path)) == {"n": index}
+    stored = db.get(TaskLogPayload, "run-modern")
+    assert decode_payload(stored.codec, stored.data, stored.path) == '{"n": "modern"}'
+    assert db.get(TaskLogPayload, "run-empty") is None
+
+    # Re-running the migration step is a no-op
+    assert move_legacy_payloads() == 0
@@ -0,0 +1,48 @@
+import pytest
+
+from app.services.executor import ActionHandlers
+from app.services.plan import PlanCache, PlanCompileError, compile_plan, plan_cache
+from app.services.workflow_service import definition_cache
+
+STEPS = [{"type": "email", "params": {"to": "a@example.com"}}, {"type": "condition", "params": {"expression": "payload.ok"}}]
+
+
+def _definition(version: str, steps=STEPS):
+    return {"id": 5, "updated_at": version, "steps": steps, "options": {}}
+
+
+def test_plans_are_reused_until_the_definition_changes():
+    cache = PlanCache()
+    first = cache.get(_definition("v1"), ActionHandlers)
+
+    assert cache.get(_definition("v1"), ActionHandlers) is first
+    edited = cache.get(_definition("v2", STEPS[:1]), ActionHandlers)
+    assert edited is not first
+    assert len(edited.steps) == 1
+    # Only the latest version is kept
+    assert cache.get(_definition("v2", STEPS[:1]), ActionHandlers) is edited
+
+
+def test_invalidating_a_definition_drops_its_plan(redis_client):
+    plan = plan_cache.get(_definition("v1"), ActionHandlers)
+    definition_cache.invalidate(5)
+    assert plan_cache.get(_definition("v1"), ActionHandlers) is not plan
+
+
+def test_compiling_resolves_handlers_and_conditions_once():
+    plan = compile_plan(STEPS, ActionHandlers)
+    assert plan.steps[0].handler is ActionHandlers.email
+    assert plan.steps[1].predicate({"payload": {"ok": True}})
+    assert not plan.is_dag
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([{"type": "teleport"}], "unknown action type"),
+    ([{"type": "email", "params": {}}], "missing params: to"),
+    ([{"type": "delay", "params": {"seconds": -1}}], "non-negative"),
+    ([{"type": "condition", "params": {"expression": "payload.x >"}}], "invalid condition"),
+    ([{"type": "email", "integration_id": "1", "params": {"to": "a"}}], "non-integer integration_id"),
+])
+def test_invalid_steps_fail_at_compile_time(steps, message):
+    with pytest.raises(PlanCompileError, match=message):
+        compile_plan(steps, ActionHandlers)
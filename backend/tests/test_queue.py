@@ -0,0 +1,73 @@
+import json
+
+from app.services.queue import ReliableQueue, enqueue_task, QUEUE_KEY, PROCESSING_KEY, LEASES_KEY
+
+
+def test_fetch_leases_every_task_and_ack_clears_it(redis_client):
+    queue = ReliableQueue(redis_client, visibility_timeout=60)
+    ids = [enqueue_task(workflow_id, client=redis_client) for workflow_id in range(3)]
+
+    items = queue.fetch(5, block_timeout=1)
+
+    # Oldest first, each one in the processing list with a lease
+    assert [json.loads(raw)["task_id"] for raw in items] == ids
+    assert redis_client.llen(QUEUE_KEY) == 0
+    assert redis_client.llen(PROCESSING_KEY) == 3
+    assert redis_client.zcard(LEASES_KEY) == 3
+
+    for raw in items:
+        queue.ack(raw)
+    assert redis_client.llen(PROCESSING_KEY) == 0
+    assert redis_client.zcard(LEASES_KEY) == 0
+    assert queue.requeue_expired() == 0
+
+
+def test_fetch_respects_max_items(redis_client):
+    queue = ReliableQueue(redis_client, visibility_timeout=60)
+    for workflow_id in range(5):
+        enqueue_task(workflow_id, client=redis_client)
+
+    assert len(queue.fetch(2, block_timeout=1)) == 2
+    assert redis_client.llen(QUEUE_KEY) == 3
+    assert redis_client.zcard(LEASES_KEY) == 2
+
+
+def test_expired_lease_is_requeued_once_by_concurrent_reapers(redis_client):
+    # A zero visibility timeout: the lease is already expired when the reaper looks
+    crashed = ReliableQueue(redis_client, visibility_timeout=0)
+    enqueue_task(1, client=redis_client)
+    [raw] = crashed.fetch(1, block_timeout=1)
+
+    reapers = [ReliableQueue(redis_client, visibility_timeout=60) for _ in range(2)]
+    assert sum(reaper.requeue_expired() for reaper in reapers) == 1
+    assert redis_client.lrange(QUEUE_KEY, 0, -1) == [raw]
+    assert redis_client.llen(PROCESSING_KEY) == 0
+    assert redis_client.zcard(LEASES_KEY) == 0
+
+
+def test_task_moved_without_a_lease_is_recovered(redis_client):
+    # The worker died between BLMOVE and leasing the task
+    enqueue_task(1, client=redis_client)
+    raw = redis_client.lmove(QUEUE_KEY, PROCESSING_KEY, "RIGHT", "LEFT")
+    assert redis_client.zcard(LEASES_KEY) == 0
+
+    # The first sweep leases it (its worker might still be alive) ...
+    reaper = ReliableQueue(redis_client, visibility_timeout=0)
+    assert reaper.requeue_expired() == 0
+    assert redis_client.zscore(LEASES_KEY, raw) is not None
+
+    # ... and once that lease lapses it goes back on the queue
+    assert reaper.requeue_expired() == 1
+    assert redis_client.lrange(QUEUE_KEY, 0, -1) == [raw]
+    assert redis_client.llen(PROCESSING_KEY) == 0
+
+
+def test_live_worker_keeps_its_task_through_the_lease_less_sweep(redis_client):
+    queue = ReliableQueue(redis_client, visibility_timeout=60)
+    enqueue_task(1, client=redis_client)
+    [raw] = queue.fetch(1, block_timeout=1)
+
+    queue.extend(raw)
+    assert queue.requeue_expired() == 0
+    assert redis_client.lrange(PROCESSING_KEY, 0, -1) == [raw]
+    assert redis_client.llen(QUEUE_KEY) == 0
@@ -0,0 +1,37 @@
+import pytest
+
+from app.services.ratelimit import RateLimiter, RateLimited
+
+
+class StubRegistry:
+    def __init__(self, rate_limit):
+        self.rate_limit = rate_limit
+
+    def settings(self, integration_id):
+        return {"service_name": "webhook", "config": {"rate_limit": self.rate_limit}}
+
+
+def test_fractional_rate_charges_a_whole_token_per_call(redis_client):
+    limiter = RateLimiter(redis_client, registry=StubRegistry({"rate": 0.5}))
+
+    assert limiter.limits(1) == {"rate": 0.5, "burst": 1.0}
+    assert limiter.try_acquire(1) == 0
+    # The next call is two seconds away, not one
+    assert limiter.try_acquire(1) == pytest.approx(2.0, abs=0.1)
+
+
+def test_bucket_refills_at_the_configured_rate(redis_client):
+    limiter = RateLimiter(redis_client, registry=StubRegistry({"rate": 10, "burst": 3}))
+
+    limiter.acquire(1, cost=3)
+    assert limiter.try_acquire(1) == pytest.approx(0.1, abs=0.05)
+    with pytest.raises(RateLimited):
+        limiter.acquire(1, cost=3, max_wait=0.1)
+
+
+def test_penalize_blocks_every_caller(redis_client):
+    limiter = RateLimiter(redis_client, registry=StubRegistry({"rate": 100}))
+
+    limiter.penalize(1, 5)
+    assert limiter.try_acquire(1) == pytest.approx(5, abs=0.1)
+    assert limiter.try_acquire(2) == 0
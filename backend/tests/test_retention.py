@@ -0,0 +1,50 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from app.core.config import PAYLOAD_SPILL_DIR
+from app.models import TaskLog, TaskLogPayload
+from app.services import payloads
+from app.services.changes import VERSION_KEY
+from app.services.log_writer import LogWriter
+from app.services.retention import LogArchive, RetentionEngine
+
+
+def _archived_rows(directory: str):
+    rows = []
+    for name in sorted(os.listdir(directory)):
+        with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as f:
+            rows.extend(json.loads(line) for line in f)
+    return rows
+
+
+def test_purge_removes_expired_logs_with_their_payloads(db, redis_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(payloads, "PAYLOAD_INLINE_MAX", 256)
+    old = datetime.utcnow() - timedelta(days=100)
+    writer = LogWriter()
+    inline = writer.create(1, "success", started_at=old, execution_data='{"kept": "inline"}')
+    spilled_text = json.dumps({"values": list(range(2000))})
+    spilled = writer.create(1, "failed", started_at=old, execution_data=spilled_text)
+    active = writer.create(1, "running", started_at=old, execution_data='{"still": "running"}')
+    recent = writer.create(1, "success", execution_data='{"fresh": true}')
+    writer.flush()
+
+    spill_path = db.get(TaskLogPayload, spilled).path
+    assert os.path.exists(os.path.join(PAYLOAD_SPILL_DIR, spill_path))
+    version = int(redis_client.get(VERSION_KEY.format(table="task_logs")))
+
+    archive = str(tmp_path / "archive")
+    engine = RetentionEngine(policy={"default_days": 30}, archive=LogArchive(archive), chunk_size=1, pause=0)
+    assert engine.run() == 2
+
+    assert sorted(run_id for (run_id,) in db.query(TaskLog.run_id)) == sorted([active, recent])
+    assert sorted(run_id for (run_id,) in db.query(TaskLogPayload.run_id)) == sorted([active, recent])
+    assert not os.path.exists(os.path.join(PAYLOAD_SPILL_DIR, spill_path))
+
+    # The archive keeps the execution data the payload table no longer has
+    archived = {row["run_id"]: row["execution_data"] for row in _archived_rows(archive)}
+    assert archived == {inline: '{"kept": "inline"}', spilled: spilled_text}
+
+    # Each committed chunk invalidates cached log lists
+    assert int(redis_client.get(VERSION_KEY.format(table="task_logs"))) == version + 2
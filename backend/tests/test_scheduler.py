@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import WorkflowSchedule
+from app.services.queue import QUEUE_KEY
+from app.services.scheduler import AutomationScheduler, FIRED_KEY
+
+CRON = {"cron": "*/5 * * * *"}
+
+
+@pytest.fixture
+def schedules(db):
+    yield
+    db.query(WorkflowSchedule).delete()
+    db.commit()
+
+
+def _scheduler(redis_client, node_id: str) -> AutomationScheduler:
+    scheduler = AutomationScheduler(client=redis_client, leader_ttl=30)
+    scheduler.node_id = node_id
+    return scheduler
+
+
+def _due(db, workflow_id: int, fire_at: datetime):
+    db.get(WorkflowSchedule, workflow_id).next_fire_at = fire_at
+    db.commit()
+
+
+def test_one_replica_leads_until_it_steps_down(db, redis_client, schedules, make_workflow):
+    workflow = make_workflow([], trigger_type="schedule", trigger_config=CRON)
+    first, second = _scheduler(redis_client, "a"), _scheduler(redis_client, "b")
+
+    assert first._hold_leadership()
+    assert not second._hold_leadership()
+    # Taking over reconciled the cron index
+    assert db.get(WorkflowSchedule, workflow.id).cron == CRON["cron"]
+    # Renewing keeps the lock
+    assert first._hold_leadership()
+
+    first.shutdown()
+    assert not first.is_leader
+    assert second._hold_leadership()
+
+
+def test_a_fire_time_is_enqueued_once_across_a_handover(db, redis_client, schedules, make_workflow):
+    workflow = make_workflow([], trigger_type="schedule", trigger_config=CRON)
+    old, new = _scheduler(redis_client, "a"), _scheduler(redis_client, "b")
+    old.reconcile()
+    now = datetime.utcnow()
+    fire_at = now.replace(second=0, microsecond=0) - timedelta(minutes=1)
+    _due(db, workflow.id, fire_at)
+
+    # Both replicas planned the same fire time before either dispatched it
+    old._load_window(now)
+    new._load_window(now)
+    assert old.dispatch_due(now) == 1
+    assert new.dispatch_due(now) == 1
+
+    assert redis_client.llen(QUEUE_KEY) == 1
+    task = json.loads(redis_client.lindex(QUEUE_KEY, 0))
+    assert (task["workflow_id"], task["payload"]) == (workflow.id, {"scheduled_for": fire_at.isoformat()})
+    claim = FIRED_KEY.format(workflow_id=workflow.id, fire_at=int((fire_at - datetime(1970, 1, 1)).total_seconds()))
+    assert redis_client.get(claim) == "a"
+
+
+def test_missed_fire_times_coalesce_into_one_run(db, redis_client, schedules, make_workflow):
+    workflow = make_workflow([], trigger_type="schedule", trigger_config=CRON)
+    scheduler = _scheduler(redis_client, "a")
+    scheduler.reconcile()
+    now = datetime.utcnow()
+    _due(db, workflow.id, now - timedelta(hours=3))
+
+    scheduler._load_window(now)
+    while scheduler.dispatch_due(now):
+        pass
+
+    assert redis_client.llen(QUEUE_KEY) == 1
+    db.expire_all()
+    assert db.get(WorkflowSchedule, workflow.id).next_fire_at > now
+
+
+def test_disabling_a_workflow_drops_its_schedule(db, redis_client, schedules, make_workflow):
+    workflow = make_workflow([], trigger_type="schedule", trigger_config=CRON)
+    scheduler = _scheduler(redis_client, "a")
+    scheduler.reconcile()
+
+    workflow.enabled = False
+    db.commit()
+    scheduler.apply_change(workflow.id)
+
+    db.expire_all()
+    assert db.get(WorkflowSchedule, workflow.id) is None
@@ -0,0 +1,82 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.subscriptions import SubscriptionIndex, parse_subscription
+
+
+def _workflow(workflow_id: int, config: dict, enabled: bool = True, trigger_type: str = "event"):
+    return SimpleNamespace(id=workflow_id, trigger_type=trigger_type, enabled=enabled, trigger_config=json.dumps(config))
+
+
+@pytest.fixture
+def index(redis_client):
+    index = SubscriptionIndex(redis_client)
+    for workflow in [
+        _workflow(1, {"event": "order.created"}),
+        _workflow(2, {"event": "order.created", "match": {"source": "shopify"}}),
+        _workflow(3, {"event": "order.created", "match": {"source": "shopify", "customer.tier": "gold"}}),
+        _workflow(4, {"event": "order.created", "match": {"source": "shopify"}, "where": "payload.total > 100"}),
+        _workflow(5, {"event": "order.created", "match": {"flagged": True}}),
+        _workflow(6, {"event": "order.paid"}),
+    ]:
+        index.put(workflow)
+    return index
+
+
+@pytest.mark.parametrize("event, payload, expected", [
+    ("order.created", {}, [1]),
+    ("order.created", {"source": "shopify", "total": 50}, [1, 2]),
+    ("order.created", {"source": "shopify", "total": 500}, [1, 2, 4]),
+    ("order.created", {"source": "shopify", "customer": {"tier": "gold"}}, [1, 2, 3]),
+    ("order.created", {"source": "woo", "customer": {"tier": "gold"}}, [1]),
+    # True must not match 1 even though they hash alike
+    ("order.created", {"flagged": True}, [1, 5]),
+    ("order.created", {"flagged": 1}, [1]),
+    # A list where a scalar was expected matches nothing rather than raising
+    ("order.created", {"source": ["shopify"]}, [1]),
+    ("order.paid", {"source": "shopify"}, [6]),
+    ("order.deleted", {"source": "shopify"}, []),
+])
+def test_events_match_their_subscribers(index, event, payload, expected):
+    assert index.match(event, payload) == expected
+
+
+def test_edits_reindex_one_workflow_and_prune_empty_levels(index):
+    index.put(_workflow(2, {"event": "order.paid", "match": {"source": "shopify"}}))
+    index.put(_workflow(3, {"event": "order.created"}, enabled=False))
+    index.remove(6)
+
+    assert index.match("order.created", {"source": "shopify", "customer": {"tier": "gold"}}) == [1]
+    assert index.match("order.paid", {"source": "shopify"}) == [2]
+    stats = index.get_stats()
+    assert (stats["subscriptions"], stats["event_types"], stats["signatures"]) == (4, 2, 4)
+
+
+def test_load_indexes_enabled_event_workflows_and_skips_bad_configs(db, redis_client, make_workflow):
+    subscribed = make_workflow([], trigger_type="event", trigger_config={"event": "signup"})
+    make_workflow([], trigger_type="event", trigger_config={"event": "signup"}, enabled=False)
+    make_workflow([], trigger_type="event", trigger_config={"match": {"plan": "pro"}})
+    make_workflow([], trigger_type="webhook", trigger_config={"event": "signup"})
+
+    index = SubscriptionIndex(redis_client)
+    index.load()
+
+    assert index.match("signup", {}) == [subscribed.id]
+
+
+@pytest.mark.parametrize("config, message", [
+    ({}, "'event' type"),
+    ({"event": "a", "match": ["source"]}, "'match' must map"),
+    ({"event": "a", "match": {"source": {"name": "x"}}}, "must be a string"),
+    ({"event": "a", "where": "payload.total >"}, "invalid 'where'"),
+    ({"event": "a", "where": 1}, "expression string"),
+])
+def test_bad_trigger_configs_are_rejected(config, message):
+    with pytest.raises(ValueError, match=message):
+        parse_subscription(1, "event", config)
+
+
+def test_non_event_workflows_have_no_subscription():
+    assert parse_subscription(1, "webhook", {"event": "order.created"}) is None
@@ -0,0 +1,44 @@
+import json
+import time
+
+from app.services.queue import QUEUE_KEY
+from app.services.timers import TimerService, TIMERS_KEY
+
+
+def test_release_due_moves_only_due_timers_onto_the_queue(redis_client):
+    timers = TimerService(redis_client)
+    now = time.time()
+    timers.schedule(1, "due-run", 2, now - 1, {"a": 1})
+    timers.schedule(1, "later-run", 2, now + 3600)
+
+    assert timers.release_due(now) == 1
+
+    [entry] = redis_client.lrange(QUEUE_KEY, 0, -1)
+    task = json.loads(entry)
+    assert (task["run_id"], task["start_step"], task["action"], task["payload"]) == ("due-run", 2, "resume", {"a": 1})
+    assert timers.pending() == 1
+    assert json.loads(redis_client.zrange(TIMERS_KEY, 0, -1)[0])["run_id"] == "later-run"
+
+
+def test_release_due_honours_the_batch_size(redis_client):
+    timers = TimerService(redis_client, batch_size=2)
+    now = time.time()
+    for index in range(3):
+        timers.schedule(1, f"run-{index}", 1, now - 10 + index)
+
+    assert timers.release_due(now) == 2
+    assert timers.release_due(now) == 1
+    assert timers.release_due(now) == 0
+    assert redis_client.llen(QUEUE_KEY) == 3
+    assert timers.pending() == 0
+
+
+def test_competing_timer_loops_never_release_an_entry_twice(redis_client):
+    loops = [TimerService(redis_client) for _ in range(3)]
+    now = time.time()
+    for index in range(10):
+        loops[0].schedule(1, f"run-{index}", 1, now - 1)
+
+    assert sum(loop.release_due(now) for loop in loops) == 10
+    run_ids = [json.loads(entry)["run_id"] for entry in redis_client.lrange(QUEUE_KEY, 0, -1)]
+    assert sorted(run_ids) == sorted(f"run-{index}" for index in range(10))
@@ -0,0 +1,101 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.workflow_service import WorkflowDefinitionCache
+
+
+class StubSession:
+    """Stands in for a DB session: counts loads and can be slow or fail"""
+
+    def __init__(self, delay: float = 0.0, error: Exception = None, during=None):
+        self.delay = delay
+        self.error = error
+        self.during = during
+        self.loads = 0
+
+    def get(self, model, workflow_id):
+        self.loads += 1
+        time.sleep(self.delay)
+        if self.during:
+            self.during()
+        if self.error:
+            raise self.error
+        return SimpleNamespace(definition={"id": workflow_id, "steps": [], "loads": self.loads})
+
+
+def _concurrently(call, count: int = 8):
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = call()
+        except Exception as e:
+            results[index] = e
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_misses_load_once(redis_client):
+    cache, session = WorkflowDefinitionCache(redis_client), StubSession(delay=0.2)
+
+    results = _concurrently(lambda: cache.get(1, session))
+
+    assert session.loads == 1
+    assert all(result == {"id": 1, "steps": [], "loads": 1} for result in results)
+
+
+def test_a_failed_load_is_raised_in_every_waiter(redis_client):
+    cache, session = WorkflowDefinitionCache(redis_client), StubSession(delay=0.2, error=RuntimeError("db down"))
+
+    results = _concurrently(lambda: cache.get(1, session))
+
+    assert session.loads == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # Nothing was cached, so the next call tries again
+    with pytest.raises(RuntimeError):
+        cache.get(1, session)
+    assert session.loads == 2
+
+
+def test_tiers_fill_on_a_miss_and_invalidation_clears_them(redis_client):
+    cache, other_process, session = WorkflowDefinitionCache(redis_client), WorkflowDefinitionCache(redis_client), StubSession()
+
+    cache.get(1, session)
+    cache.get(1, session)
+    other_process.get(1, session)
+    assert session.loads == 1
+    assert cache.get_stats()["local_hits"] == 1
+    assert other_process.get_stats()["redis_hits"] == 1
+
+    cache.invalidate(1)
+    assert redis_client.get(cache.cache_key(1)) is None
+    assert cache.get(1, session)["loads"] == 2
+
+
+def test_a_load_racing_an_invalidation_does_not_cache_the_old_definition(redis_client):
+    cache = WorkflowDefinitionCache(redis_client)
+    session = StubSession(during=lambda: cache.invalidate(1))
+
+    assert cache.get(1, session)["loads"] == 1
+    assert redis_client.get(cache.cache_key(1)) is None
+
+    session.during = None
+    assert cache.get(1, session)["loads"] == 2
+
+
+def test_missing_workflows_are_not_cached(redis_client):
+    cache = WorkflowDefinitionCache(redis_client)
+
+    class Empty:
+        def get(self, model, workflow_id):
+            return None
+
+    assert cache.get(1, Empty()) is None
+    assert cache.get_stats()["size"] == 0
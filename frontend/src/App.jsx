@@ -1,19 +1,42 @@
-import React from 'react';
-import { QueryClient, QueryClientProvider } from '@tanstack/react-query';
+import React, { useEffect } from 'react';
+import { QueryClient, QueryClientProvider, useQueryClient } from '@tanstack/react-query';
 import MainLayout from './components/MainLayout';
+import { api } from './services/api';
 
 const queryClient = new QueryClient({
   defaultOptions: {
     queries: {
-      refetchInterval: 5000,
+      // Changes are pushed over the stream; polling is only a fallback
+      refetchInterval: 30000,
       refetchOnWindowFocus: false,
     },
   },
 });
 
+const QUERY_KEYS = {
+  workflows: ['workflows'],
+  integrations: ['integrations'],
+  task_logs: ['logs'],
+};
+
+function ChangeStream() {
+  const client = useQueryClient();
+
+  useEffect(() => api.subscribeChanges((table) => {
+    if (table === 'resync') {
+      client.invalidateQueries();
+    } else {
+      client.invalidateQueries({ queryKey: QUERY_KEYS[table] });
+    }
+  }), [client]);
+
+  return null;
+}
+
 function App() {
   return (
     <QueryClientProvider client={queryClient}>
+      <ChangeStream />
       <MainLayout />
     </QueryClientProvider>
   );
@@ -45,6 +45,12 @@ export const api = {
     const { data } = await client.get('/logs/');
     return data;
   },
+
+  // Error message and execution data, which the list leaves out
+  getLog: async (id) => {
+    const { data } = await client.get(`/logs/${id}`);
+    return data;
+  },
   
   // Integrations
   getIntegrations: async () => {
@@ -75,4 +81,14 @@ export const api = {
     const { data } = await client.post(`/integrations/${id}/health`);
     return data;
   },
+
+  // Change stream (SSE): calls onChange(table) after each committed change;
+  // "resync" means changes may have been missed. Returns an unsubscribe function.
+  subscribeChanges: (onChange) => {
+    const source = new EventSource(`${API_BASE}/stream/`);
+    ['workflows', 'integrations', 'task_logs', 'resync'].forEach((table) => {
+      source.addEventListener(table, () => onChange(table));
+    });
+    return () => source.close();
+  },
 };
\ No newline at end of file